@@ -35,6 +35,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "ecommerceapp.middleware.VisitEventMiddleware",  # buffered, batched VisitEvent writes
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -102,11 +103,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL   = "/media/"
 MEDIA_ROOT  = BASE_DIR / "media"
+MEDIA_BLOB_PREFIX = config("MEDIA_BLOB_PREFIX", default="blobs")  # content-addressed images: blobs/ab/cd/<sha256>.webp
 
 # Optional S3 storage (leave blank for local)
 if config("AWS_ACCESS_KEY_ID", default=""):
     INSTALLED_APPS += ["storages"]
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+    # Django 5.1+ reads STORAGES only; MediaStorage marks content-addressed blobs immutable
+    STORAGES = {
+        "default": {"BACKEND": "ecommerceapp.storage.MediaStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
     AWS_ACCESS_KEY_ID       = config("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY   = config("AWS_SECRET_ACCESS_KEY")
     AWS_STORAGE_BUCKET_NAME = config("AWS_STORAGE_BUCKET_NAME")
@@ -150,6 +156,46 @@ RAZORPAY_KEY_ID        = config("RAZORPAY_KEY_ID", default="")
 RAZORPAY_KEY_SECRET    = config("RAZORPAY_KEY_SECRET", default="")
 RAZORPAY_WEBHOOK_SECRET= config("RAZORPAY_WEBHOOK_SECRET", default="")  # optional but recommended
 
+# Analytics
+DASHBOARD_KPI_TTL = config("DASHBOARD_KPI_TTL", default=60, cast=int)  # seconds before a background refresh
+
+# Image processing (ecommerceapp/images.py): uploads are converted to WebP off the request
+IMAGE_PROCESSING_ASYNC = config("IMAGE_PROCESSING_ASYNC", default=True, cast=bool)  # False = convert right after commit
+IMAGE_WORKERS          = config("IMAGE_WORKERS", default=2, cast=int)
+IMAGE_PROCESS_WORKERS  = config("IMAGE_PROCESS_WORKERS", default=0, cast=int)  # bulk uploads; 0 = one per core, 1 = inline
+IMAGE_MAX_DIMENSION    = config("IMAGE_MAX_DIMENSION", default=2048, cast=int)  # long side, px, before encoding
+
+# Blog markdown rendering (ecommerceapp/rendering.py); after changing the extensions run manage.py rerender_blog_posts
+BLOG_MARKDOWN_EXTENSIONS = config("BLOG_MARKDOWN_EXTENSIONS", default="extra,codehilite,toc,sane_lists", cast=Csv())
+BLOG_RENDER_LRU_SIZE     = config("BLOG_RENDER_LRU_SIZE", default=256, cast=int)      # rendered posts kept per process
+BLOG_RENDER_CACHE_TTL    = config("BLOG_RENDER_CACHE_TTL", default=86400, cast=int)   # Django cache; 0 = LRU only
+BLOG_RENDER_WORKERS      = config("BLOG_RENDER_WORKERS", default=0, cast=int)         # rerender_blog_posts; 0 = one per core, 1 = inline
+
+# Product review summary (/api/products/<id>/review-summary/)
+REVIEW_SUMMARY_CACHE_TTL = config("REVIEW_SUMMARY_CACHE_TTL", default=300, cast=int)  # server cache, dropped on moderation
+REVIEW_SUMMARY_MAX_AGE   = config("REVIEW_SUMMARY_MAX_AGE", default=60, cast=int)     # Cache-Control max-age
+
+# Visit tracking (ecommerceapp.middleware.VisitEventMiddleware)
+VISIT_TRACKING_ENABLED  = config("VISIT_TRACKING_ENABLED", default=True, cast=bool)
+VISIT_SAMPLE_RATE       = config("VISIT_SAMPLE_RATE", default=1.0, cast=float)   # 0..1
+VISIT_FLUSH_BATCH       = config("VISIT_FLUSH_BATCH", default=200, cast=int)     # rows per bulk_create
+VISIT_FLUSH_INTERVAL_MS = config("VISIT_FLUSH_INTERVAL_MS", default=1000, cast=int)
+VISIT_QUEUE_MAX         = config("VISIT_QUEUE_MAX", default=10000, cast=int)     # drop events beyond this
+VISIT_EXCLUDE_PREFIXES  = ["/static/", "/media/", "/dev-admin/", "/favicon.ico"]
+# retention (manage.py compact_visits)
+VISIT_RAW_RETENTION_DAYS        = config("VISIT_RAW_RETENTION_DAYS", default=30, cast=int)        # raw rows, then hourly rollups
+VISIT_ARCHIVE_RETENTION_MONTHS  = config("VISIT_ARCHIVE_RETENTION_MONTHS", default=12, cast=int)  # 0 = keep archives forever
+VISIT_AGGREGATE_RETENTION_DAYS  = config("VISIT_AGGREGATE_RETENTION_DAYS", default=0, cast=int)   # 0 = keep rollups forever
+
+# Write-behind popularity counters (views/carts/wishes); see ecommerceapp/counters.py
+COUNTER_WRITE_BEHIND      = config("COUNTER_WRITE_BEHIND", default=True, cast=bool)
+COUNTER_FLUSH_INTERVAL_MS = config("COUNTER_FLUSH_INTERVAL_MS", default=5000, cast=int)
+
+# Trending paths / products (Count-Min + top-K per node, snapshotted hourly windows)
+TRENDING_TOP_K                = config("TRENDING_TOP_K", default=50, cast=int)
+TRENDING_SNAPSHOT_INTERVAL_MS = config("TRENDING_SNAPSHOT_INTERVAL_MS", default=60000, cast=int)
+TRENDING_RETENTION_HOURS      = config("TRENDING_RETENTION_HOURS", default=48, cast=int)
+
 
 AUTH_USER_MODEL = "ecommerceapp.User"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -25,4 +25,5 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    from ecommerceapp.views import serve_media
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media)
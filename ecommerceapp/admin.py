@@ -91,7 +91,7 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ("name", "slug", "category__name", "description", "ingredients", "allergens")
     readonly_fields = READONLY_TS + (
         "views_count", "carts_count", "sold_count", "reviews_count",
-        "rating_avg", "wishes_count",
+        "rating_avg", "wishes_count", "unique_viewers",
     )
     inlines = [ProductImageInline, ProductVariantInline, ProductSpecificationInline]
 
@@ -133,6 +133,7 @@ class ProductAdmin(admin.ModelAdmin):
         "is_published",
         # Stats (RO)
         "views_count", "carts_count", "sold_count", "reviews_count", "rating_avg", "wishes_count",
+        "unique_viewers",
     ) + READONLY_TS
 
     @admin.display(description="", ordering=None)
@@ -255,6 +256,52 @@ class OrderCheckoutDetailsAdmin(admin.ModelAdmin):
     readonly_fields = READONLY_TS
     fields = ("order", "full_name", "email", "phone", "address1", "address2", "city", "state", "postcode", "country", "notes") + READONLY_TS
 
+@admin.register(RazorpayWebhookEvent)
+class RazorpayWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "event", "payment_id", "status", "attempts", "created_at", "processed_at")
+    list_filter = ("status", "event")
+    search_fields = ("event_id", "payment_id")
+    readonly_fields = READONLY_TS + ("processed_at",)
+    fields = ("event_id", "event", "payment_id", "payload", "status", "attempts", "error", "processed_at") + READONLY_TS
+
+@admin.register(DailySalesFact)
+class DailySalesFactAdmin(admin.ModelAdmin):
+    list_display = ("date", "currency", "orders", "customers", "revenue", "updated_at")
+    list_filter = ("currency",)
+    date_hierarchy = "date"
+    readonly_fields = ("date", "currency", "orders", "customers", "revenue", "updated_at")
+
+@admin.register(VendorProductDailySales)
+class VendorProductDailySalesAdmin(admin.ModelAdmin):
+    list_display = ("date", "vendor", "product", "units", "revenue", "orders")
+    list_filter = ("vendor",)
+    search_fields = ("vendor__display_name", "product__name")
+    list_select_related = ("vendor", "product")
+    date_hierarchy = "date"
+
+@admin.register(VendorDailySales)
+class VendorDailySalesAdmin(admin.ModelAdmin):
+    list_display = ("date", "vendor", "units", "revenue", "orders")
+    list_filter = ("vendor",)
+    list_select_related = ("vendor",)
+    date_hierarchy = "date"
+
+@admin.register(ProductViewerSketch)
+class ProductViewerSketchAdmin(admin.ModelAdmin):
+    list_display = ("date", "product", "viewers", "updated_at")
+    search_fields = ("product__name",)
+    list_select_related = ("product",)
+    date_hierarchy = "date"
+    exclude = ("hll",)
+    readonly_fields = ("product", "date", "viewers", "updated_at")
+
+@admin.register(TrendingSnapshot)
+class TrendingSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("window_start", "kind", "node", "total", "updated_at")
+    list_filter = ("kind",)
+    exclude = ("sketch",)
+    readonly_fields = ("node", "kind", "window_start", "total", "top", "updated_at")
+
 # ───────── Contact / Reviews / Visits ─────────
 @admin.register(ContactSubmission)
 class ContactSubmissionAdmin(admin.ModelAdmin):
@@ -272,6 +319,24 @@ class ProductReviewAdmin(admin.ModelAdmin):
     list_select_related = ("product", "user")
     readonly_fields = READONLY_TS
     fields = ("product", "user", "rating", "title", "body", "is_approved", "ip_address", "user_agent") + READONLY_TS
+    actions = ["approve_selected", "unapprove_selected"]
+
+    @admin.action(description="Approve selected reviews")
+    def approve_selected(self, request, queryset):
+        n = moderate_reviews(queryset.values_list("pk", flat=True), True)
+        self.message_user(request, f"Approved {n} review(s).")
+
+    @admin.action(description="Unapprove selected reviews")
+    def unapprove_selected(self, request, queryset):
+        n = moderate_reviews(queryset.values_list("pk", flat=True), False)
+        self.message_user(request, f"Unapproved {n} review(s).")
+
+@admin.register(ProductRatingSummary)
+class ProductRatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ("product", "stars_5", "stars_4", "stars_3", "stars_2", "stars_1", "updated_at")
+    search_fields = ("product__name",)
+    list_select_related = ("product",)
+    readonly_fields = ("product", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5", "updated_at")
 
 @admin.register(VisitEvent)
 class VisitEventAdmin(admin.ModelAdmin):
@@ -281,6 +346,30 @@ class VisitEventAdmin(admin.ModelAdmin):
     list_select_related = ("user",)
     readonly_fields = READONLY_TS
     fields = ("user", "ip_address", "user_agent", "method", "path", "referer") + READONLY_TS
+    show_full_result_count = False   # avoid a second COUNT(*) on a large table
+
+@admin.register(VisitHourlyAggregate)
+class VisitHourlyAggregateAdmin(admin.ModelAdmin):
+    list_display = ("hour", "method", "path", "visits", "unique_users")
+    list_filter = ("method",)
+    search_fields = ("path",)
+    date_hierarchy = "hour"
+    readonly_fields = ("hour", "path", "method", "visits", "unique_users")
+
+@admin.register(VariantAttribute)
+class VariantAttributeAdmin(admin.ModelAdmin):
+    list_display = ("variant", "product", "name", "value", "is_active")
+    list_filter = ("is_active", "name")
+    search_fields = ("name", "value", "variant__sku", "product__name")
+    list_select_related = ("variant", "product")
+    readonly_fields = ("variant", "product", "name", "value", "is_active")
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "size", "refcount", "created_at", "updated_at")
+    search_fields = ("name", "sha256")
+    readonly_fields = ("name", "sha256", "size", "refcount") + READONLY_TS
+    show_full_result_count = False
 
 # ───────── Wishlist ─────────
 @admin.register(Wishlist)
@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class EcommerceappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecommerceapp'
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from .models import (
+            BlogPost, CartItem, Order, OrderPayment, ProcessedImageMixin, WishlistItem,
+            refresh_sales_fact_on_delete, release_image_blobs, release_item_count,
+        )
+        from .search import unindex_blog_post
+
+        # per model rather than sender=None, which would disable fast deletes app-wide
+        for model in self.get_models():
+            if issubclass(model, ProcessedImageMixin):
+                post_delete.connect(release_image_blobs, sender=model, dispatch_uid=f"release-blobs-{model._meta.label}")
+
+        post_delete.connect(unindex_blog_post, sender=BlogPost, dispatch_uid="unindex-blog-post")
+        for model in (Order, OrderPayment):
+            post_delete.connect(refresh_sales_fact_on_delete, sender=model, dispatch_uid=f"sales-fact-{model._meta.label}")
+        for model in (CartItem, WishlistItem):
+            post_delete.connect(release_item_count, sender=model, dispatch_uid=f"item-count-{model._meta.label}")
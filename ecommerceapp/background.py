@@ -0,0 +1,53 @@
+"""
+Tiny in-process background runner.
+
+There is no task broker in this project, so slow follow-up work (webhook
+processing, cache refreshes, ...) is pushed onto a daemon thread instead of
+running on the request thread. Jobs are coalesced by key: submitting a key
+that is already queued is a no-op, so a burst of requests triggers one run.
+"""
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+log = logging.getLogger(__name__)
+
+_jobs = queue.Queue()
+_pending = set()
+_lock = threading.Lock()
+_worker = None
+
+
+def _run():
+    while True:
+        key, fn, args, kwargs = _jobs.get()
+        with _lock:
+            _pending.discard(key)
+        close_old_connections()
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            log.exception("background job %r failed", key)
+        finally:
+            close_old_connections()
+
+
+def _ensure_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="ecommerce-background", daemon=True)
+            _worker.start()
+
+
+def submit(key, fn, *args, **kwargs) -> bool:
+    """Queue fn(*args, **kwargs) unless a job with the same key is already waiting."""
+    with _lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+    _jobs.put((key, fn, args, kwargs))
+    _ensure_worker()
+    return True
@@ -0,0 +1,88 @@
+"""
+Content-addressed media.
+
+Processed images are stored once per distinct content under
+`<MEDIA_BLOB_PREFIX>/ab/cd/<sha256>.<ext>` (two shard levels keep any one
+directory / key prefix small). The same photo attached to many variants maps
+to one file, and a name never changes content, so blob URLs can be served with
+`Cache-Control: immutable`.
+
+MediaBlob.refcount counts the rows pointing at a blob. `store()` takes a
+reference, `release()` drops one; blobs at zero are left for the media sweeper
+(`manage.py gc_media`) rather than deleted inline, so a concurrent `store()` of
+the same content can never lose its file.
+"""
+import hashlib
+import re
+from collections import Counter
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def prefix() -> str:
+    return getattr(settings, "MEDIA_BLOB_PREFIX", "blobs").strip("/")
+
+
+def blob_name(sha: str, ext: str) -> str:
+    return f"{prefix()}/{sha[:2]}/{sha[2:4]}/{sha}{ext.lower()}"
+
+
+def is_blob_name(name) -> bool:
+    return bool(name) and re.fullmatch(
+        rf"{re.escape(prefix())}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.\w+", str(name)
+    ) is not None
+
+
+def store(storage, content) -> str:
+    """Save `content` under its hash (unless already there) and take a reference; returns the name."""
+    from .models import MediaBlob
+
+    content.seek(0)
+    data = content.read()
+    sha = hashlib.sha256(data).hexdigest()
+    name = blob_name(sha, PurePosixPath(getattr(content, "name", "") or "").suffix or ".bin")
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            # another writer won the race with the same bytes; keep theirs
+            storage.delete(saved)
+    _acquire(MediaBlob, name, sha, len(data))
+    return name
+
+
+def _acquire(MediaBlob, name, sha, size):
+    # updated_at is stamped by hand (update() skips auto_now): the sweeper leaves recently touched blobs alone
+    if MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, sha256=sha, size=size, refcount=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1, updated_at=timezone.now())
+
+
+def release(names) -> int:
+    """Drop one reference per occurrence of each blob name; non-blob names are ignored."""
+    from .models import MediaBlob
+
+    counts = Counter(n for n in names if is_blob_name(n))
+    released = 0
+    for name, n in counts.items():
+        released += MediaBlob.objects.filter(name=name).update(
+            refcount=Greatest(F("refcount") - n, Value(0)), updated_at=timezone.now(),
+        )
+    return released
+
+
+def release_on_commit(names) -> None:
+    names = [n for n in names if is_blob_name(n)]
+    if names:
+        transaction.on_commit(lambda: release(names))
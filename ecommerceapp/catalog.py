@@ -0,0 +1,441 @@
+"""
+Catalog import / export (CSV or JSON Lines), one record per product.
+
+A record carries the product's own columns (PRODUCT_FIELDS), `category`
+(slug), `vendor` (owner e-mail) and optional `variants` / `specifications`
+lists, in the item shapes the product API accepts (JSON inside a CSV cell).
+Products are matched on `slug`; records without one always create a product.
+Listed variants are upserted as `upsert_variants` does; listed specifications
+replace the product's current ones (as a diff, see specifications.py). Missing columns leave fields untouched,
+blank cells clear them.
+
+`CatalogImporter` streams records in batches. Each batch resolves categories,
+vendors, products and SKUs with one lookup apiece, allocates unique slugs by
+probing candidate slugs with IN against the unique index, and writes in its
+own transaction: products and variant updates through single prepared
+statements run with executemany (`insert_products`, `update_rows`), the
+smaller child rows with bulk_create. Bad records are reported and skipped.
+"""
+import copy
+import csv
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .exports import _Echo
+from .models import Category, Product, ProductSpecification, ProductVariant, Vendor, sync_variant_attributes
+from .specifications import build_specifications, replace_specifications
+from .variants import FIELDS as VARIANT_FIELDS, plan_variants, requested_skus, sku_bases, taken_skus
+
+BATCH_SIZE = 2000
+CHUNK_SIZE = 1000
+MAX_ERRORS = 1000   # error messages kept for the report; all are counted
+
+PRODUCT_FIELDS = (
+    "slug", "name", "quantity", "grade", "manufacture_date", "origin_country", "warranty_months",
+    "price_inr", "price_usd", "price", "aed_pricing_mode", "price_aed_static",
+    "gold_weight_g", "gold_making_charge", "gold_markup_percent", "discount_percent",
+    "featured", "new_arrival", "hot_deal", "hot_deal_ends_at", "is_published",
+    "description", "ingredients", "allergens", "nutrition_facts", "nutrition_notes",
+    "default_uom", "default_pack_qty", "is_organic", "is_perishable", "shelf_life_days",
+    "hsn_sac", "gst_rate", "mrp_price", "cost_price",
+)
+COLUMNS = PRODUCT_FIELDS + ("category", "vendor", "variants", "specifications")
+FORMATS = ("csv", "jsonl")
+
+_fields = {name: Product._meta.get_field(name) for name in PRODUCT_FIELDS}
+_FK_FIELDS = {"category", "vendor", "store"}
+_field_names = {f.name for f in Product._meta.concrete_fields}
+SLUG_LENGTH = _fields["slug"].max_length
+
+
+# ─────── parsing ───────
+def read_records(fh, fmt: str):
+    """(line number, raw record) for every record of an open text file."""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for i, line in enumerate(fh, start=1):
+            if line.strip():
+                yield i, line
+
+
+def _value(field, raw):
+    """Model value for one imported cell; blank means null, empty or the field default."""
+    if isinstance(raw, str):
+        raw = raw.strip()
+        if raw and isinstance(field, models.BooleanField):
+            return raw.lower() in ("1", "t", "true", "y", "yes")
+        if raw and isinstance(field, models.JSONField):
+            return json.loads(raw)
+    if raw is None or raw == "":
+        if field.null:
+            return None
+        return "" if isinstance(field, (models.CharField, models.TextField)) else field.get_default()
+    value = field.to_python(raw)
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _items(raw, what: str):
+    """A list of dicts from a `variants` / `specifications` cell; None when blank."""
+    if isinstance(raw, str):
+        raw = json.loads(raw) if raw.strip() else None
+    if raw is not None and not (isinstance(raw, list) and all(isinstance(i, dict) for i in raw)):
+        raise ValidationError({what: "Expected a list of objects."})
+    return raw
+
+
+def _text(raw):
+    return (raw.strip() if isinstance(raw, str) else str(raw)) if raw not in (None, "") else None
+
+
+class Record:
+    """One parsed input record."""
+    def __init__(self, line, raw):
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        if not isinstance(raw, dict):
+            raise ValidationError("Expected an object.")
+        self.line = line
+        self.values = {}
+        for name, field in _fields.items():
+            if name in raw:
+                try:
+                    self.values[name] = _value(field, raw[name])
+                except (ValueError, ValidationError) as exc:
+                    raise ValidationError({name: _message(exc)})
+        self.slug = self.values.pop("slug", None) or None
+        self.slug_given = self.slug is not None
+        self.category = _text(raw.get("category"))
+        self.vendor = _text(raw.get("vendor"))
+        self.variants = _items(raw.get("variants"), "variants")
+        self.specs = _items(raw.get("specifications"), "specifications")
+
+
+def _message(exc) -> str:
+    if isinstance(exc, ValidationError):
+        if hasattr(exc, "error_dict"):
+            return "; ".join(f"{k}: {' '.join(v)}" for k, v in exc.message_dict.items())
+        return " ".join(exc.messages)
+    return str(exc)
+
+
+def unique_slugs(bases, reserved=(), start=None) -> list:
+    """
+    A free product slug for every entry of `bases` (repeats allowed), in order:
+    the base itself or "<base>-<n>" with the lowest free n, as Product.save picks.
+    Candidates are checked with IN against the unique index; a further round is
+    only needed when a base's first candidates are all taken. `start` maps bases
+    to the first n worth trying and is advanced past the slugs handed out.
+    """
+    start = {} if start is None else start
+    need = Counter(bases)
+    taken = set(reserved)
+    free = defaultdict(list)
+    nth = {base: start.get(base, 1) for base in need}
+    extra = 1
+    while need:
+        candidates = {}
+        for base, n in need.items():
+            for _ in range(n + extra):
+                k = nth[base]
+                nth[base] += 1
+                suffix = f"-{k}" if k > 1 else ""
+                slug = f"{base[:SLUG_LENGTH - len(suffix)]}{suffix}"
+                if slug not in taken:
+                    candidates[slug] = (base, k)
+        found = set(Product.objects.filter(slug__in=list(candidates)).values_list("slug", flat=True))
+        for slug, (base, k) in candidates.items():
+            if slug in found or not need.get(base):
+                continue
+            free[base].append(slug)
+            taken.add(slug)
+            need[base] -= 1
+            start[base] = k + 1
+        need = +need   # drop satisfied bases
+        extra *= 4
+    for base in free:
+        free[base].reverse()
+    return [free[base].pop() for base in bases]
+
+
+def insert_products(products, varying) -> None:
+    """
+    INSERT new `products` with one executemany. On a 50-column model most of
+    bulk_create's time goes into preparing every value of every row; here the
+    columns outside `varying` (field names any record set) hold the same default
+    in every row and are prepared once per batch. Primary keys are read back by slug.
+    """
+    conn = connections[Product.objects.db]
+    qn = conn.ops.quote_name
+    fields = [f for f in Product._meta.concrete_fields if not f.primary_key]
+    now = timezone.now()
+    for product in products:
+        product.created_at = product.updated_at = now
+    varying = set(varying) | {"slug", "name", "category", "vendor", "in_stock", "limited_stock"}
+    const = {f.attname: f.get_db_prep_save(getattr(products[0], f.attname), conn) for f in fields if f.name not in varying}
+    rows = [
+        [const[f.attname] if f.attname in const else f.get_db_prep_save(getattr(p, f.attname), conn) for f in fields]
+        for p in products
+    ]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        qn(Product._meta.db_table), ", ".join(qn(f.column) for f in fields), ", ".join(["%s"] * len(fields)),
+    )
+    with conn.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    ids = dict(Product.objects.filter(slug__in=[p.slug for p in products]).values_list("slug", "pk"))
+    for product in products:
+        product.pk = ids[product.slug]
+        product._state.adding = False
+        product._state.db = conn.alias
+
+
+def update_rows(model, objs, fields) -> None:
+    """
+    UPDATE `fields` of `objs` with one prepared statement run through executemany.
+    bulk_update builds a CASE WHEN per row and field, which for a few thousand
+    rows takes far longer to compile than the UPDATEs take to run.
+    """
+    conn = connections[model.objects.db]
+    qn = conn.ops.quote_name
+    fields = [model._meta.get_field(name) for name in fields]
+    sql = "UPDATE %s SET %s WHERE %s = %%s" % (
+        qn(model._meta.db_table), ", ".join(f"{qn(f.column)} = %s" for f in fields), qn(model._meta.pk.column),
+    )
+    rows = [[f.get_db_prep_save(getattr(obj, f.attname), conn) for f in fields] + [obj.pk] for obj in objs]
+    with conn.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+# ─────── import ───────
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.variants_created = 0
+        self.variants_updated = 0
+        self.specifications = 0
+        self.failed = 0
+        self.errors = []   # (line, message), first MAX_ERRORS only
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=BATCH_SIZE, dry_run=False):
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run   # each batch is rolled back, so later batches don't see earlier ones
+        self.stats = ImportStats()
+        self._categories = {}    # slug -> pk, None if unknown
+        self._vendors = {}       # owner e-mail -> pk, None if unknown
+        self._slug_next = {}     # slug base -> first suffix not handed out yet
+        self._blank = Product()
+
+    def run(self, records, progress=None) -> ImportStats:
+        """Import (line, raw record) pairs; `progress(stats)` is called after every batch."""
+        it = iter(records)
+        while batch := list(islice(it, self.batch_size)):
+            self.import_batch(batch)
+            if progress:
+                progress(self.stats)
+        return self.stats
+
+    def _fail(self, line, exc):
+        self.stats.failed += 1
+        if len(self.stats.errors) < MAX_ERRORS:
+            self.stats.errors.append((line, _message(exc)))
+
+    def _resolve(self, records):
+        slugs = {r.category for r in records if r.category} - self._categories.keys()
+        if slugs:
+            found = dict(Category.objects.filter(slug__in=slugs).values_list("slug", "pk"))
+            self._categories.update((s, found.get(s)) for s in slugs)
+        emails = {r.vendor for r in records if r.vendor} - self._vendors.keys()
+        if emails:
+            found = dict(Vendor.objects.filter(user__email__in=emails).values_list("user__email", "pk"))
+            self._vendors.update((e, found.get(e)) for e in emails)
+
+    def _plan_product(self, record, current):
+        if current is None:
+            current = self._blank   # copying a blank instance skips evaluating 50 field defaults per row
+        product = copy.copy(current)
+        if product.pk is None:
+            product.slug, product.nutrition_facts = record.slug, {}
+        touched = set(record.values)
+        for name, value in record.values.items():
+            setattr(product, name, value)
+        if record.category:
+            product.category_id = self._categories.get(record.category)
+            if product.category_id is None:
+                raise ValidationError({"category": f"Unknown category {record.category!r}."})
+            touched.add("category")
+        elif product.category_id is None:
+            raise ValidationError({"category": "New products need a category."})
+        if record.vendor:
+            product.vendor_id = self._vendors.get(record.vendor)
+            if product.vendor_id is None:
+                raise ValidationError({"vendor": f"No vendor owned by {record.vendor!r}."})
+            touched.add("vendor")
+        if "quantity" in touched or product.pk is None:
+            product.in_stock = (product.quantity or 0) > 0
+            product.limited_stock = 0 < (product.quantity or 0) < 20
+            touched |= {"in_stock", "limited_stock"}
+        # untouched fields keep their stored (or default) values; only check what the record set
+        checked = touched - {"in_stock", "limited_stock"}
+        if product.pk is None:
+            checked |= {"name", "slug"} if record.slug_given else {"name"}
+        product.clean_fields(exclude=(_field_names - checked) | _FK_FIELDS)
+        return product, touched - {"slug"}
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        records = []
+        for line, raw in batch:
+            self.stats.rows += 1
+            try:
+                records.append(Record(line, raw))
+            except (ValueError, ValidationError) as exc:
+                self._fail(line, exc)
+        if not records:
+            return
+        self._resolve(records)
+
+        # products: one lookup for the given slugs, one IN probe to allocate the rest
+        given = {r.slug for r in records if r.slug}
+        products = {p.slug: p for p in Product.objects.filter(slug__in=given).defer("viewers_hll")} if given else {}
+        unnamed = [r for r in records if not r.slug]
+        bases = [slugify(r.values.get("name") or "")[:SLUG_LENGTH] or "product" for r in unnamed]
+        for r, slug in zip(unnamed, unique_slugs(bases, reserved=given, start=self._slug_next)):
+            r.slug = slug
+
+        # variants: one lookup for the matched products' variants, one (or two) for taken SKUs
+        variants = defaultdict(list)   # product slug -> current variants
+        with_variants = [products[r.slug].pk for r in records if r.variants and r.slug in products]
+        slug_of = {p.pk: p.slug for p in products.values()}
+        for v in ProductVariant.objects.filter(product__in=with_variants).order_by("pk") if with_variants else ():
+            variants[slug_of[v.product_id]].append(v)
+        taken = taken_skus(
+            (base for r in records if r.variants for base in sku_bases(r.slug, variants[r.slug], r.variants)),
+            {sku for r in records if r.variants for sku in requested_skus(r.variants)},
+        )
+        taken |= {v.sku for vs in variants.values() for v in vs}
+
+        fields, changed, specs, counted = set(), set(), {}, {}
+        for r in records:
+            try:
+                product, touched = self._plan_product(r, products.get(r.slug))
+                planned = None
+                if r.variants:
+                    planned = [copy.copy(v) for v in variants[r.slug]]
+                    created, updated, _ = plan_variants(product, planned, r.variants, taken)
+                    planned += created
+                spec_rows = build_specifications(r.specs) if r.specs is not None else None
+            except (ValueError, TypeError, ValidationError) as exc:
+                self._fail(r.line, exc)
+                continue
+            products[r.slug] = product
+            fields |= touched
+            if planned is not None:
+                variants[r.slug] = planned
+                changed.update(v.pk for v in updated)
+            if spec_rows is not None:
+                specs[r.slug] = spec_rows
+            counted[r.slug] = None   # ordered set
+
+        to_create = [products[s] for s in counted if products[s].pk is None]
+        to_update = [products[s] for s in counted if products[s].pk is not None]
+        if to_create:
+            insert_products(to_create, fields)
+        if to_update and fields:
+            now = timezone.now()
+            for product in to_update:
+                product.updated_at = now
+            update_rows(Product, to_update, sorted(fields) + ["updated_at"])
+
+        new_variants, changed_variants = [], []
+        for slug, vs in variants.items():
+            for v in vs:
+                if v.pk is None:
+                    v.product = products[slug]
+                    new_variants.append(v)
+                elif v.pk in changed:
+                    changed_variants.append(v)
+        if new_variants:
+            ProductVariant.objects.bulk_create(new_variants)
+        if changed_variants:
+            now = timezone.now()
+            for v in changed_variants:
+                v.updated_at = now
+            update_rows(ProductVariant, changed_variants, VARIANT_FIELDS + ["sku", "updated_at"])
+        sync_variant_attributes(new_variants + changed_variants)
+
+        if specs:
+            counts = replace_specifications({products[slug]: rows for slug, rows in specs.items()})
+            self.stats.specifications += counts["created"] + counts["updated"]
+
+        self.stats.created += len(to_create)
+        self.stats.updated += len(to_update)
+        self.stats.variants_created += len(new_variants)
+        self.stats.variants_updated += len(changed_variants)
+        if self.dry_run:
+            transaction.set_rollback(True)
+
+
+# ─────── export ───────
+VARIANT_COLUMNS = {   # payload key -> ProductVariant field
+    "sku": "sku", "weight_value": "weight_value", "weight_unit": "weight_unit", "price": "price_override",
+    "stock": "quantity", "is_active": "is_active", "mrp": "mrp", "min_order_qty": "min_order_qty",
+    "step_qty": "step_qty", "attributes": "attributes",
+}
+SPEC_COLUMNS = ("group", "name", "value", "unit", "is_highlight", "sort_order")
+
+
+def export_records(queryset=None, chunk_size=CHUNK_SIZE):
+    """Record dicts for every product in `queryset`, in primary-key order; variants and specs are fetched per chunk."""
+    qs = (queryset if queryset is not None else Product.objects.all()).order_by("pk")
+    qs = qs.values("pk", *PRODUCT_FIELDS, "category__slug", "vendor__user__email")
+    last = 0
+    while True:
+        chunk = list(qs.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        last = chunk[-1]["pk"]
+        pks = [row["pk"] for row in chunk]
+        variants, specs = defaultdict(list), defaultdict(list)
+        for v in ProductVariant.objects.filter(product__in=pks).order_by("pk").values("product_id", *VARIANT_COLUMNS.values()):
+            variants[v["product_id"]].append({key: v[field] for key, field in VARIANT_COLUMNS.items()})
+        for s in ProductSpecification.objects.filter(product__in=pks).order_by("sort_order", "pk").values("product_id", *SPEC_COLUMNS):
+            specs[s.pop("product_id")].append(s)
+        for row in chunk:
+            pk = row.pop("pk")
+            row["category"] = row.pop("category__slug")
+            row["vendor"] = row.pop("vendor__user__email")
+            row["variants"] = variants.get(pk, [])
+            row["specifications"] = specs.get(pk, [])
+            yield row
+
+
+def _cell(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+
+
+def iter_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for r in records:
+        yield writer.writerow([_cell(r[c]) for c in COLUMNS])
+
+
+def iter_jsonl(records):
+    for r in records:
+        yield json.dumps({c: r[c] for c in COLUMNS}, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
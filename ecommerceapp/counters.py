@@ -0,0 +1,185 @@
+"""
+Write-behind counters.
+
+Hot popularity counters (Product.views_count / carts_count / wishes_count,
+BlogPost.views_count) are not written per hit. `incr()` adds the delta to an
+in-process buffer; a daemon thread merges the deltas and flushes them every
+COUNTER_FLUSH_INTERVAL_MS with one UPDATE ... CASE per table (chunked by pk),
+so a popular row takes one lock per flush instead of one per page view.
+
+Distinct product viewers are buffered the same way as per-(product, day)
+HyperLogLog sketches and merged into ProductViewerSketch / Product.viewers_hll
+on each flush.
+
+Cart and wishlist counts go up in CartItem / WishlistItem.save and down in a
+post_delete receiver, so queryset deletes and cascades count too. Deletes that
+bypass signals (raw SQL, truncates, restores) do not.
+
+Counts may lag by up to one interval and deltas still buffered when a process
+is killed are lost, so these counters drift: run `manage.py reconcile_counters`
+periodically (e.g. nightly); it recomputes the counts that have a source table
+(carts, wishes) from scratch.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .sketches import HyperLogLog
+
+log = logging.getLogger(__name__)
+
+FLUSH_CHUNK = 500
+
+
+class CounterBuffer:
+    def __init__(self, interval_ms=5000):
+        self.interval = max(10, interval_ms) / 1000
+        self._deltas = defaultdict(int)   # (model, field, pk) -> delta
+        self._viewers = {}                # (product_id, day) -> HyperLogLog
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def add(self, model, pk, field: str, n: int = 1):
+        with self._lock:
+            self._deltas[(model, field, pk)] += n
+        self._ensure_thread()
+
+    def add_viewer(self, product_id, day, viewer_key: str):
+        with self._lock:
+            hll = self._viewers.get((product_id, day))
+            if hll is None:
+                hll = self._viewers[(product_id, day)] = HyperLogLog()
+            hll.add(viewer_key)
+        self._ensure_thread()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._deltas) + len(self._viewers)
+
+    def flush(self) -> int:
+        """Write all buffered deltas; returns the number of rows updated."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+            viewers, self._viewers = self._viewers, {}
+
+        by_model = defaultdict(lambda: defaultdict(dict))   # model -> pk -> {field: delta}
+        for (model, field, pk), n in deltas.items():
+            if n:
+                by_model[model][pk][field] = n
+
+        updated = 0
+        for model, rows in by_model.items():
+            pks = list(rows)
+            for i in range(0, len(pks), FLUSH_CHUNK):
+                chunk = {pk: rows[pk] for pk in pks[i:i + FLUSH_CHUNK]}
+                try:
+                    updated += _apply(model, chunk)
+                except Exception:
+                    log.exception("Counter flush failed for %s", model.__name__)
+                    # put the deltas back so the next flush retries them
+                    with self._lock:
+                        for pk, fields in chunk.items():
+                            for field, n in fields.items():
+                                self._deltas[(model, field, pk)] += n
+
+        if viewers:
+            from .models import merge_viewer_sketches
+            try:
+                updated += merge_viewer_sketches(viewers)
+            except Exception:
+                log.exception("Viewer sketch flush failed")
+                with self._lock:
+                    for key, hll in viewers.items():
+                        if key in self._viewers:
+                            hll.merge(self._viewers[key])
+                        self._viewers[key] = hll
+        return updated
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.pending():
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+                self._thread.start()
+
+
+def _apply(model, rows: dict) -> int:
+    """One UPDATE for `rows` ({pk: {field: delta}}), clamping counters at zero."""
+    fields = {f for deltas in rows.values() for f in deltas}
+    values = {}
+    for field in fields:
+        whens = [When(pk=pk, then=Value(d[field])) for pk, d in rows.items() if d.get(field)]
+        delta = Case(*whens, default=Value(0), output_field=IntegerField())
+        values[field] = Greatest(F(field) + delta, Value(0))
+    return model.objects.filter(pk__in=list(rows)).update(**values)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_counter_buffer() -> CounterBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = CounterBuffer(interval_ms=getattr(settings, "COUNTER_FLUSH_INTERVAL_MS", 5000))
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        pass
+
+
+def incr(model, pk, field: str, n: int = 1):
+    """
+    Add `n` to `model.field` for row `pk` once the current transaction commits.
+    With COUNTER_WRITE_BEHIND off the UPDATE runs immediately instead.
+    """
+    if not n:
+        return
+    if not getattr(settings, "COUNTER_WRITE_BEHIND", True):
+        transaction.on_commit(lambda: _apply(model, {pk: {field: n}}))
+        return
+    transaction.on_commit(lambda: get_counter_buffer().add(model, pk, field, n))
+
+
+def add_viewer(product_id, viewer_key: str):
+    """Count `viewer_key` (user / session + IP) as a viewer of the product today."""
+    day = timezone.localdate()
+    if not getattr(settings, "COUNTER_WRITE_BEHIND", True):
+        from .models import merge_viewer_sketches
+        hll = HyperLogLog()
+        hll.add(viewer_key)
+        transaction.on_commit(lambda: merge_viewer_sketches({(product_id, day): hll}))
+        return
+    transaction.on_commit(lambda: get_counter_buffer().add_viewer(product_id, day, viewer_key))
+
+
+def flush() -> int:
+    return get_counter_buffer().flush() if _buffer is not None else 0
@@ -1,22 +1,59 @@
 import django_filters as df
+from django.db.models import Case, F, When
+from rest_framework.filters import SearchFilter
 from .models import *
+from . import search
+
+def parse_attr_filters(params) -> dict:
+    """
+    {name: [values]} from ?attr=Color:Blue,Red&attr=Size:M (values OR'd, names AND'd)
+    plus the older single ?attr_name=Color&attr_value=Blue.
+    """
+    groups = {}
+    for raw in params.getlist("attr") if hasattr(params, "getlist") else []:
+        name, sep, values = str(raw).partition(":")
+        values = [v.strip() for v in values.split(",") if v.strip()]
+        if sep and name.strip() and values:
+            groups.setdefault(name.strip(), []).extend(values)
+    if params.get("attr_name") and params.get("attr_value"):
+        groups.setdefault(params["attr_name"].strip(), []).append(params["attr_value"].strip())
+    return groups
+
+def filter_by_attributes(qs, groups: dict, exclude: str = None):
+    """Products with an active variant matching every group (any value within a group)."""
+    for name, values in groups.items():
+        if name == exclude:
+            continue
+        matching = VariantAttribute.objects.filter(name=name, value__in=values, is_active=True).values("product_id")
+        qs = qs.filter(pk__in=matching)
+    return qs
+
+class FullTextSearchFilter(SearchFilter):
+    """?search= for blog posts through the full-text index (search.py) instead of LIKE over the stored HTML."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = " ".join(self.get_search_terms(request))
+        if not text:
+            return queryset
+        return search.matching(queryset, text) | queryset.filter(category__name__icontains=text)
 
 class ProductFilter(df.FilterSet):
-    min_price = df.NumberFilter(field_name="price", lookup_expr="gte")
-    max_price = df.NumberFilter(field_name="price", lookup_expr="lte")
-    category  = df.CharFilter(method="filter_category")
-    search    = df.CharFilter(field_name="name", lookup_expr="icontains")
+    min_price = df.NumberFilter(method="filter_price")   # INR list price
+    max_price = df.NumberFilter(method="filter_price")
+    category_tree = df.CharFilter(method="filter_category")   # slug; includes subcategories
+    category__slug = df.CharFilter(field_name="category__slug")
     featured      = df.BooleanFilter()
     new_arrival   = df.BooleanFilter()
     in_stock      = df.BooleanFilter()
 
-    # Variant attribute filter (e.g., ?attr_name=Color&attr_value=Blue)
+    # Variant attribute filters, e.g. ?attr=Color:Blue,Red&attr=Size:M or ?attr_name=Color&attr_value=Blue
+    attr       = df.CharFilter(method="filter_attr")
     attr_name  = df.CharFilter(method="filter_attr")
     attr_value = df.CharFilter(method="filter_attr")
 
     class Meta:
         model = Product
-        fields = ["featured", "new_arrival", "in_stock"]
+        fields = ["featured", "new_arrival", "in_stock", "category", "is_published", "slug"]
 
     def filter_category(self, qs, name, value):
         try:
@@ -31,14 +68,16 @@ class ProductFilter(df.FilterSet):
             todo = list(children)
         return qs.filter(category_id__in=ids)
 
+    def filter_price(self, qs, name, value):
+        # the price base_price_for_country("IN") reads: price_inr, else the legacy `price`
+        qs = qs.alias(list_price_inr=Case(When(price_inr=0, then=F("price")), default=F("price_inr")))
+        return qs.filter(**{"list_price_inr__gte" if name == "min_price" else "list_price_inr__lte": value})
+
     def filter_attr(self, qs, name, value):
-        params = self.data
-        attr_name = params.get("attr_name")
-        attr_value = params.get("attr_value")
-        if not attr_name or not attr_value:
-            return qs
-        return qs.filter(
-            variants__is_active=True,
-            variants__attributes__has_key=attr_name,
-            variants__attributes__contains={attr_name: attr_value},
-        ).distinct()
+        return qs   # applied once for all attr params in filter_queryset
+
+    skip_attributes = False   # set by the facets view, which applies attribute groups itself
+
+    def filter_queryset(self, queryset):
+        qs = super().filter_queryset(queryset)
+        return qs if self.skip_attributes else filter_by_attributes(qs, parse_attr_filters(self.data))
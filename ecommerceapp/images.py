@@ -0,0 +1,199 @@
+"""
+Asynchronous image processing.
+
+Models using `ProcessedImageMixin` store the uploaded original and return;
+once the transaction commits the row is handed to a small thread pool
+(IMAGE_WORKERS threads, Pillow releases the GIL while coding) that converts
+the file to WebP (plus fixed-width renditions for models using
+`RenditionImageMixin`) and swaps the field with a conditional UPDATE. If the image
+was replaced or the row deleted meanwhile, the swap matches nothing and the
+references taken on the new blobs are dropped again. `image_status` exposes pending / processing / ready /
+failed to the API; `manage.py process_images` picks up rows a restart left
+behind.
+
+Bulk uploads skip the queue: `encode_many()` fans decoding/encoding out over
+a process pool (IMAGE_PROCESS_WORKERS, one per core by default) and the
+caller writes all rows at once with `encoded_values()`.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import blobs
+
+log = logging.getLogger(__name__)
+
+_executor = None
+_process_pool = None
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, getattr(settings, "IMAGE_WORKERS", 2)), thread_name_prefix="image-worker",
+            )
+    return _executor
+
+
+def schedule(instance) -> None:
+    """Process `instance`'s image after commit (inline when IMAGE_PROCESSING_ASYNC is off)."""
+    args = (instance._meta.label, instance.pk, instance.IMAGE_FIELD, getattr(instance, instance.IMAGE_FIELD).name)
+    if not getattr(settings, "IMAGE_PROCESSING_ASYNC", True):
+        transaction.on_commit(lambda: process(*args))
+        return
+    transaction.on_commit(lambda: submit(*args))
+
+
+def submit(label, pk, field, name) -> bool:
+    key = (label, pk, field, name)
+    with _lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    _get_executor().submit(_run, key)
+    return True
+
+
+def _run(key):
+    close_old_connections()
+    try:
+        process(*key)
+    except Exception:
+        log.exception("image processing failed for %r", key)
+    finally:
+        with _lock:
+            _in_flight.discard(key)
+        close_old_connections()
+
+
+def _stamp(model) -> dict:
+    return {"updated_at": timezone.now()} if any(f.name == "updated_at" for f in model._meta.fields) else {}
+
+
+def process(label, pk, field, name) -> bool:
+    """Convert one stored original to WebP (plus renditions) and swap it in. Returns True if swapped."""
+    model = apps.get_model(label)
+    current = model.objects.filter(pk=pk, **{field: name})
+    instance = current.first()
+    if instance is None:
+        return False   # replaced or deleted since it was queued
+    current.update(image_status="processing")
+
+    storage = model._meta.get_field(field).storage
+    widths = getattr(model, "RENDITION_WIDTHS", ())
+    held = instance.held_blobs()
+    try:
+        with storage.open(name, "rb") as fh:
+            result = encode_upload(fh.read(), name, widths)
+        values = encoded_values(storage, result, field, renditions=bool(widths))
+    except Exception as exc:
+        current.update(image_status="failed", **_stamp(model))
+        log.warning("could not convert %s #%s %s: %s", label, pk, name, exc)
+        return False
+
+    swapped = current.update(**values, **_stamp(model))
+    # the references taken above now belong to the row (or are dropped if it moved on),
+    # and whatever the row held before is released; unreferenced files are left to the sweeper
+    blobs.release(held if swapped else _blob_names(values, field))
+    return bool(swapped)
+
+
+# ─────── bulk encoding (process pool) ───────
+def _init_process_worker():
+    import django
+    django.setup()   # workers are spawned, so each sets Django up afresh
+
+
+def _get_process_pool():
+    global _process_pool
+    workers = getattr(settings, "IMAGE_PROCESS_WORKERS", 0) or os.cpu_count() or 1
+    if workers <= 1:
+        return None   # encode inline
+    with _lock:
+        if _process_pool is None:
+            # spawn, not fork: the pool starts inside a web process whose daemon threads may hold
+            # locks mid-fork, and forked children would inherit its DB connections and sockets
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_process_worker,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _process_pool
+
+
+def encode_upload(data: bytes, name: str, widths=()) -> dict:
+    """
+    WebP bytes plus renditions for one upload; runs in a worker process, so it
+    takes and returns plain bytes. Raises if `data` is not a readable image.
+    """
+    from .models import compress_to_webp, webp_renditions
+
+    src = BytesIO(data)
+    src.name = name
+    content = compress_to_webp(src)
+    with Image.open(content) as img:
+        width = img.width
+    src.seek(0)
+    renditions = {w: (r.name, r.read()) for w, r in webp_renditions(src, widths).items()} if widths else {}
+    content.seek(0)
+    return {"name": content.name, "data": content.read(), "width": width, "renditions": renditions}
+
+
+def encode_many(uploads, widths=()) -> list:
+    """
+    `encode_upload` for every (data, name) in `uploads`, in parallel across
+    processes. Returns results in order; a failed upload yields its exception.
+    """
+    global _process_pool
+    pool = _get_process_pool() if len(uploads) > 1 else None
+    if pool is not None:
+        futures = [pool.submit(encode_upload, data, name, widths) for data, name in uploads]
+        results = [f.exception() or f.result() for f in futures]
+        if not any(isinstance(r, BrokenProcessPool) for r in results):
+            return results
+        log.warning("image process pool died; encoding inline")
+        with _lock:
+            _process_pool = None
+    out = []
+    for data, name in uploads:
+        try:
+            out.append(encode_upload(data, name, widths))
+        except Exception as exc:
+            out.append(exc)
+    return out
+
+
+def encoded_values(storage, result, field="image", renditions=True) -> dict:
+    """Store an `encode_upload` result as blobs; returns the model field values (references taken)."""
+    stored = []
+    try:
+        stored.append(blobs.store(storage, ContentFile(result["data"], name=result["name"])))
+        values = {field: stored[0], "image_status": "ready"}
+        if renditions:
+            files = {}
+            for w, (n, data) in result["renditions"].items():
+                files[str(w)] = blobs.store(storage, ContentFile(data, name=n))
+                stored.append(files[str(w)])
+            values["image_renditions"] = {"source": stored[0], "width": result["width"], "files": files}
+    except Exception:
+        blobs.release(stored)
+        raise
+    return values
+
+
+def _blob_names(values, field="image") -> list:
+    return [values[field], *((values.get("image_renditions") or {}).get("files") or {}).values()]
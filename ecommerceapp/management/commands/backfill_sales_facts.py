@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ecommerceapp.models import DailySalesFact, Order, OrderPayment, day_bounds
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySalesFact rollup from orders and payments (two grouped queries per run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD). Default: earliest order.")
+        parser.add_argument("--days", type=int, help="Rebuild only the last N days.")
+
+    def handle(self, *args, **opts):
+        today = timezone.localdate()
+        if opts["days"]:
+            since = today - timedelta(days=opts["days"] - 1)
+        elif opts["since"]:
+            try:
+                since = date.fromisoformat(opts["since"])
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+        else:
+            first = Order.objects.order_by("created_at").values_list("created_at", flat=True).first()
+            if first is None:
+                self.stdout.write("No orders; nothing to backfill.")
+                return
+            since = timezone.localdate(first)
+
+        start = day_bounds(since)[0]
+        facts = {}
+
+        def _row(day, currency):
+            return facts.setdefault((day, currency or "INR"), DailySalesFact(
+                date=day, currency=currency or "INR", orders=0, customers=0, revenue=Decimal("0.00"),
+            ))
+
+        for r in (
+            Order.objects.filter(created_at__gte=start)
+            .annotate(day=TruncDate("created_at")).values("day", "currency")
+            .annotate(orders=Count("id"), customers=Count("user_id", distinct=True))
+        ):
+            f = _row(r["day"], r["currency"])
+            f.orders, f.customers = r["orders"], r["customers"]
+
+        for r in (
+            OrderPayment.objects.filter(status="paid", created_at__gte=start)
+            .annotate(day=TruncDate("created_at")).values("day", "currency")
+            .annotate(revenue=Sum("amount"))
+        ):
+            _row(r["day"], r["currency"]).revenue = r["revenue"] or Decimal("0.00")
+
+        with transaction.atomic():
+            DailySalesFact.objects.filter(date__gte=since).delete()
+            DailySalesFact.objects.bulk_create(facts.values(), batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(facts)} rollup row(s) since {since}."))
@@ -0,0 +1,103 @@
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from ecommerceapp.models import compress_to_webp
+
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+
+
+def legacy_compress_to_webp(file_obj, max_kb=150, quality_start=90):
+    """The encoder as it was before bounded encodes, kept for comparison."""
+    img = Image.open(file_obj)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    q = quality_start
+    best = None
+    while q >= 20:
+        buf = BytesIO()
+        img.save(buf, "WEBP", quality=q, method=6)
+        size_kb = buf.tell() / 1024
+        if size_kb <= max_kb:
+            buf.seek(0)
+            return ContentFile(buf.read(), name="image.webp")
+        best = buf
+        q -= 10
+
+    if best is not None:
+        best.seek(0)
+        return ContentFile(best.read(), name="image.webp")
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+    return ContentFile(file_obj.read(), name="image.webp")
+
+
+def _measure(fn, data: bytes, repeat: int, **kwargs):
+    """Best-of-`repeat` CPU seconds, output size, dimensions and whether the output is WebP."""
+    best = None
+    for _ in range(repeat):
+        src = BytesIO(data)
+        src.name = "sample"
+        started = time.process_time()
+        out = fn(src, **kwargs).read()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    with Image.open(BytesIO(out)) as img:
+        return best, len(out), img.size, img.format == "WEBP"
+
+
+class Command(BaseCommand):
+    help = "Compare CPU time and output size of compress_to_webp against the previous encoder over sample images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Image files or directories (searched recursively).")
+        parser.add_argument("--max-kb", type=int, default=150)
+        parser.add_argument("--repeat", type=int, default=1, help="Runs per image; the fastest is reported.")
+
+    def handle(self, *args, **opts):
+        files = []
+        for p in map(Path, opts["paths"]):
+            if p.is_dir():
+                files += sorted(f for f in p.rglob("*") if f.suffix.lower() in EXTENSIONS)
+            elif p.is_file():
+                files.append(p)
+        if not files:
+            raise CommandError("No images found.")
+
+        repeat = max(1, opts["repeat"])
+        totals = {"old": [0.0, 0, 0], "new": [0.0, 0, 0]}   # cpu seconds, bytes, non-WebP outputs
+        self.stdout.write(f"{'file':40} {'in KB':>8} {'old s':>7} {'old KB':>8} {'new s':>7} {'new KB':>8}  new size")
+        for path in files:
+            data = path.read_bytes()
+            try:
+                old = _measure(legacy_compress_to_webp, data, repeat, max_kb=opts["max_kb"])
+                new = _measure(compress_to_webp, data, repeat, max_kb=opts["max_kb"])
+            except Exception as exc:
+                self.stderr.write(f"{path}: {exc}")
+                continue
+            for key, (cpu, size, _, is_webp) in (("old", old), ("new", new)):
+                totals[key][0] += cpu
+                totals[key][1] += size
+                totals[key][2] += not is_webp
+            self.stdout.write(
+                f"{path.name[:40]:40} {len(data) / 1024:8.1f} {old[0]:7.3f} {old[1] / 1024:8.1f} "
+                f"{new[0]:7.3f} {new[1] / 1024:8.1f}  {new[2][0]}x{new[2][1]}"
+            )
+
+        (old_cpu, old_bytes, old_bad), (new_cpu, new_bytes, new_bad) = totals["old"], totals["new"]
+        self.stdout.write(
+            f"\n{len(files)} image(s)\n"
+            f"old: {old_cpu:.3f}s CPU, {old_bytes / 1024:.1f} KB, {old_bad} non-WebP output(s)\n"
+            f"new: {new_cpu:.3f}s CPU, {new_bytes / 1024:.1f} KB, {new_bad} non-WebP output(s)"
+        )
+        if new_cpu:
+            self.stdout.write(self.style.SUCCESS(
+                f"CPU {old_cpu / new_cpu:.1f}x faster, output {100 * (1 - new_bytes / max(old_bytes, 1)):.0f}% smaller"
+            ))
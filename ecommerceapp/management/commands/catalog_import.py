@@ -0,0 +1,58 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerceapp import catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products, variants and specifications from a CSV or JSON Lines catalog "
+        "(see catalog_export for the format). Records are read as a stream and written in batches; "
+        "invalid records are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file, or - for stdin.")
+        parser.add_argument("--format", dest="fmt", choices=catalog.FORMATS,
+                            help="Default: from the file extension (.csv, otherwise JSON Lines).")
+        parser.add_argument("--batch-size", type=int, default=catalog.BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Validate and plan every batch, then roll it back.")
+        parser.add_argument("--show-errors", type=int, default=20, help="Errors to list in the report.")
+
+    def handle(self, *args, **opts):
+        path = opts["path"]
+        fmt = opts["fmt"] or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        try:
+            fh = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        importer = catalog.CatalogImporter(batch_size=opts["batch_size"], dry_run=opts["dry_run"])
+        started = last = time.monotonic()
+
+        def progress(stats):
+            nonlocal last
+            now = time.monotonic()
+            if now - last >= 1:
+                last = now
+                self.stderr.write(f"  {stats.rows} record(s), {stats.rows / (now - started):.0f}/s")
+
+        try:
+            stats = importer.run(catalog.read_records(fh, fmt), progress=progress)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+        elapsed = time.monotonic() - started
+        for line, message in stats.errors[:max(0, opts["show_errors"])]:
+            self.stderr.write(f"  line {line}: {message}")
+        verb = "would be" if opts["dry_run"] else "were"
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats.rows} record(s) in {elapsed:.1f}s ({stats.rows / max(elapsed, 1e-6):.0f}/s): "
+            f"{stats.created} product(s) {verb} created, {stats.updated} updated; "
+            f"variants {stats.variants_created} created, {stats.variants_updated} updated; "
+            f"{stats.specifications} specification(s) written; {stats.failed} record(s) skipped."
+        ))
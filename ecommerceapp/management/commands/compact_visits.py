@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ecommerceapp import visits
+from ecommerceapp.models import VisitEvent
+
+
+class Command(BaseCommand):
+    help = "Roll old VisitEvents into hourly aggregates, archive them per month and apply retention (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--raw-days", type=int, help="Keep this many days of raw events (default: VISIT_RAW_RETENTION_DAYS).")
+        parser.add_argument("--archive-months", type=int, help="Default: VISIT_ARCHIVE_RETENTION_MONTHS.")
+        parser.add_argument("--aggregate-days", type=int, help="Default: VISIT_AGGREGATE_RETENTION_DAYS.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many raw events would be compacted.")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            days = opts["raw_days"] if opts["raw_days"] is not None else settings.VISIT_RAW_RETENTION_DAYS
+            cutoff = visits.floor_hour(timezone.now() - timedelta(days=days))
+            n = VisitEvent.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f"{n} raw event(s) older than {cutoff:%Y-%m-%d %H:00} would be compacted.")
+            return
+
+        result = visits.run_retention(
+            raw_days=opts["raw_days"],
+            archive_months=opts["archive_months"],
+            aggregate_days=opts["aggregate_days"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {result['compacted']} raw event(s); "
+            f"dropped {len(result['dropped_archives'])} archive table(s); "
+            f"expired {result['expired_aggregates']} hourly aggregate(s)."
+        ))
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import tempfile
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.utils import timezone
+
+from ecommerceapp import blobs
+from ecommerceapp.models import MediaBlob, RenditionImageMixin
+
+QUARANTINE = "_quarantine"
+
+
+def file_fields():
+    """(model, [FileField/ImageField names]) for every installed model that has any."""
+    for model in apps.get_models():
+        if model._meta.proxy or not model._meta.managed:
+            continue
+        names = [f.name for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+        if names:
+            yield model, names
+
+
+def iter_refs(chunk_size: int):
+    """Every stored file name referenced by a row (image renditions included), streamed."""
+    for model, names in file_fields():
+        for row in model._base_manager.values_list(*names).iterator(chunk_size=chunk_size):
+            yield from (name for name in row if name)
+        if issubclass(model, RenditionImageMixin):
+            qs = model._base_manager.exclude(image_renditions={}).values_list("image_renditions", flat=True)
+            for data in qs.iterator(chunk_size=chunk_size):
+                yield from ((data or {}).get("files") or {}).values()
+
+
+def walk(storage, path=""):
+    """Every file under `path`, one directory listing at a time."""
+    dirs, files = storage.listdir(path)
+    for f in files:
+        yield f"{path}/{f}" if path else f
+    for d in dirs:
+        if not path and d == QUARANTINE:
+            continue
+        yield from walk(storage, f"{path}/{d}" if path else d)
+
+
+def chunks(iterable, size):
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Find media files no row references and delete or quarantine them. References are streamed into a "
+        "temporary SQLite file and the storage listing is diffed against it chunk by chunk, so memory stays "
+        "bounded however many files there are. Without --delete / --quarantine only a report is printed."
+    )
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument("--delete", action="store_true", help="Delete orphaned files.")
+        action.add_argument("--quarantine", action="store_true",
+                            help=f"Move orphaned files under {QUARANTINE}/<timestamp>/ instead of deleting them.")
+        parser.add_argument("--grace-hours", type=int, default=24,
+                            help="Leave files modified (and blobs referenced or released) more recently alone.")
+        parser.add_argument("--prefix", action="append", default=[],
+                            help="Only walk these storage directories (repeatable). Default: everything.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--fix-refcounts", action="store_true",
+                            help="Also reset MediaBlob.refcount to the number of rows actually referencing each blob.")
+        parser.add_argument("-o", "--output", help="Write every orphan name to this file.")
+        parser.add_argument("--show", type=int, default=20, help="Orphans to list in the report.")
+
+    def handle(self, *args, **opts):
+        size = max(1, opts["chunk_size"])
+        cutoff = timezone.now() - timedelta(hours=max(0, opts["grace_hours"]))
+        mode = "delete" if opts["delete"] else "quarantine" if opts["quarantine"] else None
+        storage = default_storage
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db = sqlite3.connect(os.path.join(tmp, "refs.sqlite3"))
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            db.execute("CREATE TABLE refs (name TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+            db.execute("CREATE TABLE batch (name TEXT PRIMARY KEY)")
+
+            refs = 0
+            for chunk in chunks(iter_refs(size), size):
+                db.executemany(
+                    "INSERT INTO refs VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET n = n + 1",
+                    ((name,) for name in chunk),
+                )
+                refs += len(chunk)
+            db.commit()
+            self.stdout.write(f"Collected {refs} reference(s).")
+
+            if opts["fix_refcounts"]:
+                self._fix_refcounts(db, size, dry_run=mode is None)
+
+            out = open(opts["output"], "w", encoding="utf-8") if opts["output"] else None
+            try:
+                scanned, orphans, skipped, orphan_bytes = self._sweep(db, storage, size, cutoff, mode, out, opts)
+            finally:
+                if out:
+                    out.close()
+            db.close()
+
+        verb = {"delete": "deleted", "quarantine": "quarantined", None: "would remove"}[mode]
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} file(s); {verb} {orphans} orphan(s), {orphan_bytes / 1048576:.1f} MB; "
+            f"{skipped} orphan(s) inside the {opts['grace_hours']}h grace period left alone."
+        ))
+
+    def _unreferenced(self, db, names):
+        db.executemany("INSERT OR IGNORE INTO batch VALUES (?)", ((n,) for n in names))
+        rows = db.execute("SELECT b.name FROM batch b LEFT JOIN refs r ON r.name = b.name WHERE r.name IS NULL")
+        missing = [name for (name,) in rows]
+        db.execute("DELETE FROM batch")
+        return missing
+
+    def _sweep(self, db, storage, size, cutoff, mode, out, opts):
+        stamp = timezone.now().strftime("%Y%m%d%H%M%S")
+        scanned = orphans = skipped = orphan_bytes = shown = 0
+        roots = [p.strip("/") for p in opts["prefix"]] or [""]
+        for root in roots:
+            try:
+                listing = walk(storage, root)
+                for chunk in chunks(listing, size):
+                    scanned += len(chunk)
+                    candidates = self._unreferenced(db, chunk)
+                    if not candidates:
+                        continue
+                    blob_names = [n for n in candidates if blobs.is_blob_name(n)]
+                    recent_blobs = set(
+                        MediaBlob.objects.filter(name__in=blob_names, updated_at__gte=cutoff).values_list("name", flat=True)
+                    ) if blob_names else set()
+
+                    removed_blobs = []
+                    for name in candidates:
+                        if name in recent_blobs or storage.get_modified_time(name) >= cutoff:
+                            skipped += 1
+                            continue
+                        orphans += 1
+                        orphan_bytes += storage.size(name)
+                        if out:
+                            out.write(name + "\n")
+                        if shown < opts["show"]:
+                            self.stdout.write(f"  orphan: {name}")
+                            shown += 1
+                        if mode == "quarantine":
+                            with storage.open(name, "rb") as fh:
+                                storage.save(f"{QUARANTINE}/{stamp}/{name}", fh)
+                        if mode:
+                            storage.delete(name)
+                            if name in blob_names:
+                                removed_blobs.append(name)
+                    if removed_blobs:
+                        MediaBlob.objects.filter(name__in=removed_blobs).delete()
+            except FileNotFoundError:
+                raise CommandError(f"No such storage directory: {root!r}")
+        return scanned, orphans, skipped, orphan_bytes
+
+    def _fix_refcounts(self, db, size, dry_run):
+        last_pk, drifted = 0, 0
+        while True:
+            rows = list(MediaBlob.objects.filter(pk__gt=last_pk).order_by("pk").only("id", "name", "refcount")[:size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            db.executemany("INSERT OR IGNORE INTO batch VALUES (?)", ((b.name,) for b in rows))
+            counts = dict(db.execute("SELECT r.name, r.n FROM batch b JOIN refs r ON r.name = b.name"))
+            db.execute("DELETE FROM batch")
+            changed = [b for b in rows if b.refcount != counts.get(b.name, 0)]
+            for b in changed:
+                b.refcount = counts.get(b.name, 0)
+            if changed and not dry_run:
+                MediaBlob.objects.bulk_update(changed, ["refcount"])
+            drifted += len(changed)
+        verb = "would fix" if dry_run else "fixed"
+        self.stdout.write(f"Blob refcounts: {verb} {drifted}.")
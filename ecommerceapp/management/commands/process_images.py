@@ -0,0 +1,44 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from ecommerceapp import blobs, images
+from ecommerceapp.models import ProcessedImageMixin, RenditionImageMixin
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert images still waiting for WebP processing (e.g. queued before a restart). "
+        "Runs inline; safe to repeat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true", help="Also retry rows marked failed.")
+        parser.add_argument("--legacy", action="store_true",
+                            help="Also convert rows marked ready that predate the pipeline "
+                                 "(files outside the blob store, or no renditions yet).")
+        parser.add_argument("--limit", type=int, default=0, help="Stop after this many rows per model.")
+
+    def handle(self, *args, **opts):
+        statuses = ["pending", "processing"] + (["failed"] if opts["retry_failed"] else [])
+        total = swapped = 0
+        for model in apps.get_app_config("ecommerceapp").get_models():
+            if not issubclass(model, ProcessedImageMixin):
+                continue
+            field = model.IMAGE_FIELD
+            cond = Q(image_status__in=statuses)
+            if opts["legacy"]:
+                legacy = ~Q(**{f"{field}__startswith": f"{blobs.prefix()}/"})
+                if issubclass(model, RenditionImageMixin):
+                    legacy |= Q(image_renditions={})
+                cond |= Q(image_status="ready") & legacy
+            qs = (
+                model.objects.filter(cond).exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+                .order_by("pk").values_list("pk", field)
+            )
+            if opts["limit"]:
+                qs = qs[:opts["limit"]]
+            for pk, name in qs.iterator(chunk_size=500):
+                total += 1
+                swapped += images.process(model._meta.label, pk, field, name)
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} image(s); {swapped} converted."))
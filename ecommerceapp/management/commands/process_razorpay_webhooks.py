@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ecommerceapp.webhooks import drain
+
+
+class Command(BaseCommand):
+    help = "Apply pending Razorpay webhook events to OrderPayment rows (safe to run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--max-attempts", type=int, default=10,
+                            help="Give up on events whose payment never shows up after this many runs.")
+
+    def handle(self, *args, **opts):
+        n = drain(batch_size=opts["batch_size"], max_attempts=opts["max_attempts"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {n} webhook event(s)."))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from ecommerceapp import counters
+from ecommerceapp.models import CartItem, Product, WishlistItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Product.carts_count / wishes_count from cart and wishlist rows, in pk-ordered chunks. "
+        "View counters have no source table and are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing.")
+
+    def handle(self, *args, **opts):
+        size = max(1, opts["chunk_size"])
+        counters.flush()   # this process's pending deltas first
+
+        last_pk, scanned, fixed = 0, 0, 0
+        while True:
+            products = list(
+                Product.objects.filter(pk__gt=last_pk).order_by("pk")
+                .only("id", "carts_count", "wishes_count")[:size]
+            )
+            if not products:
+                break
+            last_pk = products[-1].pk
+            lo, hi = products[0].pk, last_pk
+
+            carts = dict(
+                CartItem.objects.filter(product_id__gte=lo, product_id__lte=hi)
+                .values("product_id").annotate(n=Count("id")).values_list("product_id", "n")
+            )
+            wishes = dict(
+                WishlistItem.objects.filter(product_id__gte=lo, product_id__lte=hi)
+                .values("product_id").annotate(n=Count("id")).values_list("product_id", "n")
+            )
+
+            drifted = []
+            for p in products:
+                c, w = carts.get(p.pk, 0), wishes.get(p.pk, 0)
+                if (p.carts_count, p.wishes_count) != (c, w):
+                    p.carts_count, p.wishes_count = c, w
+                    drifted.append(p)
+            if drifted and not opts["dry_run"]:
+                Product.objects.bulk_update(drifted, ["carts_count", "wishes_count"])
+            scanned += len(products)
+            fixed += len(drifted)
+
+        verb = "would fix" if opts["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} product(s); {verb} {fixed}."))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ecommerceapp import rendering, search
+from ecommerceapp.catalog import update_rows
+from ecommerceapp.models import BlogPost
+
+FIELDS = ["content_html", "content_text", "content_hash"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render the markdown of blog posts whose stored HTML came from a different extension set or "
+        "markdown version (or every post with --force), across a process pool. Posts are read and written "
+        "in pk order a chunk at a time; updated_at is left alone. Safe to repeat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Re-render posts that are up to date too.")
+        parser.add_argument("--workers", type=int, default=0,
+                            help="Worker processes (default BLOG_RENDER_WORKERS; 0 = one per core, 1 = inline).")
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the posts that would be re-rendered.")
+
+    def handle(self, *args, **opts):
+        if rendering.markdown is None:
+            raise CommandError("The markdown package is not installed.")
+        size = max(1, opts["chunk_size"])
+        scanned = rendered = 0
+        last_pk = 0
+        executor = None if opts["dry_run"] else rendering.pool(opts["workers"])
+        try:
+            while True:
+                rows = list(
+                    BlogPost.objects.filter(pk__gt=last_pk).exclude(content_markdown="").order_by("pk")
+                    .values_list("pk", "content_markdown", "content_hash", "title", "excerpt", "tags_csv")[:size]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                scanned += len(rows)
+                stale = {}
+                for pk, md, stored, title, excerpt, tags_csv in rows:
+                    digest = rendering.content_hash(md)
+                    if opts["force"] or digest != stored:
+                        stale[pk] = BlogPost(pk=pk, title=title, excerpt=excerpt, tags_csv=tags_csv, content_hash=digest)
+                rendered += len(stale)
+                if not stale or opts["dry_run"]:
+                    continue
+                md_by_pk = {pk: md for pk, md, *_ in rows}
+                for pk, html, text in rendering.render_many([(pk, md_by_pk[pk]) for pk in stale], executor):
+                    stale[pk].content_html, stale[pk].content_text = html, text
+                with transaction.atomic():
+                    update_rows(BlogPost, stale.values(), FIELDS)
+                    search.index_posts(list(stale.values()))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        verb = "would re-render" if opts["dry_run"] else "re-rendered"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} post(s); {verb} {rendered}."))
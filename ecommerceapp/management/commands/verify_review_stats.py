@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from ecommerceapp.models import Product, ProductRatingSummary, ProductReview, rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = "Compare rating summaries and Product.rating_avg/reviews_count with the approved reviews (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--fix", action="store_true", help="Rebuild the products that drifted.")
+
+    def handle(self, *args, **opts):
+        size = max(1, opts["chunk_size"])
+        last_pk, scanned, drifted = 0, 0, []
+        while True:
+            products = list(
+                Product.objects.filter(pk__gt=last_pk).order_by("pk")
+                .values_list("pk", "rating_avg", "reviews_count")[:size]
+            )
+            if not products:
+                break
+            last_pk = products[-1][0]
+            ids = [pk for pk, _, _ in products]
+
+            actual = {pk: dict.fromkeys(range(1, 6), 0) for pk in ids}
+            for r in (
+                ProductReview.objects.filter(product_id__in=ids, is_approved=True)
+                .values("product_id", "rating").annotate(n=Count("id")).order_by()
+            ):
+                actual[r["product_id"]][min(max(int(r["rating"] or 1), 1), 5)] += r["n"]
+            summaries = ProductRatingSummary.objects.in_bulk(ids)
+
+            for pk, avg, count in products:
+                hist = actual[pk]
+                summary = summaries.get(pk)
+                if summary is None:
+                    ok = not any(hist.values()) and count == 0
+                else:
+                    ok = summary.histogram == hist and (avg, count) == (summary.average, summary.count)
+                if not ok:
+                    drifted.append(pk)
+            scanned += len(products)
+
+        self.stdout.write(f"Scanned {scanned} product(s); {len(drifted)} out of date.")
+        if drifted and opts["fix"]:
+            for i in range(0, len(drifted), size):
+                rebuild_review_stats(drifted[i:i + size])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(drifted)} product(s)."))
+        elif drifted:
+            self.stdout.write(f"First ids: {drifted[:20]} (run with --fix to rebuild)")
@@ -0,0 +1,162 @@
+"""
+Request middleware.
+
+VisitEventMiddleware records hits as VisitEvent rows without adding a write
+to the request: events go into a bounded in-process buffer that a daemon
+thread flushes with bulk_create every VISIT_FLUSH_BATCH events or
+VISIT_FLUSH_INTERVAL_MS milliseconds, whichever comes first. When the buffer
+is full new events are dropped (and counted) instead of slowing requests down.
+Every tracked hit (before sampling) also feeds the in-memory trending sketch.
+"""
+import atexit
+import ipaddress
+import logging
+import queue
+import random
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import trending
+
+log = logging.getLogger(__name__)
+
+DEFAULT_EXCLUDE_PREFIXES = ("/static/", "/media/", "/dev-admin/", "/favicon.ico")
+DEFAULT_EXCLUDE_METHODS = ("OPTIONS", "HEAD")
+
+
+class VisitBuffer:
+    def __init__(self, batch_size=200, interval_ms=1000, max_size=10000):
+        self.batch_size = max(1, batch_size)
+        self.interval = max(10, interval_ms) / 1000
+        self.queue = queue.Queue(maxsize=max_size)
+        self.dropped = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, event: dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+        self._ensure_thread()
+        return True
+
+    def _take(self, limit):
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def flush(self) -> int:
+        """Write everything currently buffered; returns the number of rows inserted."""
+        from .models import VisitEvent
+
+        total = 0
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return total
+            VisitEvent.objects.bulk_create([VisitEvent(**e) for e in batch], batch_size=self.batch_size)
+            total += len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self.queue.empty():
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("VisitEvent flush failed")
+            finally:
+                close_old_connections()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="visit-buffer", daemon=True)
+                self._thread.start()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_visit_buffer() -> VisitBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VisitBuffer(
+                    batch_size=getattr(settings, "VISIT_FLUSH_BATCH", 200),
+                    interval_ms=getattr(settings, "VISIT_FLUSH_INTERVAL_MS", 1000),
+                    max_size=getattr(settings, "VISIT_QUEUE_MAX", 10000),
+                )
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception:
+        pass
+
+
+def client_ip(request):
+    fwd = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    ip = fwd.split(",")[0].strip() if fwd else request.META.get("REMOTE_ADDR", "")
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+
+class VisitEventMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "VISIT_TRACKING_ENABLED", True)
+        self.sample_rate = float(getattr(settings, "VISIT_SAMPLE_RATE", 1.0))
+        self.exclude_prefixes = tuple(getattr(settings, "VISIT_EXCLUDE_PREFIXES", DEFAULT_EXCLUDE_PREFIXES))
+        self.exclude_methods = {m.upper() for m in getattr(settings, "VISIT_EXCLUDE_METHODS", DEFAULT_EXCLUDE_METHODS)}
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if self.enabled and self._tracked(request):
+            try:
+                trending.record("path", request.path[:512])   # every hit, before sampling
+                if self.sample_rate >= 1 or random.random() < self.sample_rate:
+                    get_visit_buffer().put(self._event(request))
+            except Exception:
+                log.exception("Could not buffer VisitEvent")
+        return response
+
+    def _tracked(self, request) -> bool:
+        if request.method.upper() in self.exclude_methods:
+            return False
+        return not request.path.startswith(self.exclude_prefixes)
+
+    def _event(self, request) -> dict:
+        # read the user after the view ran: DRF token auth sets it on the request late
+        user = getattr(request, "user", None)
+        return {
+            "user_id": user.pk if (user is not None and user.is_authenticated) else None,
+            "ip_address": client_ip(request),
+            "user_agent": request.META.get("HTTP_USER_AGENT", "")[:1000],
+            "method": request.method[:10],
+            "path": request.path[:512],
+            "referer": request.META.get("HTTP_REFERER", "")[:512],
+        }
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RazorpayWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event_id', models.CharField(max_length=64, unique=True)),
+                ('event', models.CharField(db_index=True, max_length=64)),
+                ('payment_id', models.CharField(blank=True, db_index=True, max_length=120)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=12)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='orderpayment',
+            name='transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=120),
+        ),
+        migrations.AddIndex(
+            model_name='razorpaywebhookevent',
+            index=models.Index(fields=['status', 'created_at'], name='ecommerceap_status_0d6082_idx'),
+        ),
+    ]
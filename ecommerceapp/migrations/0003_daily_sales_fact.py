@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:22
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0002_razorpay_webhook_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('currency', models.CharField(default='INR', max_length=12)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('customers', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date', 'currency'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'currency'), name='uq_daily_sales_date_currency')],
+            },
+        ),
+    ]
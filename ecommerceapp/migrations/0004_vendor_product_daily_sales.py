@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:23
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0003_daily_sales_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_daily_sales', to='ecommerceapp.product')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='ecommerceapp.vendor')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['vendor', 'product', 'date'], name='ecommerceap_vendor__bd0207_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'date', 'product'), name='uq_vendor_day_product')],
+            },
+        ),
+    ]
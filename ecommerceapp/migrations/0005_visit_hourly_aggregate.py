@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0004_vendor_product_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitHourlyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('path', models.CharField(max_length=512)),
+                ('method', models.CharField(max_length=10)),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('unique_users', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['path', 'hour'], name='ecommerceap_path_f402b0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'path', 'method'), name='uq_visit_hour_path_method')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0006_product_viewer_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('path', 'Path'), ('product', 'Product')], max_length=16)),
+                ('window_start', models.DateTimeField()),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+                ('top', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-window_start'],
+                'indexes': [models.Index(fields=['kind', 'window_start'], name='ecommerceap_kind_797dc1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('node', 'kind', 'window_start'), name='uq_trending_node_kind_window')],
+            },
+        ),
+    ]
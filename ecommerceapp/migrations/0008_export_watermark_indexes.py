@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0007_trending_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactsubmission',
+            index=models.Index(fields=['updated_at'], name='ecommerceap_updated_e1c363_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='ecommerceap_updated_effb43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['updated_at'], name='ecommerceap_updated_0fcd2e_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0009_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'is_approved', '-created_at'], name='review_product_approved_idx'),
+        ),
+    ]
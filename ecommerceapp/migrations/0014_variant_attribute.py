@@ -0,0 +1,60 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH = 1000
+
+
+def _pairs(attributes):
+    # mirrors models.attribute_pairs at the time of this migration
+    pairs = set()
+    for key, raw in (attributes or {}).items() if isinstance(attributes, dict) else ():
+        name = str(key).strip()[:80]
+        for v in (raw if isinstance(raw, (list, tuple)) else [raw]):
+            if name and v not in (None, "") and not isinstance(v, (dict, list)):
+                pairs.add((name, str(v).strip()[:200]))
+    return pairs
+
+
+def backfill(apps, schema_editor):
+    ProductVariant = apps.get_model("ecommerceapp", "ProductVariant")
+    VariantAttribute = apps.get_model("ecommerceapp", "VariantAttribute")
+    rows = []
+    variants = ProductVariant.objects.values_list("pk", "product_id", "is_active", "attributes")
+    for pk, product_id, is_active, attributes in variants.iterator(chunk_size=BATCH):
+        rows += [
+            VariantAttribute(variant_id=pk, product_id=product_id, is_active=is_active, name=name, value=value)
+            for name, value in _pairs(attributes)
+        ]
+        if len(rows) >= BATCH:
+            VariantAttribute.objects.bulk_create(rows)
+            rows = []
+    if rows:
+        VariantAttribute.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0013_media_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80)),
+                ('value', models.CharField(max_length=200)),
+                ('is_active', models.BooleanField(default=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variant_attributes', to='ecommerceapp.product')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_rows', to='ecommerceapp.productvariant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'value', 'is_active', 'product'], name='variant_attr_filter_idx'), models.Index(fields=['product', 'is_active', 'name', 'value'], name='variant_attr_facet_idx')],
+                'constraints': [models.UniqueConstraint(fields=('variant', 'name', 'value'), name='uq_variant_attribute')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
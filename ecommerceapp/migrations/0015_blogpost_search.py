@@ -0,0 +1,73 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:21
+
+import html
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+from django.utils.html import strip_tags
+
+BATCH = 500
+FTS_TABLE = "ecommerceapp_blogpost_fts"
+
+
+def _plain_text(rendered_html):
+    # mirrors search.plain_text at the time of this migration
+    return " ".join(html.unescape(strip_tags(rendered_html or "")).split())
+
+
+def forwards(apps, schema_editor):
+    BlogPost = apps.get_model("ecommerceapp", "BlogPost")
+    connection = schema_editor.connection
+    posts = []
+    for post in BlogPost.objects.only("id", "content_html").iterator(chunk_size=BATCH):
+        post.content_text = _plain_text(post.content_html)
+        posts.append(post)
+    BlogPost.objects.bulk_update(posts, ["content_text"], batch_size=BATCH)
+
+    if connection.vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "title, excerpt, body, tags, tokenize = 'porter unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            return   # SQLite built without FTS5: search falls back to LIKE over content_text
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body, tags) "
+            "SELECT id, title, excerpt, content_text, tags_csv FROM ecommerceapp_blogpost"
+        )
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE ecommerceapp_blogpost ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(excerpt, '') || ' ' || coalesce(tags_csv, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(content_text, '')), 'C')) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX blogpost_search_idx ON ecommerceapp_blogpost USING GIN (search_vector)"
+        )
+
+
+def backwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS blogpost_search_idx")
+        schema_editor.execute("ALTER TABLE ecommerceapp_blogpost DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0014_variant_attribute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_weights(apps, schema_editor):
+    """
+    Existing databases may hold several variants of a product with the same
+    weight. The oldest one keeps the weight; the others keep their rows (order
+    lines may point at them) but lose weight_value / weight_unit, so the
+    constraint below can be added. They stay reachable by SKU.
+    """
+    ProductVariant = apps.get_model("ecommerceapp", "ProductVariant")
+    dupes = (
+        ProductVariant.objects.filter(weight_value__isnull=False, weight_unit__isnull=False)
+        .values("product_id", "weight_value", "weight_unit")
+        .annotate(n=Count("id")).filter(n__gt=1)
+    )
+    for key in dupes:
+        key.pop("n")
+        pks = list(ProductVariant.objects.filter(**key).order_by("pk").values_list("pk", flat=True))
+        ProductVariant.objects.filter(pk__in=pks[1:]).update(weight_value=None, weight_unit=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0016_blogpost_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_weights, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(condition=models.Q(('weight_unit__isnull', False), ('weight_value__isnull', False)), fields=('product', 'weight_value', 'weight_unit'), name='uq_variant_product_weight'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def backfill(apps, schema_editor):
+    # Which orders the existing per-product rows came from isn't recorded, so the
+    # busiest product's order count is the best (lower-bound) estimate for old days.
+    VendorProductDailySales = apps.get_model("ecommerceapp", "VendorProductDailySales")
+    VendorDailySales = apps.get_model("ecommerceapp", "VendorDailySales")
+    rows = (
+        VendorProductDailySales.objects.values("vendor_id", "date")
+        .annotate(units_sum=Sum("units"), revenue_sum=Sum("revenue"), orders_max=Max("orders"))
+        .order_by()
+    )
+    VendorDailySales.objects.bulk_create(
+        [
+            VendorDailySales(vendor_id=r["vendor_id"], date=r["date"], units=r["units_sum"],
+                             revenue=r["revenue_sum"], orders=r["orders_max"])
+            for r in rows.iterator(chunk_size=1000)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerceapp', '0017_variant_weight_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to='ecommerceapp.vendor')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'date'), name='uq_vendor_day')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
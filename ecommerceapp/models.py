@@ -1,23 +1,25 @@
+import logging
 from pathlib import Path
 from io import BytesIO
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.core.exceptions import ValidationError
-from django.db.models.functions import Lower
+from django.db.models.functions import Greatest, Lower
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db import models, transaction
-from django.db.models import F, Avg, Count
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Count, Sum
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils.text import slugify
 from django.utils import timezone
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from PIL import Image
-try:
-    import markdown  # pip install markdown
-except Exception:
-    markdown = None
+from PIL import Image, ImageOps
+from . import blobs, counters, images, rendering, search
+from .sketches import HyperLogLog
+
+log = logging.getLogger(__name__)
+
 # ─────── User model ───────
 class UserManager(BaseUserManager):
     def _create(self, email, password, **extra):
@@ -88,31 +90,83 @@ def _webp_name_from(file_obj) -> str:
     stem = Path(getattr(file_obj, "name", "image")).stem or "image"
     return f"{stem}.webp"
 
-def compress_to_webp(file_obj, max_kb=150, quality_start=90):
+def _has_alpha(img) -> bool:
+    if img.mode in ("RGBA", "LA", "PA"):
+        return True
+    return img.mode == "P" and "transparency" in img.info
+
+def _webp_encode(img, quality: int) -> bytes:
+    buf = BytesIO()
+    img.save(buf, "WEBP", quality=quality, method=4)
+    return buf.getvalue()
+
+def _open_for_webp(file_obj, max_dim: int):
+    """Decode, orient and cap to `max_dim` px; returns an RGB or RGBA image."""
     img = Image.open(file_obj)
-    if img.mode != "RGB":
+    if img.format == "JPEG":
+        img.draft("RGB", (max_dim, max_dim))   # DCT scaling: decode at 1/2, 1/4 or 1/8 size
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    if _has_alpha(img):
+        img = img.convert("RGBA")
+        if img.getchannel("A").getextrema()[0] == 255:
+            img = img.convert("RGB")   # alpha present but fully opaque
+    elif img.mode != "RGB":
         img = img.convert("RGB")
-
-    q = quality_start
-    best = None
-    while q >= 20:
-        buf = BytesIO()
-        img.save(buf, "WEBP", quality=q, method=6)
-        size_kb = buf.tell() / 1024
-        if size_kb <= max_kb:
-            buf.seek(0)
-            return ContentFile(buf.read(), name=_webp_name_from(file_obj))
-        best = buf
-        q -= 10
-
-    if best is not None:
-        best.seek(0)
-        return ContentFile(best.read(), name=_webp_name_from(file_obj))
-    try:
-        file_obj.seek(0)
-    except Exception:
-        pass
-    return ContentFile(file_obj.read(), name=_webp_name_from(file_obj))
+    return img
+
+def compress_to_webp(file_obj, max_kb=150, quality_start=85, quality_min=40, max_dim=None, max_encodes=3):
+    """
+    Re-encode an image as WebP of at most `max_kb` where possible.
+
+    The image is first capped to `max_dim` px on its long side (JPEGs decode
+    straight at a reduced scale via draft(), others shrink with reduce()
+    before the final resample), transparency is kept, and quality is found by
+    bisecting [quality_min, quality_start] with at most `max_encodes` encodes.
+    If nothing fits, the smallest encode is returned; the result is always WebP.
+    """
+    img = _open_for_webp(file_obj, max_dim or getattr(settings, "IMAGE_MAX_DIMENSION", 2048))
+    limit = max_kb * 1024
+    data = _webp_encode(img, quality_start)
+    if len(data) <= limit:
+        return ContentFile(data, name=_webp_name_from(file_obj))
+    best, smallest = None, data
+    lo, hi = quality_min, quality_start - 1
+    encodes = 1
+    while lo <= hi and encodes < max_encodes:
+        # with nothing fitting yet, the last allowed encode goes straight to the floor
+        q = lo if best is None and encodes == max_encodes - 1 else (lo + hi) // 2
+        data = _webp_encode(img, q)
+        encodes += 1
+        if len(data) <= limit:
+            best, lo = data, q + 1
+        else:
+            hi = q - 1
+        if len(data) < len(smallest):
+            smallest = data
+    return ContentFile(best or smallest, name=_webp_name_from(file_obj))
+
+def webp_renditions(file_obj, widths, quality=75) -> dict:
+    """
+    {width: ContentFile} of WebP copies `width` px wide, one encode each.
+    Widths at or above the source width are skipped (never upscaled); each
+    rendition is resampled from the next larger one, so the source is decoded
+    once and at most at the largest requested width.
+    """
+    widths = sorted({int(w) for w in widths}, reverse=True)
+    if not widths:
+        return {}
+    img = _open_for_webp(file_obj, max(widths) * 2)   # caps the long side; leaves room for portrait images
+    stem = Path(getattr(file_obj, "name", "image")).stem or "image"
+    out = {}
+    for w in widths:
+        if w >= img.width:
+            continue
+        img = img.resize((w, max(1, round(img.height * w / img.width))), Image.Resampling.LANCZOS)
+        out[w] = ContentFile(_webp_encode(img, quality), name=f"{stem}_{w}w.webp")
+    return out
 
 class TimeStampedMixin(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -120,6 +174,152 @@ class TimeStampedMixin(models.Model):
     class Meta:
         abstract = True
 
+IMAGE_STATUS_CHOICES = (
+    ("ready", "Ready"),
+    ("pending", "Pending"),
+    ("processing", "Processing"),
+    ("failed", "Failed"),
+)
+
+class ProcessedImageMixin(models.Model):
+    """
+    Stores the upload as-is and converts IMAGE_FIELD to WebP in the background
+    (see images.py); the result is a content-addressed blob (see blobs.py).
+    """
+    IMAGE_FIELD = "image"
+    image_status = models.CharField(max_length=12, choices=IMAGE_STATUS_CHOICES, default="ready")
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # blobs this row holds a reference on (unknown if loaded with .only()/.defer())
+        obj._held_blobs = None if obj.get_deferred_fields() & set(cls._blob_fields()) else obj.held_blobs()
+        obj._loaded_image = None if cls.IMAGE_FIELD in obj.get_deferred_fields() else obj._image_name()
+        return obj
+
+    @classmethod
+    def _blob_fields(cls):
+        return (cls.IMAGE_FIELD,)
+
+    def held_blobs(self) -> set:
+        f = getattr(self, self.IMAGE_FIELD)
+        return {f.name} if f and blobs.is_blob_name(f.name) else set()
+
+    def image_needs_processing(self) -> bool:
+        f = getattr(self, self.IMAGE_FIELD)
+        return bool(f) and not blobs.is_blob_name(f.name)
+
+    def _image_name(self) -> str:
+        f = getattr(self, self.IMAGE_FIELD)
+        return f.name if f else ""
+
+    def _sync_stored_image(self):
+        """
+        The background worker swaps images in with a queryset update(), so the row may
+        hold a different image than this instance was loaded with. Re-read what it
+        holds: that is what this save releases, and if the caller didn't change the
+        image, the stored one (and its status / renditions) is kept instead of the
+        stale name being written back.
+        """
+        fields = [*self._blob_fields(), "image_status"]
+        stored = type(self)._base_manager.using(self._state.db).filter(pk=self.pk).values(*fields).first()
+        if stored is None:
+            return
+        mine = {f: getattr(self, f) for f in self._blob_fields()}
+        mine[self.IMAGE_FIELD] = self._image_name()
+        if all((stored[f] or "") == (mine[f] or "") for f in mine):
+            return
+        if self._image_name() == getattr(self, "_loaded_image", None):
+            for name in fields:
+                setattr(self, name, stored[name])
+            self._held_blobs = self.held_blobs()
+        else:
+            self._held_blobs = type(self)(**{f: stored[f] for f in self._blob_fields()}).held_blobs()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding and self.pk is not None and (
+            update_fields is None or {*self._blob_fields(), "image_status"} & set(update_fields)
+        ):
+            self._sync_stored_image()
+        pending = self.image_needs_processing()
+        if pending and self.image_status not in ("pending", "processing"):
+            self.image_status = "pending"
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "image_status"}
+        held = getattr(self, "_held_blobs", None)
+        super().save(*args, **kwargs)
+        self._held_blobs = self.held_blobs()
+        self._loaded_image = self._image_name()
+        if held:
+            blobs.release_on_commit(held - self._held_blobs)
+        if pending and self.image_status == "pending":
+            images.schedule(self)
+
+def release_image_blobs(sender, instance, **kwargs):
+    """post_delete receiver for ProcessedImageMixin models (connected in apps.py, so cascades count too)."""
+    blobs.release_on_commit(instance.held_blobs())
+
+class RenditionImageMixin(ProcessedImageMixin):
+    """
+    ProcessedImageMixin that also stores fixed-width WebP renditions for srcset.
+    image_renditions = {"source": <image name>, "width": <image px>, "files": {"160": <name>, ...}}
+    """
+    RENDITION_WIDTHS = (160, 480, 1200)
+    image_renditions = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def image_needs_processing(self) -> bool:
+        f = getattr(self, self.IMAGE_FIELD)
+        if not f:
+            return False
+        return super().image_needs_processing() or (self.image_renditions or {}).get("source") != f.name
+
+    @classmethod
+    def _blob_fields(cls):
+        return (cls.IMAGE_FIELD, "image_renditions")
+
+    def held_blobs(self) -> set:
+        files = (self.image_renditions or {}).get("files") or {}
+        return super().held_blobs() | {n for n in files.values() if blobs.is_blob_name(n)}
+
+    def save(self, *args, **kwargs):
+        if self.image_renditions and not getattr(self, self.IMAGE_FIELD):
+            self.image_renditions = {}
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "image_renditions"}
+        super().save(*args, **kwargs)
+
+    def renditions(self) -> list:
+        """[(width, name), ...] narrowest first, ending with the full image when its width is known."""
+        data = self.image_renditions or {}
+        f = getattr(self, self.IMAGE_FIELD)
+        if not f or data.get("source") != f.name:
+            return []
+        out = sorted((int(w), name) for w, name in (data.get("files") or {}).items())
+        if data.get("width"):
+            out.append((int(data["width"]), f.name))
+        return out
+
+# ─────── Media blobs ───────
+class MediaBlob(TimeStampedMixin):
+    """One content-addressed file under MEDIA_BLOB_PREFIX and how many rows reference it."""
+    name     = models.CharField(max_length=255, unique=True)   # blobs/ab/cd/<sha256>.webp
+    sha256   = models.CharField(max_length=64, db_index=True)
+    size     = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["refcount", "updated_at"], name="mediablob_refcount_idx")]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
 # ───── Grocery / Vendor support ─────
 UNIT_CHOICES = (
     ("PCS", "Pieces"),
@@ -130,7 +330,8 @@ UNIT_CHOICES = (
     ("BUNDLE", "Bundle / Pack"),
 )
 
-class Store(TimeStampedMixin):
+class Store(ProcessedImageMixin, TimeStampedMixin):
+    IMAGE_FIELD = "logo"
     name  = models.CharField(max_length=160, unique=True)
     slug  = models.SlugField(unique=True, blank=True)
     logo  = models.ImageField(upload_to=store_upload, null=True, blank=True)
@@ -151,9 +352,6 @@ class Store(TimeStampedMixin):
         if not self.slug:
             self.slug = slugify(self.name) or f"store-{self.pk or ''}"
         super().save(*a, **kw)
-        if self.logo and not str(self.logo.name).lower().endswith(".webp"):
-            self.logo = compress_to_webp(self.logo)
-            super().save(update_fields=["logo"])
 
     def __str__(self): return self.name
 
@@ -220,7 +418,7 @@ def get_current_gold_price_aed_per_g(max_age_minutes: int = 60) -> Decimal:
     return Decimal("250.00")  # fallback
 
 # ─────── Category ───────
-class Category(TimeStampedMixin):
+class Category(RenditionImageMixin, TimeStampedMixin):
     name   = models.CharField(max_length=120)
     slug   = models.SlugField(unique=True, blank=True)
     parent = models.ForeignKey("self", null=True, blank=True, related_name="children", on_delete=models.CASCADE)
@@ -236,9 +434,6 @@ class Category(TimeStampedMixin):
             base = slugify(self.name)
             self.slug = base or f"cat-{self.pk or ''}"
         super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
 
     def __str__(self):
         names = [self.name]
@@ -318,6 +513,10 @@ class Product(TimeStampedMixin):
     reviews_count = models.PositiveIntegerField(default=0)
     rating_avg    = models.DecimalField(max_digits=3, decimal_places=2, default=Decimal("0.00"))
     wishes_count  = models.PositiveIntegerField(default=0)
+    # all-time HyperLogLog of distinct viewers (see ProductViewerSketch) and its cached estimate
+    viewers_hll    = models.BinaryField(null=True, blank=True, editable=False)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    VIEWER_FIELDS  = ("viewers_hll", "unique_viewers")
 
     # def save(self, *args, **kwargs):
     #     if not self.slug:
@@ -351,6 +550,14 @@ class Product(TimeStampedMixin):
         self.in_stock = (self.quantity or 0) > 0
         self.limited_stock = 0 < (self.quantity or 0) < 20
 
+        # The viewer sketch is only written by merge_viewer_sketches; a full save of
+        # an instance loaded earlier must not put back a sketch missing later merges.
+        if not self._state.adding and not args and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            skip = set(self.VIEWER_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                f.attname for f in self._meta.concrete_fields if not f.primary_key and f.attname not in skip
+            ]
+
         super().save(*args, **kwargs)
 
     # Pricing helpers
@@ -386,7 +593,10 @@ class Product(TimeStampedMixin):
 
     # --- helpers for images / description ---
     def primary_image(self):
-        """Return primary image if set, else the first image."""
+        """Return primary image if set, else the first image (from prefetched images when available)."""
+        if "images" in getattr(self, "_prefetched_objects_cache", {}):
+            imgs = sorted(self.images.all(), key=lambda im: im.pk)
+            return next((im for im in imgs if im.is_primary), None) or (imgs[0] if imgs else None)
         return self.images.filter(is_primary=True).first() or self.images.first()
 
     @property
@@ -405,7 +615,7 @@ class Product(TimeStampedMixin):
     def __str__(self):
         return self.name
 
-class ProductImage(TimeStampedMixin):
+class ProductImage(RenditionImageMixin, TimeStampedMixin):
     product    = models.ForeignKey(Product, related_name="images", on_delete=models.CASCADE)
     image      = models.ImageField(upload_to=prod_upload)
     is_primary = models.BooleanField(default=False)
@@ -416,9 +626,6 @@ class ProductImage(TimeStampedMixin):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
         if self.is_primary and self.product_id:
             ProductImage.objects.filter(product_id=self.product_id).exclude(pk=self.pk).update(is_primary=False)
 
@@ -528,7 +735,9 @@ class ProductVariant(TimeStampedMixin):
         if self.sku:
             self.sku = self.sku.strip()
         self.full_clean()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        sync_variant_attributes([self])
+        return result
 
     def unit_price_for_country(self, country_code: str) -> Decimal:
         base = self.price_override if self.price_override is not None else self.product.base_price_for_country(country_code)
@@ -563,16 +772,77 @@ class ProductVariant(TimeStampedMixin):
         attrs = ", ".join(f"{k}={v}" for k, v in (self.attributes or {}).items())
         return f"{self.product.name} [{attrs}]"
 
-class VariantImage(TimeStampedMixin):
+class VariantAttribute(models.Model):
+    """
+    One (name, value) of ProductVariant.attributes, kept in sync by
+    sync_variant_attributes() so attribute filters and facets are indexed
+    lookups instead of JSON containment scans. List values give one row each.
+    """
+    variant   = models.ForeignKey(ProductVariant, related_name="attribute_rows", on_delete=models.CASCADE)
+    product   = models.ForeignKey("Product", related_name="variant_attributes", on_delete=models.CASCADE)
+    name      = models.CharField(max_length=80)
+    value     = models.CharField(max_length=200)
+    is_active = models.BooleanField(default=True)   # mirrors variant.is_active
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["variant", "name", "value"], name="uq_variant_attribute"),
+        ]
+        indexes = [
+            models.Index(fields=["name", "value", "is_active", "product"], name="variant_attr_filter_idx"),
+            models.Index(fields=["product", "is_active", "name", "value"], name="variant_attr_facet_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.variant_id}: {self.name}={self.value}"
+
+def attribute_pairs(attributes) -> set:
+    """{(name, value), ...} for an attributes dict; values are stringified, lists expand."""
+    pairs = set()
+    for key, raw in (attributes or {}).items() if isinstance(attributes, dict) else ():
+        name = str(key).strip()[:80]
+        for v in (raw if isinstance(raw, (list, tuple)) else [raw]):
+            if name and v not in (None, "") and not isinstance(v, (dict, list)):
+                pairs.add((name, str(v).strip()[:200]))
+    return pairs
+
+def sync_variant_attributes(variants) -> None:
+    """Bring VariantAttribute rows of `variants` (saved ProductVariant objects) in line with their attributes."""
+    variants = [v for v in variants if v.pk]
+    if not variants:
+        return
+    wanted = {
+        (v.pk, name, value): (v.product_id, bool(v.is_active))
+        for v in variants for name, value in attribute_pairs(v.attributes)
+    }
+    existing = {
+        (row.variant_id, row.name, row.value): row
+        for row in VariantAttribute.objects.filter(variant__in=[v.pk for v in variants])
+    }
+    stale = [row.pk for key, row in existing.items() if key not in wanted]
+    changed = []
+    for key, (product_id, active) in wanted.items():
+        row = existing.get(key)
+        if row is not None and (row.is_active != active or row.product_id != product_id):
+            row.is_active, row.product_id = active, product_id
+            changed.append(row)
+    with transaction.atomic():
+        if stale:
+            VariantAttribute.objects.filter(pk__in=stale).delete()
+        if changed:
+            VariantAttribute.objects.bulk_update(changed, ["is_active", "product"])
+        VariantAttribute.objects.bulk_create([
+            VariantAttribute(variant_id=vid, name=name, value=value, product_id=pid, is_active=active)
+            for (vid, name, value), (pid, active) in wanted.items() if (vid, name, value) not in existing
+        ])
+
+class VariantImage(RenditionImageMixin, TimeStampedMixin):
     variant = models.ForeignKey(ProductVariant, related_name="images", on_delete=models.CASCADE)
     image   = models.ImageField(upload_to=prod_upload)
     is_primary = models.BooleanField(default=False)
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
         if self.is_primary and self.variant_id:
             VariantImage.objects.filter(variant_id=self.variant_id).exclude(pk=self.pk).update(is_primary=False)
 
@@ -614,6 +884,12 @@ class CartItem(TimeStampedMixin):
             label += f" [{self.variant.attributes}]"
         return label
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            counters.incr(Product, self.product_id, "carts_count")
+
 from decimal import Decimal
 from django.db import models, transaction
 from django.db.models import F
@@ -653,15 +929,26 @@ class Order(TimeStampedMixin):
     country_code = models.CharField(max_length=2, default="IN")
     currency     = models.CharField(max_length=8, default="INR")
 
+    class Meta:
+        indexes = [models.Index(fields=["updated_at"])]  # incremental exports
+
     def __str__(self):
         return f"Order #{self.pk} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        super().save(*args, **kwargs)
+        # only writes that change a day's order/customer counts touch the rollup
+        if update_fields is None or {"user", "currency", "created_at"} & set(update_fields):
+            schedule_sales_fact_refresh(self.created_at, self.currency)
+
     @transaction.atomic
     def confirm_and_decrement_stock(self):
         if self.status != "pending":
             return
         vendor_qty = {}
         vendor_sales = {}
+        product_sales = {}  # (vendor_id, product_id) -> [units, revenue]
 
         for item in self.cart.items.select_related("product", "variant", "product__vendor"):
             if item.quantity <= 0:
@@ -685,6 +972,9 @@ class Order(TimeStampedMixin):
             if vid:
                 vendor_qty[vid]   = vendor_qty.get(vid, 0) + int(item.quantity)
                 vendor_sales[vid] = vendor_sales.get(vid, Decimal("0")) + item.line_total
+                line = product_sales.setdefault((vid, item.product_id), [0, Decimal("0")])
+                line[0] += int(item.quantity)
+                line[1] += item.line_total
 
         self.status = "confirmed"
         self.save(update_fields=["status"])
@@ -694,7 +984,184 @@ class Order(TimeStampedMixin):
                 total_units_sold=F("total_units_sold") + q,
                 total_revenue=F("total_revenue") + vendor_sales.get(vid, Decimal("0"))
             )
+        record_vendor_product_sales(timezone.localdate(), product_sales)
+
+
+# ─────── Vendor sales rollup ───────
+class VendorProductDailySales(models.Model):
+    """
+    Units / revenue / orders per vendor, product and day; written on stock confirmation.
+    `orders` counts orders containing the product, so it only adds up per product
+    (top products); per-vendor order counts live in VendorDailySales.
+    """
+    vendor  = models.ForeignKey(Vendor, related_name="daily_sales", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="vendor_daily_sales", on_delete=models.CASCADE)
+    date    = models.DateField()
+    units   = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    orders  = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "date", "product"], name="uq_vendor_day_product"),
+        ]
+        indexes = [models.Index(fields=["vendor", "product", "date"])]
+
+    def __str__(self):
+        return f"{self.vendor} / {self.product} @ {self.date}: {self.units} units"
+
+class VendorDailySales(models.Model):
+    """
+    Units / revenue / distinct orders per vendor and day: the dashboard series.
+    An order with several of the vendor's products counts once here, but once
+    per product in VendorProductDailySales.
+    """
+    vendor  = models.ForeignKey(Vendor, related_name="daily_totals", on_delete=models.CASCADE)
+    date    = models.DateField()
+    units   = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    orders  = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "date"], name="uq_vendor_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} @ {self.date}: {self.orders} orders"
+
+def _add_to_rollup(model, key: dict, units, revenue):
+    """units/revenue += and orders += 1 on the `key` row of `model`, creating it if needed."""
+    bump = dict(units=F("units") + units, revenue=F("revenue") + revenue, orders=F("orders") + 1)
+    if model.objects.filter(**key).update(**bump):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, units=units, revenue=revenue, orders=1)
+    except IntegrityError:
+        # a concurrent confirmation created the row first
+        model.objects.filter(**key).update(**bump)
+
+def record_vendor_product_sales(day, lines: dict):
+    """
+    Add one confirmed order's lines to the vendor rollups.
+    `lines` maps (vendor_id, product_id) -> (units, revenue).
+    """
+    per_vendor = {}
+    for (vid, pid), (units, revenue) in lines.items():
+        _add_to_rollup(VendorProductDailySales, dict(vendor_id=vid, product_id=pid, date=day), units, revenue)
+        total = per_vendor.setdefault(vid, [0, Decimal("0")])
+        total[0] += units
+        total[1] += revenue
+    for vid, (units, revenue) in per_vendor.items():
+        _add_to_rollup(VendorDailySales, dict(vendor_id=vid, date=day), units, revenue)
+
+# ─────── Product viewer sketches ───────
+class ProductViewerSketch(models.Model):
+    """
+    Distinct viewers of a product on one day as a HyperLogLog sketch (1 KiB).
+    Sketches merge losslessly, so any range of days can be combined.
+    """
+    product = models.ForeignKey(Product, related_name="viewer_sketches", on_delete=models.CASCADE)
+    date    = models.DateField()
+    hll     = models.BinaryField()
+    viewers = models.PositiveIntegerField(default=0)   # cached estimate of `hll`
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "date"], name="uq_viewer_sketch_product_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.date}: ~{self.viewers} viewers"
+
+def merge_viewer_sketches(sketches: dict) -> int:
+    """
+    Fold buffered sketches into the daily rows and the all-time Product sketch.
+    `sketches` maps (product_id, day) -> HyperLogLog. Returns rows written.
+    """
+    by_product = {}
+    for (pid, _), hll in sketches.items():
+        by_product.setdefault(pid, HyperLogLog(p=hll.p)).merge(hll)
+
+    with transaction.atomic():
+        products = list(
+            Product.objects.select_for_update().filter(pk__in=by_product).only("id", "viewers_hll", "unique_viewers")
+        )
+        for p in products:
+            merged = HyperLogLog.from_bytes(p.viewers_hll).merge(by_product[p.pk])
+            p.viewers_hll, p.unique_viewers = merged.to_bytes(), merged.count()
+        Product.objects.bulk_update(products, ["viewers_hll", "unique_viewers"])
+
+        live = {p.pk for p in products}
+        sketches = {k: v for k, v in sketches.items() if k[0] in live}
+        rows = {
+            (r.product_id, r.date): r
+            for r in ProductViewerSketch.objects.select_for_update().filter(
+                product_id__in=live, date__in={day for _, day in sketches},
+            )
+        }
+        new, changed = [], []
+        for (pid, day), hll in sketches.items():
+            row = rows.get((pid, day))
+            if row is None:
+                new.append(ProductViewerSketch(product_id=pid, date=day, hll=hll.to_bytes(), viewers=hll.count()))
+                continue
+            merged = HyperLogLog.from_bytes(row.hll).merge(hll)
+            row.hll, row.viewers, row.updated_at = merged.to_bytes(), merged.count(), timezone.now()
+            changed.append(row)
+        ProductViewerSketch.objects.bulk_update(changed, ["hll", "viewers", "updated_at"])
+        try:
+            with transaction.atomic():
+                ProductViewerSketch.objects.bulk_create(new)
+        except IntegrityError:
+            # another node created some of these days first; merge into its rows
+            for row in new:
+                existing, created = ProductViewerSketch.objects.select_for_update().get_or_create(
+                    product_id=row.product_id, date=row.date, defaults={"hll": row.hll, "viewers": row.viewers},
+                )
+                if not created:
+                    merged = HyperLogLog.from_bytes(existing.hll).merge(HyperLogLog.from_bytes(row.hll))
+                    existing.hll, existing.viewers = merged.to_bytes(), merged.count()
+                    existing.save(update_fields=["hll", "viewers", "updated_at"])
+    return len(products) + len(sketches)
+
+def estimate_viewers(sketch_bytes) -> int:
+    """Distinct viewers across several stored sketches (e.g. a date range)."""
+    total = None
+    for data in sketch_bytes:
+        hll = HyperLogLog.from_bytes(data)
+        total = hll if total is None else total.merge(hll)
+    return total.count() if total is not None else 0
+
+# ─────── Trending (Count-Min snapshots) ───────
+class TrendingSnapshot(models.Model):
+    """
+    One node's Count-Min sketch and top-K candidates for an hourly window.
+    Rows are overwritten as the window fills; nodes are merged at read time.
+    """
+    KIND_CHOICES = (("path", "Path"), ("product", "Product"))
+    node         = models.CharField(max_length=100)
+    kind         = models.CharField(max_length=16, choices=KIND_CHOICES)
+    window_start = models.DateTimeField()
+    total        = models.PositiveBigIntegerField(default=0)
+    sketch       = models.BinaryField()
+    top          = models.JSONField(default=list, blank=True)   # [[key, estimate], ...]
+    updated_at   = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-window_start"]
+        constraints = [
+            models.UniqueConstraint(fields=["node", "kind", "window_start"], name="uq_trending_node_kind_window"),
+        ]
+        indexes = [models.Index(fields=["kind", "window_start"])]
 
+    def __str__(self):
+        return f"{self.kind} @ {self.window_start:%Y-%m-%d %H:%M} [{self.node}]: {self.total}"
 
 # ─────── Visits / Contact ───────
 class VisitEvent(TimeStampedMixin):
@@ -715,6 +1182,27 @@ class VisitEvent(TimeStampedMixin):
         who = self.user.email if self.user_id else "anon"
         return f"[{self.created_at:%Y-%m-%d %H:%M}] {who} {self.method} {self.path}"
 
+class VisitHourlyAggregate(models.Model):
+    """
+    VisitEvents compacted per hour, path and method (see `manage.py compact_visits`).
+    unique_users counts distinct signed-in users plus distinct anonymous IPs.
+    """
+    hour         = models.DateTimeField()
+    path         = models.CharField(max_length=512)
+    method       = models.CharField(max_length=10)
+    visits       = models.PositiveIntegerField(default=0)
+    unique_users = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-hour"]
+        constraints = [
+            models.UniqueConstraint(fields=["hour", "path", "method"], name="uq_visit_hour_path_method"),
+        ]
+        indexes = [models.Index(fields=["path", "hour"])]
+
+    def __str__(self):
+        return f"[{self.hour:%Y-%m-%d %H}:00] {self.method} {self.path} x{self.visits}"
+
 class ContactSubmission(TimeStampedMixin):
     user       = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     name       = models.CharField(max_length=150)
@@ -731,17 +1219,11 @@ class ContactSubmission(TimeStampedMixin):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["updated_at"])]  # incremental exports
 
     def __str__(self):
         return f"Contact from {self.name} <{self.email}>"
 
-def _product_update_stats_on_review(product: "Product"):
-    agg = product.reviews.filter(is_approved=True).aggregate(avg=Avg("rating"), cnt=Count("id"))
-    avg = Decimal(str(agg["avg"] or 0)).quantize(Decimal("0.00"))
-    product.rating_avg = avg
-    product.reviews_count = int(agg["cnt"] or 0)
-    product.save(update_fields=["rating_avg", "reviews_count"])
-
 class ProductReview(TimeStampedMixin):
     product     = models.ForeignKey(Product, related_name="reviews", on_delete=models.CASCADE)
     user        = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
@@ -761,16 +1243,195 @@ class ProductReview(TimeStampedMixin):
     user_agent  = models.TextField(blank=True)
 
     class Meta:
-        indexes = [models.Index(fields=["product", "created_at"])]
+        indexes = [
+            models.Index(fields=["product", "created_at"]),
+            # newest approved reviews of a product (review summary)
+            models.Index(fields=["product", "is_approved", "-created_at"], name="review_product_approved_idx"),
+            models.Index(fields=["updated_at"]),  # incremental exports
+        ]
         ordering = ["-created_at"]
 
     def __str__(self):
         who = self.user.email if self.user_id else (self.user_email or "anon")
         return f"{self.product.name} ★{self.rating} by {who}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # what the rating summary currently counts (unknown if loaded with .only()/.defer())
+        loaded = {"product_id", "rating", "is_approved"} <= set(field_names)
+        obj._stats_state = obj._rating_state() if loaded else "unknown"
+        return obj
+
+    def _rating_state(self):
+        """(product_id, star) this review contributes to the summary, or None."""
+        if not self.is_approved or self.rating is None:
+            return None
+        return (self.product_id, min(max(int(self.rating), 1), 5))
+
     def save(self, *args, **kwargs):
+        old = getattr(self, "_stats_state", None)
         super().save(*args, **kwargs)
-        _product_update_stats_on_review(self.product)
+        new = self._rating_state()
+        self._stats_state = new
+        if old or new:
+            # approved before or after: the public review summary may show this review
+            invalidate_review_summary(self.product_id)
+        if old == "unknown":
+            rebuild_review_stats([self.product_id])
+        elif old != new:
+            deltas = {}
+            if old:
+                deltas[old] = deltas.get(old, 0) - 1
+            if new:
+                deltas[new] = deltas.get(new, 0) + 1
+            apply_rating_deltas(deltas)
+
+    def delete(self, *args, **kwargs):
+        old = getattr(self, "_stats_state", "unknown")
+        if old == "unknown":
+            old = self._rating_state()
+        result = super().delete(*args, **kwargs)
+        if old:
+            apply_rating_deltas({old: -1})
+            invalidate_review_summary(old[0])
+        return result
+
+class ProductRatingSummary(models.Model):
+    """
+    Approved-review star histogram per product. Kept current with deltas from
+    ProductReview writes; `rebuild_review_stats` recomputes it from scratch and
+    `manage.py verify_review_stats` checks it.
+    """
+    product = models.OneToOneField(Product, primary_key=True, related_name="rating_summary", on_delete=models.CASCADE)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Ratings of {self.product_id}: {self.histogram}"
+
+    @property
+    def histogram(self) -> dict:
+        return {star: getattr(self, f"stars_{star}") for star in range(1, 6)}
+
+    @property
+    def count(self) -> int:
+        return sum(self.histogram.values())
+
+    @property
+    def average(self) -> Decimal:
+        n = self.count
+        if not n:
+            return Decimal("0.00")
+        total = sum(star * c for star, c in self.histogram.items())
+        return (Decimal(total) / n).quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
+
+def review_summary_cache_key(product_id, version) -> str:
+    """
+    Cache key of a product's public review summary. `version` is the summary's
+    updated_at, so once it moves no process reads the old entry again, whatever
+    cache backend each worker has.
+    """
+    stamp = version.timestamp() if version else 0
+    return f"reviews:summary:{product_id}:{stamp}"
+
+def invalidate_review_summary(product_id):
+    """Move the summary's version on, retiring every cached copy of it."""
+    ProductRatingSummary.objects.filter(product_id=product_id).update(updated_at=timezone.now())
+
+def _sync_product_rating(summary: ProductRatingSummary):
+    Product.objects.filter(pk=summary.product_id).update(rating_avg=summary.average, reviews_count=summary.count)
+
+def apply_rating_deltas(deltas: dict):
+    """
+    Apply {(product_id, star): +/-n} to the summaries and the Product columns.
+    A product without a summary row yet is rebuilt from its reviews instead.
+    """
+    by_product = {}
+    for (pid, star), n in deltas.items():
+        if n:
+            by_product.setdefault(pid, {})[f"stars_{star}"] = n
+    if not by_product:
+        return
+    with transaction.atomic():
+        missing = []
+        for pid, fields in by_product.items():
+            bump = {f: Greatest(F(f) + n, 0) for f, n in fields.items()}
+            bump["updated_at"] = timezone.now()
+            if not ProductRatingSummary.objects.filter(product_id=pid).update(**bump):
+                missing.append(pid)
+        for summary in ProductRatingSummary.objects.filter(product_id__in=set(by_product) - set(missing)):
+            _sync_product_rating(summary)
+        if missing:
+            rebuild_review_stats(missing)
+
+def moderate_reviews(review_ids, approved: bool, chunk_size: int = 500) -> int:
+    """
+    Set is_approved on many reviews with one UPDATE per chunk, then rebuild the
+    stats of the affected products once. Returns the number of reviews changed.
+    """
+    review_ids = list(dict.fromkeys(review_ids))
+    changed, products = 0, set()
+    with transaction.atomic():
+        for i in range(0, len(review_ids), chunk_size):
+            rows = list(
+                ProductReview.objects.select_for_update()
+                .filter(pk__in=review_ids[i:i + chunk_size]).exclude(is_approved=approved)
+                .values_list("pk", "product_id")
+            )
+            if not rows:
+                continue
+            changed += ProductReview.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                is_approved=approved, updated_at=timezone.now(),
+            )
+            products.update(pid for _, pid in rows)
+        products = list(products)
+        for i in range(0, len(products), chunk_size):
+            rebuild_review_stats(products[i:i + chunk_size])
+    return changed
+
+def rebuild_review_stats(product_ids) -> int:
+    """Recompute summaries + Product.rating_avg/reviews_count for `product_ids` in one grouped query."""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return 0
+    hist = {pid: dict.fromkeys(range(1, 6), 0) for pid in product_ids}
+    for r in (
+        ProductReview.objects.filter(product_id__in=product_ids, is_approved=True)
+        .values("product_id", "rating").annotate(n=Count("id")).order_by()
+    ):
+        star = min(max(int(r["rating"] or 1), 1), 5)
+        hist[r["product_id"]][star] += r["n"]
+
+    with transaction.atomic():
+        live = set(Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True))
+        existing = ProductRatingSummary.objects.select_for_update().in_bulk([pid for pid in product_ids if pid in live])
+        now = timezone.now()
+        new, changed, products = [], [], []
+        for pid in live:
+            summary = existing.get(pid) or ProductRatingSummary(product_id=pid)
+            for star, n in hist[pid].items():
+                setattr(summary, f"stars_{star}", n)
+            summary.updated_at = now
+            (changed if pid in existing else new).append(summary)
+            products.append(Product(pk=pid, rating_avg=summary.average, reviews_count=summary.count))
+        ProductRatingSummary.objects.bulk_update(changed, [f"stars_{i}" for i in range(1, 6)] + ["updated_at"])
+        try:
+            with transaction.atomic():
+                ProductRatingSummary.objects.bulk_create(new)
+        except IntegrityError:
+            # a concurrent rebuild created some rows first; overwrite them
+            for summary in new:
+                ProductRatingSummary.objects.update_or_create(
+                    product_id=summary.product_id,
+                    defaults={f"stars_{i}": getattr(summary, f"stars_{i}") for i in range(1, 6)},
+                )
+        Product.objects.bulk_update(products, ["rating_avg", "reviews_count"])
+    return len(live)
 
 class OrderCheckoutDetails(TimeStampedMixin):
     order       = models.OneToOneField("Order", related_name="checkout_details", on_delete=models.CASCADE)
@@ -798,7 +1459,7 @@ class OrderPayment(TimeStampedMixin):
     method      = models.CharField(max_length=30, choices=METHOD_CHOICES)
     provider    = models.CharField(max_length=50, blank=True)
     status      = models.CharField(max_length=50, blank=True)
-    transaction_id = models.CharField(max_length=120, blank=True)
+    transaction_id = models.CharField(max_length=120, blank=True, db_index=True)
     currency    = models.CharField(max_length=12, default="INR")
     amount      = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     raw         = models.JSONField(blank=True, null=True)
@@ -806,6 +1467,111 @@ class OrderPayment(TimeStampedMixin):
     def __str__(self):
         return f"Payment for Order #{self.order_id} ({self.method})"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        super().save(*args, **kwargs)
+        if update_fields is None or {"status", "amount", "currency", "created_at"} & set(update_fields):
+            schedule_sales_fact_refresh(self.created_at, self.currency)
+
+class RazorpayWebhookEvent(TimeStampedMixin):
+    """Raw Razorpay webhook delivery; stored first, applied later in batches."""
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("ignored", "Ignored"),
+        ("failed", "Failed"),
+    )
+    event_id     = models.CharField(max_length=64, unique=True)
+    event        = models.CharField(max_length=64, db_index=True)  # e.g. "payment.captured"
+    payment_id   = models.CharField(max_length=120, blank=True, db_index=True)
+    payload      = models.JSONField()
+    status       = models.CharField(max_length=12, choices=STATUS_CHOICES, default="pending")
+    attempts     = models.PositiveSmallIntegerField(default=0)
+    error        = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.status})"
+
+# ─────── Sales rollup (analytics) ───────
+class DailySalesFact(models.Model):
+    """
+    One row per (day, currency): orders placed, distinct customers and paid
+    revenue. Kept current by Order/OrderPayment writes; rebuilt by
+    `manage.py backfill_sales_facts`.
+    """
+    date      = models.DateField()
+    currency  = models.CharField(max_length=12, default="INR")
+    orders    = models.PositiveIntegerField(default=0)
+    customers = models.PositiveIntegerField(default=0)
+    revenue   = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date", "currency"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "currency"], name="uq_daily_sales_date_currency"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.currency}: {self.orders} orders, {self.revenue}"
+
+def day_bounds(day):
+    """[start, end) aware datetimes of a local calendar day."""
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+def refresh_daily_sales_fact(day, currency: str):
+    """Recompute a single rollup row from that day's (indexed) created_at range."""
+    start, end = day_bounds(day)
+    orders = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end, currency=currency)
+        .aggregate(orders=Count("id"), customers=Count("user_id", distinct=True))
+    )
+    revenue = (
+        OrderPayment.objects.filter(status="paid", currency=currency, created_at__gte=start, created_at__lt=end)
+        .aggregate(x=Sum("amount"))["x"] or Decimal("0.00")
+    )
+    DailySalesFact.objects.update_or_create(
+        date=day, currency=currency,
+        defaults={"orders": orders["orders"], "customers": orders["customers"], "revenue": revenue},
+    )
+
+def _drain_sales_fact_refreshes():
+    """on_commit callback: refresh every (day, currency) queued on this connection, once."""
+    connection = transaction.get_connection()
+    pending, connection.pending_sales_facts = getattr(connection, "pending_sales_facts", set()), set()
+    for day, currency in sorted(pending):
+        try:
+            refresh_daily_sales_fact(day, currency)
+        except Exception:
+            log.exception("DailySalesFact refresh failed for %s %s", day, currency)
+
+def schedule_sales_fact_refresh(dt, currency: str):
+    """
+    Refresh the rollup row for `dt` once the current transaction commits, once per
+    (day, currency) however often the transaction touches it: keys collect in a set
+    on the connection and the first drain callback to run empties it (later ones
+    find nothing to do). Keys left by a rolled-back transaction are refreshed with
+    the next commit, which is harmless. A failing refresh is logged, not raised into
+    the request; backfill_sales_facts repairs the row.
+    """
+    if dt is None:
+        return
+    connection = transaction.get_connection()
+    if not hasattr(connection, "pending_sales_facts"):
+        connection.pending_sales_facts = set()
+    connection.pending_sales_facts.add((timezone.localdate(dt), currency or "INR"))
+    transaction.on_commit(_drain_sales_fact_refreshes, robust=True)
+
+def refresh_sales_fact_on_delete(sender, instance, **kwargs):
+    """post_delete receiver for Order / OrderPayment: drop the row's share of the rollup."""
+    schedule_sales_fact_refresh(instance.created_at, instance.currency)
+
 # ─────── Wishlist ───────
 class Wishlist(TimeStampedMixin):
     user = models.OneToOneField(User, related_name="wishlist", on_delete=models.CASCADE)
@@ -833,8 +1599,22 @@ class WishlistItem(TimeStampedMixin):
             base += f" [{self.variant.attributes}]"
         return f"{base} (wish)"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            counters.incr(Product, self.product_id, "wishes_count")
+
+def release_item_count(sender, instance, **kwargs):
+    """
+    post_delete receiver for CartItem / WishlistItem. Fires for queryset deletes
+    and cascades (cart, wishlist, user) as well as instance deletes.
+    """
+    field = "carts_count" if sender is CartItem else "wishes_count"
+    counters.incr(Product, instance.product_id, field, -1)
+
 # ─────── Special Offer / Collections / Grid ───────
-class SpecialOffer(TimeStampedMixin):
+class SpecialOffer(ProcessedImageMixin, TimeStampedMixin):
     title       = models.CharField(max_length=120)
     subtitle    = models.CharField(max_length=160, blank=True)
     percentage  = models.PositiveSmallIntegerField(default=0)
@@ -852,12 +1632,6 @@ class SpecialOffer(TimeStampedMixin):
     class Meta:
         ordering = ["sort_order", "-created_at"]
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
-
     def __str__(self):
         return f"{self.title} ({self.percentage}%)"
 
@@ -900,7 +1674,7 @@ class ProductCollection(TimeStampedMixin):
     def __str__(self):
         return self.name
 
-class ProductGrid(TimeStampedMixin):
+class ProductGrid(ProcessedImageMixin, TimeStampedMixin):
     title = models.CharField(max_length=120)
     subtitle = models.CharField(max_length=200, blank=True)
     price_text = models.CharField(max_length=60, blank=True)
@@ -913,17 +1687,11 @@ class ProductGrid(TimeStampedMixin):
     sort = models.PositiveIntegerField(default=0, db_index=True)
     is_active = models.BooleanField(default=True)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
-
     def __str__(self):
         return self.title
 
 # ─────── Promo Banners ───────
-class PromoBanner(TimeStampedMixin):
+class PromoBanner(RenditionImageMixin, TimeStampedMixin):
     PLACEMENTS = (("top", "Top"), ("bottom", "Bottom"))
     VARIANTS = (("default", "Default"), ("coupon", "Coupon"), ("clearance", "Clearance"))
 
@@ -960,12 +1728,6 @@ class PromoBanner(TimeStampedMixin):
             models.Index(fields=["starts_at", "ends_at"]),
         ]
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.image and not str(self.image.name).lower().endswith(".webp"):
-            self.image = compress_to_webp(self.image)
-            super().save(update_fields=["image"])
-
     def __str__(self):
         return f"{self.placement}/{self.variant}: {self.title}"
 
@@ -992,6 +1754,11 @@ class BlogCategory(models.Model):
 
 
 class BlogPost(models.Model):
+    # columns behind the full-text index (see search.py)
+    SEARCH_FIELDS = frozenset({"title", "excerpt", "content_text", "content_html", "tags_csv"})
+    # saved together: the markdown and what save() derives from it
+    RENDER_FIELDS = frozenset({"content_markdown", "content_html", "content_text", "content_hash"})
+
     category = models.ForeignKey(BlogCategory, on_delete=models.SET_NULL, null=True, related_name="posts")
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="blog_posts")
 
@@ -1003,6 +1770,8 @@ class BlogPost(models.Model):
     # Authoring fields
     content_markdown = models.TextField(blank=True)  # <- you edit in markdown
     content_html = models.TextField(blank=True)      # <- auto-rendered from markdown for fast reads
+    content_text = models.TextField(blank=True, editable=False)  # <- plain text of content_html, for search
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)  # <- rendering.content_hash of what content_html came from
 
     cover = models.ImageField(upload_to="blog/covers/", blank=True, null=True)
 
@@ -1034,6 +1803,13 @@ class BlogPost(models.Model):
     def set_tags(self, tags_list: list[str]):
         self.tags_csv = ", ".join(sorted({t.strip() for t in tags_list if t and t.strip()}))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # the stored HTML, to tell a rendered content_html from one assigned directly
+        obj._saved_html = None if "content_html" in obj.get_deferred_fields() else obj.content_html
+        return obj
+
     def save(self, *args, **kwargs):
         # slug
         if not self.slug:
@@ -1047,14 +1823,27 @@ class BlogPost(models.Model):
                 unique = f"{base}-{idx}"[:240]
             self.slug = unique
 
-        # render markdown -> html
-        if self.content_markdown and markdown:
-            self.content_html = markdown.markdown(
-                self.content_markdown,
-                extensions=["extra", "codehilite", "toc", "sane_lists"],
-            )
-
+        # render markdown -> html, unless content_html already comes from this markdown
+        html_loaded = "content_html" not in self.get_deferred_fields()
+        if html_loaded and self.content_html != getattr(self, "_saved_html", None):
+            self.content_hash = ""   # HTML set directly: the markdown stays the source of truth
+        digest = rendering.content_hash(self.content_markdown) if self.content_markdown else ""
+        if not digest or digest != self.content_hash:
+            html = rendering.render(self.content_markdown, digest) if digest else None
+            if html is not None:
+                self.content_html = html
+            self.content_hash = digest if html is not None else ""
+        if html_loaded:
+            self.content_text = search.plain_text(self.content_html)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not self.RENDER_FIELDS.isdisjoint(update_fields):
+            update_fields = kwargs["update_fields"] = {*update_fields, *self.RENDER_FIELDS}
         super().save(*args, **kwargs)
+        if html_loaded:
+            self._saved_html = self.content_html
+        if update_fields is None or not self.SEARCH_FIELDS.isdisjoint(update_fields):
+            search.index_posts([self], using=kwargs.get("using") or self._state.db)
 
 
 class BlogPostVersion(models.Model):
@@ -1241,7 +2030,7 @@ class Certification(models.Model):
         return self.name
 
 
-class GalleryItem(models.Model):
+class GalleryItem(RenditionImageMixin):
     """Flexible gallery items (Farming, Events, Certifications, Community)."""
     CATEGORY_CHOICES = [
         ("Farming & Agriculture", "Farming & Agriculture"),
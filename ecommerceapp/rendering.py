@@ -0,0 +1,127 @@
+"""
+Markdown -> HTML for blog posts.
+
+Everything that renders post markdown goes through `render`. Output is keyed
+on `content_hash(md)`: a sha256 over the extension set
+(BLOG_MARKDOWN_EXTENSIONS), the markdown package version and the source. A key
+is looked up in a per-process LRU first, then in the Django cache, and only
+rendered on a miss. BlogPost stores the key its content_html was rendered from
+(`content_hash`), so saves that leave the markdown alone render nothing.
+Changing the extension set makes every stored key stale, and
+`manage.py rerender_blog_posts` re-renders those posts across a process pool
+(`render_many`).
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .search import plain_text
+
+try:
+    import markdown  # pip install markdown
+except ImportError:
+    markdown = None
+
+DEFAULT_EXTENSIONS = ["extra", "codehilite", "toc", "sane_lists"]
+CACHE_PREFIX = "blog-md:"
+POOL_CHUNK = 16   # posts handed to a worker at a time
+
+_local = threading.local()   # Markdown instances aren't thread-safe; one per thread, reset per document
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def extensions() -> list:
+    return list(getattr(settings, "BLOG_MARKDOWN_EXTENSIONS", None) or DEFAULT_EXTENSIONS)
+
+
+def content_hash(md: str) -> str:
+    """Cache key for rendering `md` with the current pipeline."""
+    h = hashlib.sha256()
+    h.update(f"{getattr(markdown, '__version__', '')}|{','.join(extensions())}\0".encode())
+    h.update((md or "").encode())
+    return h.hexdigest()
+
+
+def render_html(md: str) -> str:
+    """Uncached render; raises RuntimeError if the markdown package is missing."""
+    if markdown is None:
+        raise RuntimeError("The markdown package is not installed.")
+    exts = extensions()
+    converter = getattr(_local, "converter", None)
+    if converter is None or _local.extensions != exts:
+        converter = _local.converter = markdown.Markdown(extensions=exts)
+        _local.extensions = exts
+    return converter.reset().convert(md or "")
+
+
+def _lru_get(key):
+    with _lru_lock:
+        html = _lru.get(key)
+        if html is not None:
+            _lru.move_to_end(key)
+        return html
+
+
+def _lru_put(key, html):
+    size = getattr(settings, "BLOG_RENDER_LRU_SIZE", 256)
+    with _lru_lock:
+        _lru[key] = html
+        _lru.move_to_end(key)
+        while len(_lru) > size:
+            _lru.popitem(last=False)
+
+
+def render(md: str, key: str = None):
+    """HTML for `md` through the LRU and the Django cache; None if markdown isn't installed."""
+    if markdown is None:
+        return None
+    key = key or content_hash(md)
+    html = _lru_get(key)
+    if html is not None:
+        return html
+    ttl = getattr(settings, "BLOG_RENDER_CACHE_TTL", 86400)
+    html = cache.get(CACHE_PREFIX + key) if ttl else None
+    if html is None:
+        html = render_html(md)
+        if ttl:
+            cache.set(CACHE_PREFIX + key, html, ttl)
+    _lru_put(key, html)
+    return html
+
+
+# ─────── bulk (process pool) ───────
+def render_post(item) -> tuple:
+    """(pk, markdown) -> (pk, html, plain text); runs in a worker process."""
+    pk, md = item
+    html = render_html(md)
+    return pk, html, plain_text(html)
+
+
+def _init_process_worker():
+    import django
+    django.setup()
+
+
+def pool(workers: int = 0):
+    """A process pool for `render_many`, or None to render inline (workers: 0 = one per core)."""
+    workers = workers or getattr(settings, "BLOG_RENDER_WORKERS", 0) or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    # spawned rather than forked: see images._get_process_pool
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_process_worker, mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def render_many(items, executor=None) -> list:
+    """`render_post` for every (pk, markdown) in `items`, in order, on `executor` if given."""
+    if executor is None or len(items) < 2:
+        return [render_post(item) for item in items]
+    return list(executor.map(render_post, items, chunksize=POOL_CHUNK))
@@ -0,0 +1,173 @@
+"""
+Full-text search over blog posts.
+
+Title, excerpt, tags and the plain-text body (`BlogPost.content_text`, derived
+from the rendered HTML on save) are indexed per backend:
+
+* SQLite: an FTS5 table (FTS_TABLE, rowid = post id, porter stemming) that
+  `BlogPost.save` refreshes and a post_delete receiver prunes; ranked with
+  bm25 and column weights.
+* PostgreSQL: a generated, weighted `search_vector` tsvector column with a GIN
+  index, kept current by the database; ranked with ts_rank_cd.
+* Anything else, or SQLite built without FTS5: case-insensitive LIKE over the
+  same plain-text columns, unranked.
+
+The stored HTML and markdown are never scanned. Snippets come back HTML-escaped
+with matches wrapped in <mark>.
+"""
+import html
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+FTS_TABLE = "ecommerceapp_blogpost_fts"
+WEIGHTS = (10.0, 5.0, 1.0, 3.0)   # bm25 weights for title, excerpt, body, tags
+SNIPPET_WORDS = 24
+MAX_LIMIT = 50
+
+# markers the engines put around matches; swapped for <mark> after escaping
+_START, _END = "\x02", "\x03"
+_PG_QUERY = "websearch_to_tsquery('english', %s)"
+_fts_ready = set()   # aliases whose FTS5 table exists
+
+
+def plain_text(rendered_html: str) -> str:
+    """Indexable text of rendered HTML: tags stripped, entities decoded, whitespace collapsed."""
+    return " ".join(html.unescape(strip_tags(rendered_html or "")).split())
+
+
+def _backend(alias: str):
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        return "postgres"
+    if connection.vendor == "sqlite":
+        if alias not in _fts_ready:
+            with connection.cursor() as cursor:
+                if FTS_TABLE not in connection.introspection.table_names(cursor):
+                    return None
+            _fts_ready.add(alias)
+        return "fts5"
+    return None
+
+
+def _fts5_query(text: str):
+    """A safe FTS5 MATCH expression: every word required, the last one as a prefix."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _mark(snippet: str) -> str:
+    return html.escape(snippet or "").replace(_START, "<mark>").replace(_END, "</mark>")
+
+
+# ─────── index maintenance (SQLite) ───────
+def index_posts(posts, using="default") -> None:
+    """Refresh the FTS5 rows of saved `posts` (PostgreSQL maintains its column itself)."""
+    if _backend(using) != "fts5" or not posts:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(p.pk,) for p in posts])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body, tags) VALUES (%s, %s, %s, %s, %s)",
+            [(p.pk, p.title, p.excerpt, p.content_text, p.tags_csv) for p in posts],
+        )
+
+
+def unindex_posts(pks, using="default") -> None:
+    if _backend(using) != "fts5" or not pks:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in pks])
+
+
+def unindex_blog_post(sender, instance, using, **kwargs):
+    """post_delete receiver for BlogPost."""
+    unindex_posts([instance.pk], using=using)
+
+
+# ─────── queries ───────
+def matching(qs, text: str):
+    """`qs` narrowed to posts matching `text` (order untouched)."""
+    text = (text or "").strip()
+    if not text:
+        return qs
+    backend = _backend(qs.db)
+    if backend == "fts5":
+        query = _fts5_query(text)
+        if query is None:
+            return qs.none()
+        return qs.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query]))
+    if backend == "postgres":
+        table = qs.model._meta.db_table
+        return qs.alias(
+            fts_match=RawSQL(f"{table}.search_vector @@ {_PG_QUERY}", [text], output_field=BooleanField()),
+        ).filter(fts_match=True)
+    cond = Q()
+    for word in text.split():
+        cond &= Q(title__icontains=word) | Q(excerpt__icontains=word) | Q(tags_csv__icontains=word) | Q(content_text__icontains=word)
+    return qs.filter(cond)
+
+
+def ranked(qs, text: str, limit: int = 20) -> list:
+    """
+    Best `limit` posts of `qs` for `text`, best first, each carrying `search_rank`
+    (higher is better) and `search_snippet` (escaped HTML).
+    """
+    text = (text or "").strip()
+    limit = max(1, min(MAX_LIMIT, limit))
+    if not text:
+        return []
+    backend = _backend(qs.db)
+
+    if backend == "fts5":
+        query = _fts5_query(text)
+        if query is None:
+            return []
+        scope, params = qs.order_by().values("pk").query.sql_with_params()
+        weights = ", ".join(str(w) for w in WEIGHTS)
+        sql = (
+            f"SELECT rowid, -bm25({FTS_TABLE}, {weights}), "
+            f"snippet({FTS_TABLE}, -1, %s, %s, %s, %s) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope}) "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s"
+        )
+        with connections[qs.db].cursor() as cursor:
+            cursor.execute(sql, [_START, _END, "…", SNIPPET_WORDS, query, *params, limit])
+            hits = cursor.fetchall()
+        posts = qs.in_bulk([pk for pk, _, _ in hits])
+        out = []
+        for pk, rank, snippet in hits:
+            if pk in posts:
+                post = posts[pk]
+                post.search_rank, post.search_snippet = rank, _mark(snippet)
+                out.append(post)
+        return out
+
+    if backend == "postgres":
+        table = qs.model._meta.db_table
+        options = f'StartSel="{_START}", StopSel="{_END}", MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}'
+        qs = matching(qs, text).annotate(
+            search_rank=RawSQL(
+                f"ts_rank_cd({table}.search_vector, {_PG_QUERY})", [text], output_field=FloatField(),
+            ),
+            search_snippet=RawSQL(
+                f"ts_headline('english', {table}.content_text, {_PG_QUERY}, %s)", [text, options],
+                output_field=TextField(),
+            ),
+        ).order_by("-search_rank", "-published_at")
+        posts = list(qs[:limit])
+        for post in posts:
+            post.search_snippet = _mark(post.search_snippet)
+        return posts
+
+    posts = list(matching(qs, text).annotate(search_rank=Value(0.0, output_field=FloatField()))[:limit])
+    for post in posts:
+        post.search_snippet = html.escape(post.excerpt or post.content_text[:200])
+    return posts
@@ -2,12 +2,16 @@
 from decimal import Decimal, InvalidOperation
 from typing import Any, Optional, List, Dict
 import json
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
+from django.db.models import Case, Q, Value, When
 from rest_framework import serializers
 from django.utils.text import slugify
 from django.utils import timezone
 from dateutil import parser as dateparser
 from .models import *
+from . import images
+from .variants import upsert_variants
 
 # ---------- Helpers ----------
 
@@ -81,13 +85,45 @@ def _absolute_media_url(request, path_or_file):
         return urljoin(base, url.lstrip("/"))
     return urljoin(base, (media_prefix + url).lstrip("/"))
 
-def _render_html(md: str) -> str:
-    """Best-effort markdown→HTML; won’t crash if markdown2 isn’t installed."""
-    try:
-        import markdown2
-        return markdown2.markdown(md or "", extras=["fenced-code-blocks", "tables"])
-    except Exception:
-        return md or ""
+def _rendition_urls(request, obj) -> list:
+    """[(width, absolute url), ...] for a RenditionImageMixin instance, narrowest first."""
+    renditions = getattr(obj, "renditions", None)
+    if not callable(renditions):
+        return []
+    storage = obj._meta.get_field(obj.IMAGE_FIELD).storage
+    return [(w, _absolute_media_url(request, storage.url(name))) for w, name in renditions()]
+
+def _image_srcset(request, obj) -> str:
+    return ", ".join(f"{url} {w}w" for w, url in _rendition_urls(request, obj))
+
+def _thumb_url(request, obj):
+    """Narrowest rendition, else the image itself."""
+    urls = _rendition_urls(request, obj)
+    if urls:
+        return urls[0][1]
+    return _absolute_media_url(request, getattr(obj, getattr(obj, "IMAGE_FIELD", "image"), None))
+
+def _cart_items(cart):
+    """A cart's items, reusing the prefetched ones (with their products / images) when present."""
+    if "items" in getattr(cart, "_prefetched_objects_cache", {}):
+        return cart.items.all()
+    return cart.items.select_related("product", "variant", "product__category").all()
+
+def _primary_image(product):
+    """Primary (else first) ProductImage; the same lookup as Product.primary_image_url."""
+    return product.primary_image()
+
+
+class ImageRenditionFields(serializers.Serializer):
+    """Adds `image_srcset` ("url 160w, url 480w, ...") and `thumb_url` for RenditionImageMixin models."""
+    image_srcset = serializers.SerializerMethodField()
+    thumb_url = serializers.SerializerMethodField()
+
+    def get_image_srcset(self, obj) -> str:
+        return _image_srcset(self.context.get("request"), obj)
+
+    def get_thumb_url(self, obj):
+        return _thumb_url(self.context.get("request"), obj)
 
 def _parse_dt_safe(v):
     if not v:
@@ -101,16 +137,18 @@ def _parse_dt_safe(v):
         return None
 # ---------- Basic serializers ----------
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(ImageRenditionFields, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ["id", "name", "slug", "parent", "icon", "image"]
+        fields = ["id", "name", "slug", "parent", "icon", "image", "image_srcset", "thumb_url", "image_status"]
+        read_only_fields = ["image_status"]
 
 
 class StoreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Store
-        fields = ["id", "name", "slug", "email", "phone", "city", "state", "country", "is_active", "logo"]
+        fields = ["id", "name", "slug", "email", "phone", "city", "state", "country", "is_active", "logo", "image_status"]
+        read_only_fields = ["image_status"]
 
 
 class VendorSerializer(serializers.ModelSerializer):
@@ -135,14 +173,14 @@ class ColorSerializer(serializers.ModelSerializer):
 
 # ---------- Product images / variant images ----------
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(ImageRenditionFields, serializers.ModelSerializer):
     # accept raw integer id in multipart/form (write-only), and resolve to FK
     product = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = ProductImage
-        fields = ["id", "product", "image", "is_primary", "created_at"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "product", "image", "image_srcset", "thumb_url", "is_primary", "image_status", "created_at"]
+        read_only_fields = ["image_status", "created_at"]
 
     def create(self, validated_data):
         pid = validated_data.pop("product", None)
@@ -156,14 +194,14 @@ class ProductImageSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class VariantImageSerializer(serializers.ModelSerializer):
+class VariantImageSerializer(ImageRenditionFields, serializers.ModelSerializer):
     # same idea for variant images
     variant = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = VariantImage
-        fields = ["id", "variant", "image", "is_primary", "created_at"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "variant", "image", "image_srcset", "thumb_url", "is_primary", "image_status", "created_at"]
+        read_only_fields = ["image_status", "created_at"]
 
     def create(self, validated_data):
         vid = validated_data.pop("variant", None)
@@ -217,6 +255,13 @@ class ProductSpecificationSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at", "updated_at"]
 
 
+class SpecificationItemSerializer(serializers.ModelSerializer):
+    """One row of a replace_specifications payload; the product comes from the URL."""
+    class Meta:
+        model = ProductSpecification
+        fields = ["group", "name", "value", "unit", "is_highlight", "sort_order"]
+
+
 # ---------- Product (Read) ----------
 
 class ProductReadSerializer(serializers.ModelSerializer):
@@ -231,13 +276,15 @@ class ProductReadSerializer(serializers.ModelSerializer):
     price_in_country = serializers.SerializerMethodField()
     discounted_price_in_country = serializers.SerializerMethodField()
     primary_image_url = serializers.SerializerMethodField()
+    primary_image_srcset = serializers.SerializerMethodField()
+    primary_thumb_url = serializers.SerializerMethodField()
     description_html = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             "id", "name", "slug", "description",
-            "description_html", "primary_image_url",
+            "description_html", "primary_image_url", "primary_image_srcset", "primary_thumb_url",
             "category", "vendor", "store",
             "quantity", "grade", "manufacture_date",
             "origin_country", "warranty_months",
@@ -254,6 +301,7 @@ class ProductReadSerializer(serializers.ModelSerializer):
             "ingredients", "allergens", "nutrition_facts", "nutrition_notes",
             # stats
             "views_count", "carts_count", "sold_count", "reviews_count", "rating_avg", "wishes_count",
+            "unique_viewers",
             # related
             "images", "variants", "specifications",
             # computed prices
@@ -314,6 +362,14 @@ class ProductReadSerializer(serializers.ModelSerializer):
 
         return None
 
+    def get_primary_image_srcset(self, obj: Product) -> str:
+        img = _primary_image(obj)
+        return _image_srcset(self.context.get("request"), img) if img else ""
+
+    def get_primary_thumb_url(self, obj: Product):
+        img = _primary_image(obj)
+        return _thumb_url(self.context.get("request"), img) if img else None
+
     def get_description_html(self, obj: Product) -> str:
         return str(obj.description_html)
 
@@ -443,6 +499,20 @@ class ContactSubmissionSerializer(serializers.ModelSerializer):
     read_only_fields = ["handled", "created_at"]
 
 
+class VisitEventSerializer(serializers.ModelSerializer):
+    user_email = serializers.EmailField(source="user.email", read_only=True, default=None)
+
+    class Meta:
+        model = VisitEvent
+        fields = ["id", "user", "user_email", "ip_address", "user_agent", "method", "path", "referer", "created_at"]
+
+
+class VisitHourlyAggregateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VisitHourlyAggregate
+        fields = ["hour", "path", "method", "visits", "unique_users"]
+
+
 class ProductReviewSerializer(serializers.ModelSerializer):
     # Allow frontend to send `comment`; map to `body`
     comment = serializers.CharField(source="body", required=False, allow_blank=True)
@@ -488,22 +558,25 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return super().create(validated)
 
 
-class PromoBannerSerializer(serializers.ModelSerializer):
+class PromoBannerSerializer(ImageRenditionFields, serializers.ModelSerializer):
     class Meta:
         model = PromoBanner
         fields = "__all__"
+        read_only_fields = ["image_status", "image_renditions"]
 
 
 class ProductGridSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductGrid
         fields = "__all__"
+        read_only_fields = ["image_status"]
 
 
 class SpecialOfferSerializer(serializers.ModelSerializer):
     class Meta:
         model = SpecialOffer
         fields = "__all__"
+        read_only_fields = ["image_status"]
 
 
 class ProductCollectionSerializer(serializers.ModelSerializer):
@@ -598,38 +671,15 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
         return attrs
 
     def _create_or_update_variants(self, product, items):
-        out = []
         for v in items or []:
-            sku = (v.get("sku") or "").strip()
-            if not sku:
-               w = (v.get("weight_value") or "").strip()
-               u = (v.get("weight_unit") or "").strip().upper()
-               if not (w and u):
-                  raise serializers.ValidationError("Each variant needs either sku or (weight_value & weight_unit).")
-               sku = f"{product.slug}-{w}{u.lower()}"
-
-            def _dec(x, default=None):
-                if x in (None, "", "null"):
-                    return default
-                try:
-                    return Decimal(str(x))
-                except Exception:
-                    return default
-
-            defaults = dict(
-                attributes    = v.get("attributes") or {"Weight": f'{v.get("weight_value")}{(v.get("weight_unit") or "").upper()}'},
-                weight_value  = _dec(v.get("weight_value")),
-                weight_unit   = (v.get("weight_unit") or "").upper() or None,
-                price_override= _dec(v.get("price"), None),
-                quantity      = int(v.get("stock") or 0),
-                is_active     = bool(v.get("is_active", True)),
-                mrp           = _dec(v.get("mrp"), None),
-                min_order_qty = int(v.get("min_order_qty") or 1),
-                step_qty      = int(v.get("step_qty") or 1),
-            )
-            obj, _ = ProductVariant.objects.update_or_create(product=product, sku=sku, defaults=defaults)
-            out.append(obj)
-        return out
+            # inline variants must be addressable; the bulk endpoint may derive "<slug>-var" SKUs
+            has_weight = str(v.get("weight_value") or "").strip() and str(v.get("weight_unit") or "").strip()
+            if not (str(v.get("sku") or "").strip() or has_weight):
+                raise serializers.ValidationError("Each variant needs either sku or (weight_value & weight_unit).")
+        try:
+            return upsert_variants(product, items or [])
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({"variants": e.message_dict if hasattr(e, "error_dict") else e.messages})
 
     def _handle_images_from_request(self, product: Product):
         request = self.context.get("request")
@@ -643,21 +693,30 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
         meta_list = self.validated_data.get("images_meta") or []
         meta = { (m.get("filename") or "").strip(): bool(m.get("is_primary")) for m in meta_list }
 
-        created = []
-        for f in files:
-            is_primary = meta.get(f.name, False)
-            img = ProductImage.objects.create(product=product, image=f, is_primary=is_primary)
-            created.append(img)
-
-        primary_obj = next((im for im in created if im.is_primary), None)
-        if not primary_obj:
-            existing_primary = ProductImage.objects.filter(product=product, is_primary=True).exclude(pk__in=[im.pk for im in created]).first()
-            primary_obj = existing_primary or (created[0] if created else None)
-
-        ProductImage.objects.filter(product=product).update(is_primary=False)
-        if primary_obj:
-            primary_obj.is_primary = True
-            primary_obj.save(update_fields=["is_primary"])
+        # decode/encode every file in parallel first, so nothing is written if one is bad
+        uploads = [(f.read(), f.name) for f in files]
+        results = images.encode_many(uploads, widths=ProductImage.RENDITION_WIDTHS)
+        bad = [name for (_, name), r in zip(uploads, results) if isinstance(r, Exception)]
+        if bad:
+            raise serializers.ValidationError({"images": [f"{name}: not a valid image." for name in bad]})
+
+        storage = ProductImage._meta.get_field("image").storage
+        with transaction.atomic():
+            created = ProductImage.objects.bulk_create([
+                ProductImage(product=product, is_primary=meta.get(name, False), **images.encoded_values(storage, r))
+                for (_, name), r in zip(uploads, results)
+            ])
+            new_ids = [im.pk for im in created]
+            primary_id = (
+                next((im.pk for im in created if im.is_primary), None)
+                or ProductImage.objects.filter(product=product, is_primary=True).exclude(pk__in=new_ids)
+                                       .values_list("pk", flat=True).first()
+                or new_ids[0]
+            )
+            # one UPDATE touching only the rows whose flag changes
+            ProductImage.objects.filter(product=product).filter(Q(is_primary=True) | Q(pk=primary_id)).update(
+                is_primary=Case(When(pk=primary_id, then=Value(True)), default=Value(False)),
+            )
 
     @transaction.atomic
     def create(self, validated_data):
@@ -733,18 +792,24 @@ class OrderLineSerializer(serializers.Serializer):
 
 class ProductMiniSerializer(serializers.ModelSerializer):
     primary_image_url = serializers.SerializerMethodField()
+    primary_thumb_url = serializers.SerializerMethodField()
 
     class Meta:
         model  = Product
-        fields = ("id", "slug", "name", "primary_image_url")
+        fields = ("id", "slug", "name", "primary_image_url", "primary_thumb_url")
 
     def get_primary_image_url(self, obj: Product) -> str:
-        url = obj.primary_image_url or ""
+        img = _primary_image(obj)
+        url = img.image.url if img and img.image else ""
         req = self.context.get("request")
         if url and req and not url.startswith("http"):
             return req.build_absolute_uri(url)
         return url
 
+    def get_primary_thumb_url(self, obj: Product):
+        img = _primary_image(obj)
+        return _thumb_url(self.context.get("request"), img) if img else None
+
 
 class VariantMiniSerializer(serializers.ModelSerializer):
     primary_image_url = serializers.SerializerMethodField()
@@ -819,8 +884,7 @@ class OrderSerializer(serializers.ModelSerializer):
         cc  = self._country()
 
         # Use the already-prefetched relations when available
-        items_qs = cart.items.select_related("product", "variant", "product__category").all()
-        for it in items_qs:
+        for it in _cart_items(cart):
             # unit price
             if it.variant_id:
                 price = it.variant.unit_price_for_country(cc)
@@ -864,7 +928,7 @@ class OrderSerializer(serializers.ModelSerializer):
 
         cc = self._country()
         subtotal = Decimal("0.00")
-        for it in cart.items.select_related("product", "variant").all():
+        for it in _cart_items(cart):
             if it.variant_id:
                 unit = it.variant.unit_price_for_country(cc)
             else:
@@ -944,17 +1008,17 @@ class CertificationSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at", "updated_at"]
 
 
-class GalleryItemSerializer(serializers.ModelSerializer):
+class GalleryItemSerializer(ImageRenditionFields, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
 
     class Meta:
         model  = GalleryItem
         fields = [
-            "id", "category", "image", "image_url", "title",
+            "id", "category", "image", "image_url", "image_srcset", "thumb_url", "title",
             "location", "date_label", "description", "attendees",
-            "is_active", "sort", "created_at", "updated_at",
+            "is_active", "sort", "image_status", "created_at", "updated_at",
         ]
-        read_only_fields = ["created_at", "updated_at"]
+        read_only_fields = ["image_status", "created_at", "updated_at"]
 
     def get_image_url(self, obj):
         request = self.context.get("request")
@@ -1058,12 +1122,12 @@ class BlogPostSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         user = getattr(request, "user", None)
         tags = validated.pop("tags", [])
-        post = BlogPost.objects.create(
+        post = BlogPost(
             author=user if user and user.is_authenticated else None,
             **validated
         )
         post.set_tags(tags or [])
-        post.save()
+        post.save()   # one save: one render, one index write
         self._snapshot_version(post, user)
         return post
 
@@ -1079,6 +1143,21 @@ class BlogPostSerializer(serializers.ModelSerializer):
         self._snapshot_version(instance, user)
         return instance
 
+
+class BlogPostSearchResultSerializer(serializers.ModelSerializer):
+    """One hit of BlogPostViewSet.search: no bodies, just the rank and a <mark>-highlighted snippet."""
+    category = BlogCategorySerializer(read_only=True)
+    tags = serializers.ListField(child=serializers.CharField(), read_only=True)
+    cover_url = serializers.SerializerMethodField()
+    rank = serializers.FloatField(source="search_rank", read_only=True)
+    snippet = serializers.CharField(source="search_snippet", read_only=True)
+
+    class Meta:
+        model = BlogPost
+        fields = ["id", "title", "slug", "excerpt", "category", "tags", "published_at", "cover_url", "rank", "snippet"]
+
+    get_cover_url = BlogPostSerializer.get_cover_url
+
 # --- Carts ---
 
 
@@ -0,0 +1,139 @@
+"""
+Probabilistic sketches used by the analytics counters.
+
+HyperLogLog estimates distinct counts in a fixed 2**p bytes (1 KiB at the
+default p=10, ~3% standard error). Sketches merge by taking the register-wise
+maximum, so per-day / per-node sketches can be combined in any order.
+
+CountMinSketch estimates per-key frequencies (never under-counts; over-counts
+by at most ~e/width of the total with high probability) and merges by adding
+counters. TopK keeps the heaviest keys seen by a Count-Min sketch.
+"""
+import hashlib
+import math
+from array import array
+
+
+def _hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 10, registers=None):
+        if not 4 <= p <= 16:
+            raise ValueError("p must be between 4 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError("register count does not match p")
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a sketch from `to_bytes()` output; empty data gives an empty sketch."""
+        if not data:
+            return cls()
+        data = bytes(data)
+        return cls(p=len(data).bit_length() - 1, registers=data)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    def add(self, value) -> None:
+        x = _hash64(value)
+        idx = x >> (64 - self.p)
+        rest = (x << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = min(64 - rest.bit_length(), 64 - self.p) + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)   # linear counting for small cardinalities
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 1024, depth: int = 4, counters=None):
+        self.width = width
+        self.depth = depth
+        self.table = array("I", counters) if counters is not None else array("I", bytes(4 * width * depth))
+        if len(self.table) != width * depth:
+            raise ValueError("counter count does not match width * depth")
+        self.total = 0
+
+    @classmethod
+    def from_bytes(cls, data, depth: int = 4):
+        if not data:
+            return cls(depth=depth)
+        table = array("I")
+        table.frombytes(bytes(data))
+        sketch = cls(width=len(table) // depth, depth=depth, counters=table)
+        sketch.total = sum(table[:sketch.width])   # every row sums to the total
+        return sketch
+
+    def to_bytes(self) -> bytes:
+        return self.table.tobytes()
+
+    def _cells(self, key):
+        digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key, n: int = 1) -> int:
+        """Count `key` n more times; returns its new estimate."""
+        cells = self._cells(key)
+        for c in cells:
+            self.table[c] = min(self.table[c] + n, 0xFFFFFFFF)
+        self.total += n
+        return min(self.table[c] for c in cells)
+
+    def estimate(self, key) -> int:
+        return min(self.table[c] for c in self._cells(key))
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("cannot merge sketches with different dimensions")
+        self.table = array("I", (min(a + b, 0xFFFFFFFF) for a, b in zip(self.table, other.table)))
+        self.total += other.total
+        return self
+
+
+class TopK:
+    """Heaviest `k` keys of a stream, with counts estimated by a CountMinSketch."""
+
+    def __init__(self, k: int = 50, sketch: CountMinSketch = None):
+        self.k = k
+        self.sketch = sketch or CountMinSketch()
+        self.counts = {}   # candidate key -> estimate (up to 2k between prunes)
+        self._floor = 0
+
+    def add(self, key, n: int = 1) -> None:
+        est = self.sketch.add(key, n)
+        if key in self.counts or len(self.counts) < self.k or est > self._floor:
+            self.counts[key] = est
+            if len(self.counts) >= 2 * self.k:
+                self._prune()
+
+    def _prune(self):
+        keep = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:self.k]
+        self.counts = dict(keep)
+        self._floor = keep[-1][1] if len(keep) >= self.k else 0
+
+    def top(self, limit: int = None) -> list:
+        """[(key, estimate), ...] heaviest first."""
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        return items[:limit or self.k]
@@ -0,0 +1,81 @@
+"""
+Replacing a product's specification table as a diff.
+
+`replace_specifications({product: [unsaved ProductSpecification, ...]})` loads
+the current rows of every given product in one query, matches them on their
+(group, name) key and, inside one transaction, deletes the rows no longer
+listed, bulk-updates the ones whose value / unit / highlight / order changed
+and bulk-creates the new ones. Unchanged rows are not touched (their ids and
+timestamps survive), readers never see a half-replaced table, and the number
+of statements doesn't grow with the number of rows.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ProductSpecification
+
+FIELDS = ["value", "unit", "is_highlight", "sort_order"]
+
+
+def build_specifications(items) -> list:
+    """
+    Unsaved rows for payload dicts ({group?, name, value, unit?, is_highlight?, sort_order?}),
+    sort_order defaulting to the position. Raises ValidationError on invalid values or a
+    repeated (group, name).
+    """
+    specs, seen = [], set()
+    for i, item in enumerate(items):
+        spec = ProductSpecification(
+            group=str(item.get("group") or "").strip(),
+            name=str(item.get("name") or "").strip(),
+            value=str(item["value"]) if item.get("value") is not None else "",
+            unit=str(item.get("unit") or "").strip(),
+            is_highlight=bool(item.get("is_highlight", False)),
+            sort_order=int(item.get("sort_order", i)),
+        )
+        if (spec.group, spec.name) in seen:
+            raise ValidationError({"specifications": f"Duplicate specification {spec.group!r} / {spec.name!r}."})
+        seen.add((spec.group, spec.name))
+        spec.clean_fields(exclude=["product"])
+        specs.append(spec)
+    return specs
+
+
+@transaction.atomic
+def replace_specifications(wanted) -> dict:
+    """
+    Make the specifications of each (saved) product in `wanted` exactly its list of
+    unsaved rows. Returns {"created", "updated", "deleted", "unchanged"} counts.
+    """
+    current = {
+        (row.product_id, row.group, row.name): row
+        for row in ProductSpecification.objects.filter(product__in=[p.pk for p in wanted])
+    }
+    created, updated, kept, unchanged = [], [], set(), 0
+    for product, specs in wanted.items():
+        for spec in specs:
+            row = current.get((product.pk, spec.group, spec.name))
+            if row is None:
+                spec.product = product
+                created.append(spec)
+                continue
+            kept.add(row.pk)
+            if all(getattr(row, f) == getattr(spec, f) for f in FIELDS):
+                unchanged += 1
+                continue
+            for f in FIELDS:
+                setattr(row, f, getattr(spec, f))
+            updated.append(row)
+
+    stale = [row.pk for row in current.values() if row.pk not in kept]
+    if stale:
+        ProductSpecification.objects.filter(pk__in=stale).delete()
+    if updated:
+        now = timezone.now()
+        for row in updated:
+            row.updated_at = now
+        ProductSpecification.objects.bulk_update(updated, FIELDS + ["updated_at"])
+    if created:
+        ProductSpecification.objects.bulk_create(created)
+    return {"created": len(created), "updated": len(updated), "deleted": len(stale), "unchanged": unchanged}
@@ -0,0 +1,12 @@
+"""S3 media storage that serves content-addressed blobs with an immutable Cache-Control."""
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from .blobs import IMMUTABLE, is_blob_name
+
+
+class MediaStorage(S3Boto3Storage):
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if is_blob_name(name):
+            params.setdefault("CacheControl", IMMUTABLE)
+        return params
@@ -1,3 +1,203 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import webhooks
+from .models import (
+    Cart, CartItem, Category, DailySalesFact, Order, OrderPayment, Product, RazorpayWebhookEvent, User,
+    Wishlist, WishlistItem,
+)
+from .sketches import CountMinSketch, HyperLogLog
+
+WEBHOOK_URL = "/api/payments/razorpay/webhook/"
+WEBHOOK_SECRET = "test-webhook-secret"
+
+
+def make_order(email, currency="INR"):
+    user = User.objects.create_user(email=email, password="x")
+    cart = Cart.objects.create(user=user)
+    return Order.objects.create(user=user, cart=cart, status="confirmed", currency=currency)
+
+
+def make_product(name="Basmati rice"):
+    category, _ = Category.objects.get_or_create(name="Grains", slug="grains")
+    return Product.objects.create(category=category, name=name, quantity=10)
+
+
+# ─────── Razorpay webhooks ───────
+@override_settings(RAZORPAY_WEBHOOK_SECRET=WEBHOOK_SECRET, VISIT_TRACKING_ENABLED=False)
+@mock.patch("ecommerceapp.background.submit")
+class RazorpayWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        order = make_order("buyer@example.com")
+        self.payment = OrderPayment.objects.create(
+            order=order, method="card", provider="razorpay", status="pending",
+            transaction_id="pay_123", amount=Decimal("499.00"),
+        )
+
+    def deliver(self, event, event_id, secret=WEBHOOK_SECRET):
+        body = json.dumps({
+            "event": event,
+            "payload": {"payment": {"entity": {"id": "pay_123", "method": "upi"}}},
+        }).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            WEBHOOK_URL, body, content_type="application/json",
+            HTTP_X_RAZORPAY_SIGNATURE=signature, HTTP_X_RAZORPAY_EVENT_ID=event_id,
+        )
+
+    def test_duplicate_delivery_is_stored_and_applied_once(self, submit):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.deliver("payment.captured", "evt_1")
+        with self.captureOnCommitCallbacks(execute=True):
+            again = self.deliver("payment.captured", "evt_1")
+
+        self.assertEqual((first.status_code, again.status_code), (200, 200))
+        self.assertEqual(RazorpayWebhookEvent.objects.filter(event_id="evt_1").count(), 1)
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(webhooks.drain(), 1)
+        self.assertEqual(webhooks.drain(), 0)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "paid")
+
+    def test_authorized_after_captured_does_not_downgrade(self, submit):
+        self.deliver("payment.captured", "evt_captured")
+        self.deliver("payment.authorized", "evt_authorized")
+        webhooks.drain()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "paid")
+        self.assertEqual(self.payment.method, "upi")
+        self.assertEqual(
+            set(RazorpayWebhookEvent.objects.values_list("status", flat=True)), {"processed"},
+        )
+
+    def test_bad_signature_is_rejected(self, submit):
+        response = self.deliver("payment.captured", "evt_forged", secret="not-the-secret")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RazorpayWebhookEvent.objects.exists())
+        submit.assert_not_called()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "pending")
+
+    def test_event_for_unknown_payment_waits(self, submit):
+        OrderPayment.objects.filter(pk=self.payment.pk).update(transaction_id="")
+        self.deliver("payment.captured", "evt_early")
+        webhooks.drain()
+
+        event = RazorpayWebhookEvent.objects.get(event_id="evt_early")
+        self.assertEqual((event.status, event.attempts), ("pending", 1))
+
+
+# ─────── Sales rollup ───────
+class DailySalesFactTests(TestCase):
+    def fact(self):
+        return DailySalesFact.objects.get(date=timezone.localdate(), currency="INR")
+
+    def test_refreshed_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_order("a@example.com")
+            OrderPayment.objects.create(order=order, method="card", status="paid", amount=Decimal("250.00"))
+        fact = self.fact()
+        self.assertEqual((fact.orders, fact.customers, fact.revenue), (1, 1, Decimal("250.00")))
+
+    def test_refreshed_on_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = make_order("a@example.com")
+            OrderPayment.objects.create(order=kept, method="card", status="paid", amount=Decimal("100.00"))
+            gone = make_order("b@example.com")
+            OrderPayment.objects.create(order=gone, method="card", status="paid", amount=Decimal("40.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            gone.delete()
+        fact = self.fact()
+        self.assertEqual((fact.orders, fact.customers, fact.revenue), (1, 1, Decimal("100.00")))
+
+    def test_refreshed_once_per_transaction(self):
+        order = make_order("a@example.com")
+        with mock.patch("ecommerceapp.models.refresh_daily_sales_fact") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for status in ("pending", "authorized", "paid"):
+                    order.status = status
+                    order.save()
+        refresh.assert_called_once_with(timezone.localdate(), "INR")
+
+
+# ─────── Counters ───────
+@override_settings(COUNTER_WRITE_BEHIND=False)
+class ItemCounterTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.user = User.objects.create_user(email="shopper@example.com", password="x")
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product, quantity=1)
+            wishlist, _ = Wishlist.create_for_user(self.user)
+            WishlistItem.objects.create(wishlist=wishlist, product=self.product)
+
+    def counts(self):
+        self.product.refresh_from_db()
+        return self.product.carts_count, self.product.wishes_count
+
+    def test_counted_on_create(self):
+        self.assertEqual(self.counts(), (1, 1))
+
+    def test_queryset_delete_decrements(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.filter(product=self.product).delete()
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_cascade_from_user_delete_decrements(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+
+# ─────── Sketches ───────
+class HyperLogLogTests(TestCase):
+    def test_estimate_within_error(self):
+        hll = HyperLogLog()
+        for i in range(5000):
+            hll.add(f"viewer-{i}")
+            hll.add(f"viewer-{i}")   # repeats don't count
+        self.assertAlmostEqual(hll.count(), 5000, delta=500)
+
+    def test_merge_is_union(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        for i in range(3000):
+            (a if i % 2 else b).add(i)
+        merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+        self.assertAlmostEqual(merged.count(), 3000, delta=300)
+
+    def test_full_product_save_keeps_merged_viewers(self):
+        from .models import merge_viewer_sketches
+
+        product = make_product()
+        stale = Product.objects.get(pk=product.pk)
+        hll = HyperLogLog()
+        for i in range(200):
+            hll.add(i)
+        merge_viewer_sketches({(product.pk, timezone.localdate()): hll})
+        merged = Product.objects.get(pk=product.pk).unique_viewers
+
+        stale.name = "Brown rice"
+        stale.save()
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.unique_viewers), ("Brown rice", merged))
+        self.assertGreater(merged, 0)
+
+
+class CountMinSketchTests(TestCase):
+    def test_never_undercounts(self):
+        cms = CountMinSketch(width=64)
+        truth = {f"/p/{i}": i % 7 + 1 for i in range(500)}
+        for key, n in truth.items():
+            cms.add(key, n)
+        for key, n in truth.items():
+            self.assertGreaterEqual(cms.estimate(key), n)
@@ -0,0 +1,166 @@
+"""
+Trending paths and products.
+
+Each process keeps a Count-Min sketch with a top-K candidate set per kind and
+hourly window, fed by VisitEventMiddleware (paths) and track_view (products).
+A daemon thread snapshots the windows it touched to TrendingSnapshot every
+TRENDING_SNAPSHOT_INTERVAL_MS; `trending()` merges the snapshots of all nodes
+and windows in range and ranks only their candidates, so no events are scanned.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .sketches import CountMinSketch, TopK
+
+log = logging.getLogger(__name__)
+
+WINDOW = timedelta(hours=1)
+KINDS = ("path", "product")
+
+
+def node_id() -> str:
+    """This process's snapshot node; read per process, since forked workers share an import-time pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def window_start(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+class TrendingTracker:
+    def __init__(self, k=50, interval_ms=60000, retention_hours=48):
+        self.pid = os.getpid()
+        self.node = node_id()
+        self.k = k
+        self.interval = max(10, interval_ms) / 1000
+        self.retention = timedelta(hours=max(1, retention_hours))
+        self._windows = {}   # (kind, window_start) -> TopK
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def record(self, kind: str, key, n: int = 1):
+        ws = window_start(timezone.now())
+        with self._lock:
+            top = self._windows.get((kind, ws))
+            if top is None:
+                top = self._windows[(kind, ws)] = TopK(k=self.k)
+            top.add(str(key), n)
+            self._dirty.add((kind, ws))
+        self._ensure_thread()
+
+    def snapshot(self) -> int:
+        """Write this node's touched windows; returns the number of rows saved."""
+        from .models import TrendingSnapshot
+
+        now = timezone.now()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            payload = [
+                (kind, ws, top.sketch.to_bytes(), top.sketch.total, top.top())
+                for (kind, ws), top in self._windows.items() if (kind, ws) in dirty
+            ]
+            # keep the previous window around for late hits; older ones are final
+            for key in [k for k in self._windows if k[1] < window_start(now) - WINDOW]:
+                del self._windows[key]
+
+        saved = 0
+        try:
+            for kind, ws, sketch, total, top in payload:
+                TrendingSnapshot.objects.update_or_create(
+                    node=self.node, kind=kind, window_start=ws,
+                    defaults={"sketch": sketch, "total": total, "top": [list(kv) for kv in top]},
+                )
+                saved += 1
+        except Exception:
+            with self._lock:
+                self._dirty.update((kind, ws) for kind, ws, *_ in payload[saved:])
+            raise
+        if saved:
+            TrendingSnapshot.objects.filter(kind__in=KINDS, window_start__lt=now - self.retention).delete()
+        return saved
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._dirty:
+                continue
+            close_old_connections()
+            try:
+                self.snapshot()
+            except Exception:
+                log.exception("Trending snapshot failed")
+            finally:
+                close_old_connections()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trending-snapshot", daemon=True)
+                self._thread.start()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+_atexit_registered = False
+
+
+def get_tracker() -> TrendingTracker:
+    global _tracker, _atexit_registered
+    # a tracker inherited through fork belongs to the parent: start this process's own
+    if _tracker is None or _tracker.pid != os.getpid():
+        with _tracker_lock:
+            if _tracker is None or _tracker.pid != os.getpid():
+                _tracker = TrendingTracker(
+                    k=getattr(settings, "TRENDING_TOP_K", 50),
+                    interval_ms=getattr(settings, "TRENDING_SNAPSHOT_INTERVAL_MS", 60000),
+                    retention_hours=getattr(settings, "TRENDING_RETENTION_HOURS", 48),
+                )
+                if not _atexit_registered:   # registrations survive fork
+                    atexit.register(_snapshot_at_exit)
+                    _atexit_registered = True
+    return _tracker
+
+
+def _snapshot_at_exit():
+    if _tracker is None or _tracker.pid != os.getpid():
+        return   # nothing recorded here; never write the parent's windows under its node
+    try:
+        _tracker.snapshot()
+    except Exception:
+        pass
+
+
+def record(kind: str, key, n: int = 1):
+    get_tracker().record(kind, key, n)
+
+
+def trending(kind: str, hours: int = 1, limit: int = 10):
+    """
+    Heaviest keys of `kind` over the last `hours` windows, merged across nodes.
+    Returns (total_hits, [(key, estimate), ...]).
+    """
+    from .models import TrendingSnapshot
+
+    since = window_start(timezone.now()) - (hours - 1) * WINDOW
+    merged, candidates = None, set()
+    for sketch, top in TrendingSnapshot.objects.filter(kind=kind, window_start__gte=since).values_list("sketch", "top"):
+        cms = CountMinSketch.from_bytes(sketch)
+        merged = cms if merged is None else merged.merge(cms)
+        candidates.update(key for key, _ in top)
+    if merged is None:
+        return 0, []
+    ranked = sorted(((key, merged.estimate(key)) for key in candidates), key=lambda kv: kv[1], reverse=True)
+    return merged.total, ranked[:limit]
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views  # keep module import so router can see all viewsets
-from .views import RazorpayCreateOrder, RazorpayVerifyPayment
+from .views import RazorpayCreateOrder, RazorpayVerifyPayment, RazorpayWebhookView
 
 router = DefaultRouter()
 router.register(r"categories", views.CategoryViewSet, basename="category")
@@ -18,6 +18,7 @@ router.register(r"vendors", views.VendorViewSet, basename="vendor")
 
 router.register(r"contacts", views.ContactSubmissionViewSet, basename="contacts")
 router.register(r"reviews", views.ProductReviewViewSet, basename="review")
+router.register(r"review-moderation", views.ProductReviewModerationViewSet, basename="review-moderation")
 router.register(r"visits", views.VisitEventViewSet, basename="visitevent")
 router.register(r"wishlist", views.WishlistViewSet, basename="wishlist")
 router.register(r"wishlist-items", views.WishlistItemViewSet, basename="wishlistitem")
@@ -52,8 +53,15 @@ urlpatterns = [
     path("api/analytics/sales-series/", views.SalesSeriesView.as_view(), name="sales-series"),
     path("api/analytics/kpis/", views.DashboardKpiView.as_view(), name="analytics-kpis"),
     path("api/dashboard/kpis/", views.DashboardKpiView.as_view(), name="dashboard-kpis"),
+    path("api/analytics/vendors/me/sales/", views.VendorSalesAnalyticsView.as_view(), name="vendor-sales-me"),
+    path("api/analytics/vendors/<int:vendor_id>/sales/", views.VendorSalesAnalyticsView.as_view(), name="vendor-sales"),
+    path("api/analytics/trending/", views.TrendingView.as_view(), name="analytics-trending"),
+
+    # 📦 staff exports (streamed CSV / JSON Lines)
+    path("api/exports/<str:dataset>/", views.ExportView.as_view(), name="export"),
 
     # 💳 Razorpay helpers
     path("api/payments/razorpay/create-order/", RazorpayCreateOrder.as_view()),
     path("api/payments/razorpay/verify/", RazorpayVerifyPayment.as_view()),
+    path("api/payments/razorpay/webhook/", RazorpayWebhookView.as_view(), name="razorpay-webhook"),
 ]
@@ -0,0 +1,203 @@
+"""
+Bulk variant upsert.
+
+`upsert_variants(product, items)` loads the product's variants once, matches
+each payload item in memory (by weight_value + weight_unit first, then by
+SKU), derives unique SKUs for new rows against one lookup of the SKUs already
+taken (plus a prefix lookup for bases that collide), and writes everything
+with one bulk_create and one bulk_update inside a transaction (VariantAttribute
+rows included): a constant number of queries however long the SKU sheet is.
+The in-memory half, `plan_variants`, is shared with the catalog importer.
+Items later in the payload see the rows planned by earlier ones, exactly as
+when each item was saved in turn.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProductVariant, sync_variant_attributes
+
+FIELDS = [
+    "attributes", "weight_value", "weight_unit", "price_override", "quantity",
+    "is_active", "mrp", "min_order_qty", "step_qty",
+]
+PREFIX_CHUNK = 500   # OR-ed LIKEs per query; SQLite caps expression depth at 1000
+
+
+def _dec(x, default=None):
+    if x in (None, "", "null"):
+        return default
+    try:
+        return Decimal(str(x))
+    except Exception:
+        return default
+
+
+def _int(v: dict, key: str, default: int) -> int:
+    try:
+        return int(v.get(key) or default)
+    except (TypeError, ValueError):
+        raise ValidationError({key: f"{key} must be a whole number."})
+
+
+def variant_values(v: dict) -> dict:
+    """Model field values for one payload item."""
+    wv = _dec(v.get("weight_value"))
+    wu = (v.get("weight_unit") or "").strip().upper() or None
+    return dict(
+        attributes=v.get("attributes") or ({"Weight": f"{v.get('weight_value')}{wu}"} if (wv is not None and wu) else {}),
+        weight_value=wv,
+        weight_unit=wu,
+        price_override=_dec(v.get("price"), None),
+        quantity=_int(v, "stock", 0),
+        is_active=bool(v.get("is_active", True)),
+        mrp=_dec(v.get("mrp"), None),
+        min_order_qty=_int(v, "min_order_qty", 1),
+        step_qty=_int(v, "step_qty", 1),
+    )
+
+
+def weight_sku(slug: str, wv, wu: str) -> str:
+    w = str(wv)
+    w = w.rstrip("0").rstrip(".") if "." in w else w
+    return f"{slug}-{w}{wu.lower()}"
+
+
+def _weight_key(obj):
+    if obj.weight_value is None or not obj.weight_unit:
+        return None
+    return (Decimal(obj.weight_value).normalize(), obj.weight_unit)
+
+
+def sku_base(slug: str, item: dict) -> str:
+    """The SKU a new variant for payload `item` is derived from."""
+    raw = (item.get("sku") or "").strip()
+    if raw:
+        return raw
+    wv = _dec(item.get("weight_value"))
+    wu = (item.get("weight_unit") or "").strip().upper()
+    if wv is not None and wu:
+        return weight_sku(slug, wv, wu)
+    return f"{slug}-var"
+
+
+def sku_bases(slug: str, existing, items) -> list:
+    """SKU bases of the payload `items` that none of the `existing` variants will absorb."""
+    skus = {v.sku for v in existing}
+    weights = {k for v in existing if (k := _weight_key(v)) is not None}
+    bases = []
+    for item in items:
+        wv = _dec(item.get("weight_value"))
+        wu = (item.get("weight_unit") or "").strip().upper()
+        if (wv is not None and wu and (wv.normalize(), wu) in weights) or (item.get("sku") or "").strip() in skus:
+            continue
+        bases.append(sku_base(slug, item))
+    return bases
+
+
+def requested_skus(items) -> set:
+    """Raw SKUs the payload `items` ask for; an existing variant may be moved onto one."""
+    return {sku for item in items if (sku := (item.get("sku") or "").strip())}
+
+
+def taken_skus(bases, exact=()) -> set:
+    """
+    Every SKU (any product) a new variant derived from `bases`, or an existing one
+    renamed to one of the `exact` SKUs, could collide with. Both are checked with one
+    IN lookup; "<base>-<n>" suffixes are only looked up for bases that are taken
+    already or wanted more than once.
+    """
+    counts = Counter(bases)
+    wanted = set(counts) | set(exact)
+    if not wanted:
+        return set()
+    taken = set(ProductVariant.objects.filter(sku__in=list(wanted)).values_list("sku", flat=True))
+    prefixed = sorted({b for b in counts if b in taken} | {b for b, n in counts.items() if n > 1})
+    for i in range(0, len(prefixed), PREFIX_CHUNK):
+        cond = Q()
+        for base in prefixed[i:i + PREFIX_CHUNK]:
+            cond |= Q(sku__startswith=f"{base}-")
+        taken.update(ProductVariant.objects.filter(cond).values_list("sku", flat=True))
+    return taken
+
+
+def plan_variants(product, existing, items, taken) -> tuple:
+    """
+    Match payload `items` against the `existing` variants of `product` in memory.
+    Returns (created, updated, out): unsaved new variants, changed existing ones and
+    one variant per item, in payload order. Mutates `existing` and `taken`; raises
+    ValidationError on invalid values.
+    """
+    by_weight = {k: v for v in existing if (k := _weight_key(v)) is not None}
+    by_sku = {v.sku: v for v in existing}
+
+    def unique_sku(base: str) -> str:
+        candidate, i = base, 2
+        while candidate in taken:
+            candidate = f"{base}-{i}"
+            i += 1
+        taken.add(candidate)
+        return candidate
+
+    created, updated, out = [], {}, []
+    for item in items:
+        raw_sku, values = (item.get("sku") or "").strip(), variant_values(item)
+        wv, wu = values["weight_value"], values["weight_unit"]
+        if wu and wv is None:
+            raise ValidationError({"weight_value": "weight_value is required when weight_unit is set."})
+        key = (Decimal(wv).normalize(), wu) if (wv is not None and wu) else None
+
+        variant = by_weight.get(key) if key else None
+        if variant is None and raw_sku:
+            variant = by_sku.get(raw_sku)
+
+        if variant is None:
+            variant = ProductVariant(product=product, sku=unique_sku(sku_base(product.slug, item)), **values)
+            created.append(variant)
+        else:
+            old_key = _weight_key(variant)
+            if raw_sku and variant.sku != raw_sku and raw_sku not in taken:
+                by_sku.pop(variant.sku, None)
+                variant.sku = raw_sku   # free to use
+                taken.add(raw_sku)
+            for k, val in values.items():
+                setattr(variant, k, val)
+            if old_key and by_weight.get(old_key) is variant and old_key != key:
+                del by_weight[old_key]
+            if variant.pk:
+                updated[variant.pk] = variant
+
+        if key:
+            by_weight[key] = variant
+        by_sku[variant.sku] = variant
+        out.append(variant)
+
+    for variant in created + list(updated.values()):
+        # field-level checks only: uniqueness was resolved above, and FK checks would query per row
+        variant.clean_fields(exclude=["product", "color"])
+    return created, list(updated.values()), out
+
+
+@transaction.atomic
+def upsert_variants(product, items) -> list:
+    """
+    Create or update `product`'s variants from payload dicts
+    ({sku?, weight_value?, weight_unit?, price, stock, is_active, mrp, min_order_qty?, step_qty?, attributes?}).
+    Returns one variant per item, in payload order. Raises ValidationError on invalid values.
+    """
+    existing = list(ProductVariant.objects.filter(product=product))
+    taken = taken_skus(sku_bases(product.slug, existing, items), requested_skus(items)) | {v.sku for v in existing}
+    created, updated, out = plan_variants(product, existing, items, taken)
+    if created:
+        ProductVariant.objects.bulk_create(created)
+    if updated:
+        now = timezone.now()
+        for variant in updated:
+            variant.updated_at = now
+        ProductVariant.objects.bulk_update(updated, FIELDS + ["sku", "updated_at"])
+    sync_variant_attributes(created + updated)
+    return out
@@ -1,16 +1,21 @@
 from decimal import Decimal
-from django.db.models import F, Sum, Count
+from django.db.models import F, Q, Sum, Count
+from django.core.cache import cache
+import time
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.http import StreamingHttpResponse
 import hmac
-from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+import json
+from django.db.models.functions import TruncWeek, TruncMonth
 import hashlib
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import validate_email as django_validate_email
@@ -24,6 +29,11 @@ from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import ValidationError
 from .models import *
 from .serializers import *
+from . import background, blobs, counters, exports, search, specifications, trending, variants, visits
+from .middleware import client_ip
+from .filters import FullTextSearchFilter, ProductFilter, filter_by_attributes, parse_attr_filters
+from .pagination import CreatedAtCursorPagination, StandardResultsSetPagination
+from .webhooks import drain as drain_razorpay_webhooks, payment_id_from_payload
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
@@ -39,6 +49,14 @@ User = get_user_model()
 def _country_code(request):
     return (request.headers.get("X-Country-Code") or request.query_params.get("country") or "IN").upper()
 
+def _viewer_key(request):
+    """Identity for distinct-viewer sketches: the user, else session key + IP."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"u:{user.pk}"
+    session = getattr(request, "session", None)
+    return f"a:{getattr(session, 'session_key', None) or ''}|{client_ip(request) or ''}"
+
 # ---------- permissions ----------
 def _from_email():
     return getattr(settings, "DEFAULT_FROM_EMAIL", None) or getattr(settings, "EMAIL_HOST_USER", None) or "no-reply@example.com"
@@ -448,9 +466,14 @@ class IsAdminOrVendorOwner(permissions.BasePermission):
     Staff can do anything.
     Vendors can write only their own products/variants/specs/images.
     Others read-only.
+    Views that set `owner_only_reads = True` apply the owner rule to reads too.
     """
+    @staticmethod
+    def _public_read(request, view):
+        return request.method in permissions.SAFE_METHODS and not getattr(view, "owner_only_reads", False)
+
     def has_permission(self, request, view):
-        if request.method in permissions.SAFE_METHODS:
+        if self._public_read(request, view):
             return True
         if request.user and request.user.is_staff:
             return True
@@ -459,12 +482,14 @@ class IsAdminOrVendorOwner(permissions.BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        if request.method in permissions.SAFE_METHODS:
+        if self._public_read(request, view):
             return True
         if request.user and request.user.is_staff:
             return True
 
         def _vendor_user_id(o):
+            if isinstance(o, Vendor):
+                return o.user_id
             if isinstance(o, Product):
                 return getattr(o.vendor, "user_id", None)
             if isinstance(o, ProductVariant):
@@ -481,135 +506,292 @@ class IsAdminOrVendorOwner(permissions.BasePermission):
 
 # ---------- simple sets ----------
 class SalesSeriesView(APIView):
+    """
+    GET ?granularity=day|week|month&periods=N[&currency=INR]
+    Built from the DailySalesFact rollup with a bounded date-range scan.
+    """
     permission_classes = [IsAdminUser]  # make AllowAny if you want it public
 
+    @staticmethod
+    def _add_months(d, n):
+        m = (d.month - 1 + n) % 12 + 1
+        y = d.year + (d.month - 1 + n) // 12
+        return d.replace(year=y, month=m, day=1)
+
     def get(self, request):
         gran = (request.query_params.get("granularity") or "month").lower()
         periods = max(1, min(int(request.query_params.get("periods") or 6), 24))
+        currency = (request.query_params.get("currency") or "").upper()
+        today = timezone.localdate()
 
-        trunc = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}.get(gran, TruncMonth)
-        now = timezone.now()
-
-        # base filters (only paid revenue)
-        pay_qs = OrderPayment.objects.filter(status="paid")
-        ord_qs = Order.objects.all()
-
-        # group
-        pay_series = (
-            pay_qs
-            .annotate(bucket=trunc("created_at"))
-            .values("bucket")
-            .annotate(revenue=Sum("amount"))
-        )
-        ord_series = (
-            ord_qs
-            .annotate(bucket=trunc("created_at"))
-            .values("bucket")
-            .annotate(orders=Count("id"), customers=Count("user_id", distinct=True))
-        )
-
-        # merge buckets into a dict
-        buckets = {}
-        for row in pay_series:
-            k = row["bucket"].date() if gran == "day" else row["bucket"]
-            buckets.setdefault(k, {"revenue": 0, "orders": 0, "customers": 0})
-            buckets[k]["revenue"] = float(row["revenue"] or 0)
-
-        for row in ord_series:
-            k = row["bucket"].date() if gran == "day" else row["bucket"]
-            buckets.setdefault(k, {"revenue": 0, "orders": 0, "customers": 0})
-            buckets[k]["orders"] = int(row["orders"] or 0)
-            buckets[k]["customers"] = int(row["customers"] or 0)
-
-        # build last N periods, oldest→newest
-        def add_months(dt, n):
-            m = (dt.month - 1 + n) % 12 + 1
-            y = dt.year + (dt.month - 1 + n) // 12
-            d = min(dt.day, 28)  # keep simple
-            return dt.replace(year=y, month=m, day=d)
-
-        points = []
+        # bucket start dates, oldest→newest (weeks start on Monday like TruncWeek)
         if gran == "day":
-            start = now.date().replace(day=now.day)  # today
-            for i in range(periods - 1, -1, -1):
-                day = now.date() - timezone.timedelta(days=i)
-                v = buckets.get(day) or {"revenue": 0, "orders": 0, "customers": 0}
-                points.append({"name": day.strftime("%d %b"), "sales": v["revenue"], "orders": v["orders"], "customers": v["customers"]})
+            starts = [today - timezone.timedelta(days=i) for i in range(periods - 1, -1, -1)]
+            bucket_of = lambda d: d
         elif gran == "week":
-            # ISO week label
-            for i in range(periods - 1, -1, -1):
-                wk_start = (now - timezone.timedelta(weeks=i))
-                k = trunc("created_at")(now).resolve_expression(Order.objects.query).output_field  # not used; we’ll just best-effort
-                # approximate by monday of that week for lookup
-                monday = (now - timezone.timedelta(weeks=i)).date()
-                v = buckets.get(monday) or {"revenue": 0, "orders": 0, "customers": 0}
-                points.append({"name": f"W{(now.isocalendar().week - i - 1) % 52 + 1}", "sales": v["revenue"], "orders": v["orders"], "customers": v["customers"]})
+            monday = today - timezone.timedelta(days=today.weekday())
+            starts = [monday - timezone.timedelta(weeks=i) for i in range(periods - 1, -1, -1)]
+            bucket_of = lambda d: d - timezone.timedelta(days=d.weekday())
         else:  # month
-            base = now.replace(day=1)
-            for i in range(periods - 1, -1, -1):
-                month_dt = add_months(base, -i)
-                key = month_dt.replace(day=1)
-                v = buckets.get(key) or {"revenue": 0, "orders": 0, "customers": 0}
-                points.append({"name": month_dt.strftime("%b"), "sales": v["revenue"], "orders": v["orders"], "customers": v["customers"]})
-
+            first = today.replace(day=1)
+            starts = [self._add_months(first, -i) for i in range(periods - 1, -1, -1)]
+            bucket_of = lambda d: d.replace(day=1)
+
+        buckets = {k: {"revenue": 0, "orders": 0, "customers": 0} for k in starts}
+
+        facts = DailySalesFact.objects.filter(date__gte=starts[0], date__lte=today)
+        if currency:
+            facts = facts.filter(currency=currency)
+        for row in facts.values("date").annotate(
+            revenue=Sum("revenue"), orders=Sum("orders"), customers=Sum("customers")
+        ):
+            b = buckets.get(bucket_of(row["date"]))
+            if b is None:
+                continue
+            b["revenue"] += float(row["revenue"] or 0)
+            b["orders"] += int(row["orders"] or 0)
+            b["customers"] += int(row["customers"] or 0)
+
+        if gran != "day":
+            # distinct customers don't add up across days; count them over the same bounded range
+            trunc = TruncWeek if gran == "week" else TruncMonth
+            ord_qs = Order.objects.filter(created_at__gte=day_bounds(starts[0])[0])
+            if currency:
+                ord_qs = ord_qs.filter(currency=currency)
+            for b in buckets.values():
+                b["customers"] = 0
+            for row in (
+                ord_qs.annotate(bucket=trunc("created_at")).values("bucket")
+                .annotate(customers=Count("user_id", distinct=True))
+            ):
+                b = buckets.get(timezone.localdate(row["bucket"]))
+                if b is not None:
+                    b["customers"] = int(row["customers"] or 0)
+
+        def label(d):
+            if gran == "day":
+                return d.strftime("%d %b")
+            if gran == "week":
+                return f"W{d.isocalendar().week}"
+            return d.strftime("%b")
+
+        points = [
+            {"name": label(k), "sales": v["revenue"], "orders": v["orders"], "customers": v["customers"]}
+            for k, v in buckets.items()
+        ]
         return Response({"granularity": gran, "points": points})
 
 class DashboardKpiView(APIView):
+    """
+    Dashboard KPIs in three aggregate queries (products, sales rollup, wishlist).
+    Cached; once older than DASHBOARD_KPI_TTL seconds the cached copy is still
+    served while a background job recomputes it.
+    """
     permission_classes = [IsAdminUser]  # or AllowAny if you want it public
+    cache_key = "analytics:dashboard-kpis"
 
-    def get(self, request):
-        # products
-        total_products = Product.objects.count()
-        in_stock = Product.objects.filter(quantity__gt=0).count()
-        out_of_stock = total_products - in_stock
-
-        # orders (customize if you track date fields differently)
+    @staticmethod
+    def compute():
         today = timezone.localdate()
-        orders_today = Order.objects.filter(created_at__date=today).count()
-        orders_month = Order.objects.filter(
-            created_at__year=today.year, created_at__month=today.month
-        ).count()
-
-        # revenue (example: sum OrderPayment where status=paid)
-        revenue_today = (
-            OrderPayment.objects
-            .filter(status="paid", created_at__date=today)
-            .aggregate(x=Sum("amount"))
-            .get("x") or 0
-        )
-        revenue_month = (
-            OrderPayment.objects
-            .filter(status="paid", created_at__year=today.year, created_at__month=today.month)
-            .aggregate(x=Sum("amount"))
-            .get("x") or 0
+        month_start = today.replace(day=1)
+
+        # products: conditional aggregation instead of one COUNT per filter
+        prod = Product.objects.aggregate(
+            total=Count("id"),
+            in_stock=Count("id", filter=Q(quantity__gt=0)),
+            sold=Sum("sold_count"),
+            reviews=Sum("reviews_count"),
+            rating_weighted=Sum(F("rating_avg") * F("reviews_count")),
         )
 
-        # avg rating (approved reviews)
-        avg_rating = (
-            ProductReview.objects.filter(is_approved=True)
-            .aggregate(x=Sum("rating") * 1.0 / Count("id"))
-            .get("x")
+        # orders / revenue from the daily rollup: plain date-range predicates
+        sales = DailySalesFact.objects.filter(date__gte=month_start, date__lte=today).aggregate(
+            orders_month=Sum("orders"),
+            revenue_month=Sum("revenue"),
+            orders_today=Sum("orders", filter=Q(date=today)),
+            revenue_today=Sum("revenue", filter=Q(date=today)),
         )
-        # if DB above returns None, normalize:
-        avg_rating = f"{(avg_rating or 0):.1f}"
 
-        # wishlist items (if you keep per-user wishlists)
-        wishlist_items = WishlistItem.objects.count() if WishlistItem.objects.exists() else 0
+        total_products = prod["total"] or 0
+        in_stock = prod["in_stock"] or 0
+        avg_rating = (prod["rating_weighted"] or 0) / prod["reviews"] if prod["reviews"] else 0
 
-        data = {
+        return {
             "totalProducts": total_products,
             "inStock": in_stock,
-            "outOfStock": out_of_stock,
-            "totalSold": ProductVariant.objects.aggregate(x=Sum("quantity")).get("x") or 0,  # adjust if you store sold separately
-            "ordersToday": orders_today,
-            "revenueToday": f"₹{int(revenue_today):,}",
-            "ordersThisMonth": orders_month,
-            "revenueThisMonth": f"₹{int(revenue_month):,}",
-            "averageRating": str(avg_rating),
-            "wishlistItems": wishlist_items,
+            "outOfStock": total_products - in_stock,
+            "totalSold": prod["sold"] or 0,
+            "ordersToday": sales["orders_today"] or 0,
+            "revenueToday": f"₹{int(sales['revenue_today'] or 0):,}",
+            "ordersThisMonth": sales["orders_month"] or 0,
+            "revenueThisMonth": f"₹{int(sales['revenue_month'] or 0):,}",
+            "averageRating": f"{avg_rating:.1f}",
+            "wishlistItems": WishlistItem.objects.count(),
         }
-        return Response(data)
-    
+
+    @classmethod
+    def refresh(cls):
+        ttl = getattr(settings, "DASHBOARD_KPI_TTL", 60)
+        data = cls.compute()
+        # keep serving the stale copy for a while if refreshes start failing
+        cache.set(cls.cache_key, {"data": data, "at": time.time()}, ttl * 10)
+        return data
+
+    def get(self, request):
+        ttl = getattr(settings, "DASHBOARD_KPI_TTL", 60)
+        cached = cache.get(self.cache_key)
+        if cached is None:
+            return Response(self.refresh())
+        if time.time() - cached["at"] > ttl:
+            background.submit(self.cache_key, self.refresh)
+        return Response(cached["data"])
+
+class VendorSalesAnalyticsView(APIView):
+    """
+    GET /api/analytics/vendors/<id>/sales/?days=30&granularity=day|week|month&top=10
+    GET /api/analytics/vendors/me/sales/   (the requesting vendor)
+    The series comes from the VendorDailySales rollup (distinct orders per day),
+    top products from VendorProductDailySales;
+    unique_viewers merges the ProductViewerSketch rows of the window.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrVendorOwner]
+    owner_only_reads = True
+
+    def get(self, request, vendor_id=None):
+        if vendor_id is None:
+            vendor = get_object_or_404(Vendor, user=request.user)
+        else:
+            vendor = get_object_or_404(Vendor, pk=vendor_id)
+        self.check_object_permissions(request, vendor)
+
+        gran = (request.query_params.get("granularity") or "day").lower()
+        try:
+            days = max(1, min(int(request.query_params.get("days") or 30), 366))
+            top = max(1, min(int(request.query_params.get("top") or 10), 50))
+        except ValueError:
+            return Response({"detail": "days/top must be integers"}, status=400)
+
+        today = timezone.localdate()
+        since = today - timezone.timedelta(days=days - 1)
+        rows = VendorProductDailySales.objects.filter(vendor=vendor, date__gte=since, date__lte=today)
+
+        if gran == "week":
+            bucket_of = lambda d: d - timezone.timedelta(days=d.weekday())
+        elif gran == "month":
+            bucket_of = lambda d: d.replace(day=1)
+        else:
+            gran, bucket_of = "day", (lambda d: d)
+
+        series = {}
+        totals = VendorDailySales.objects.filter(vendor=vendor, date__gte=since, date__lte=today)
+        for r in totals.values("date", "units", "revenue", "orders"):
+            b = series.setdefault(bucket_of(r["date"]), {"units": 0, "revenue": Decimal("0.00"), "orders": 0})
+            b["units"] += r["units"] or 0
+            b["revenue"] += r["revenue"] or 0
+            b["orders"] += r["orders"] or 0
+
+        top_products = list(
+            rows.values("product_id", "product__name", "product__slug")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"), orders=Sum("orders"))
+            .order_by("-revenue", "-units")[:top]
+        )
+
+        # distinct viewers over the window: merge the daily HyperLogLog sketches
+        sketches = ProductViewerSketch.objects.filter(
+            product__vendor=vendor, date__gte=since, date__lte=today,
+        ).values_list("product_id", "hll")
+        by_product = {}
+        for pid, hll in sketches:
+            by_product.setdefault(pid, []).append(hll)
+        unique_viewers = estimate_viewers(h for hs in by_product.values() for h in hs)
+
+        return Response({
+            "vendor_id": vendor.id,
+            "granularity": gran,
+            "from": since,
+            "to": today,
+            "unique_viewers": unique_viewers,
+            "series": [
+                {"period": k, "units": v["units"], "revenue": f"{v['revenue']:.2f}", "orders": v["orders"]}
+                for k, v in sorted(series.items())
+            ],
+            "top_products": [
+                {
+                    "product_id": r["product_id"],
+                    "name": r["product__name"],
+                    "slug": r["product__slug"],
+                    "units": r["units"] or 0,
+                    "revenue": f"{(r['revenue'] or 0):.2f}",
+                    "orders": r["orders"] or 0,
+                    "unique_viewers": estimate_viewers(by_product.get(r["product_id"], [])),
+                }
+                for r in top_products
+            ],
+        })
+
+class TrendingView(APIView):
+    """
+    GET /api/analytics/trending/?kind=product|path&hours=1&limit=10
+    Heaviest products / paths from the merged Count-Min snapshots of every node
+    (refreshed every TRENDING_SNAPSHOT_INTERVAL_MS). Paths are staff-only.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        kind = (request.query_params.get("kind") or "product").lower()
+        if kind not in trending.KINDS:
+            return Response({"detail": "kind must be 'product' or 'path'"}, status=400)
+        if kind == "path" and not (request.user and request.user.is_staff):
+            return Response({"detail": "You do not have permission to perform this action."}, status=403)
+        try:
+            hours = max(1, min(int(request.query_params.get("hours") or 1), 48))
+            limit = max(1, min(int(request.query_params.get("limit") or 10), 50))
+        except ValueError:
+            return Response({"detail": "hours/limit must be integers"}, status=400)
+
+        total, ranked = trending.trending(kind, hours=hours, limit=limit if kind == "path" else 50)
+        if kind == "path":
+            items = [{"path": key, "hits": n} for key, n in ranked]
+        else:
+            products = Product.objects.filter(
+                pk__in=[int(key) for key, _ in ranked if key.isdigit()], is_published=True,
+            ).only("id", "name", "slug").in_bulk()
+            items = [
+                {"product_id": products[int(key)].id, "name": products[int(key)].name,
+                 "slug": products[int(key)].slug, "views": n}
+                for key, n in ranked if key.isdigit() and int(key) in products
+            ][:limit]
+        return Response({"kind": kind, "hours": hours, "total": total, "items": items})
+
+class ExportView(APIView):
+    """
+    GET /api/exports/<dataset>/?fmt=csv|jsonl&since=<ISO datetime>
+    Streams orders / visits / reviews / contacts changed since `since`.
+    X-Export-Watermark is the `since` to send on the next incremental pull.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, dataset):
+        if dataset not in exports.DATASETS:
+            return Response({"detail": f"Unknown dataset. Choose from: {', '.join(exports.DATASETS)}"}, status=404)
+        fmt = (request.query_params.get("fmt") or "csv").lower()
+        if fmt not in exports.FORMATS:
+            return Response({"detail": "fmt must be 'csv' or 'jsonl'"}, status=400)
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({"detail": "since must be an ISO datetime"}, status=400)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        lines, until = exports.export(dataset, fmt=fmt, since=since)
+        response = StreamingHttpResponse(lines, content_type=exports.FORMATS[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{dataset}-{until:%Y%m%dT%H%M%S}.{fmt}"'
+        response["X-Export-Watermark"] = until.isoformat()
+        response["Cache-Control"] = "no-store"
+        return response
+
 class ColorViewSet(viewsets.ModelViewSet):
     queryset = Color.objects.all().order_by("name")
     serializer_class = ColorSerializer
@@ -655,16 +837,18 @@ class ProductViewSet(viewsets.ModelViewSet):
         Product.objects
         .select_related("category", "vendor", "store")
         .prefetch_related("images", "variants", "options", "specifications")
-        .all()
+        .defer("viewers_hll")   # 1 KiB sketch, only read by the counter flush
     )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["name", "slug", "description", "category__name"]
     ordering_fields = ["created_at", "name", "price_inr", "price_usd"]
-    filterset_fields = ["featured", "category", "category__slug", "is_published", "slug"]
+    filterset_class = ProductFilter
     parser_classes = [JSONParser, FormParser, MultiPartParser]
+    REVIEW_SUMMARY_MAX = 20
+    FACET_VALUES_MAX = 50
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve", "track_view"]:
+        if self.action in ["list", "retrieve", "track_view", "review_summary", "facets"]:
             return [permissions.AllowAny()]
         return [IsAdminOrVendorOwner()]
 
@@ -704,7 +888,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         product = self.get_object()
         ser = ProductCreateUpdateSerializer(
             instance=product,
-            data={},
+            data={"images_meta": request.data.get("images_meta") or []},
             context={"request": request},
             partial=True,
         )
@@ -714,26 +898,105 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.AllowAny])
     def track_view(self, request, pk=None):
-        Product.objects.filter(pk=pk).update(views_count=F("views_count") + 1)
+        try:
+            pid = int(pk)
+        except (TypeError, ValueError):
+            return Response({"detail": "Not found."}, status=404)
+        counters.incr(Product, pid, "views_count")
+        counters.add_viewer(pid, _viewer_key(request))
+        trending.record("product", pid)
         return Response({"ok": True})
 
+    @action(detail=False, methods=["get"], permission_classes=[permissions.AllowAny])
+    def facets(self, request):
+        """
+        Variant attribute facets for the products matching the current filters:
+        {"attributes": {name: [{"value", "count", "selected"}, ...]}}; counts are products.
+        A selected attribute is counted without its own filter, so its other
+        values stay visible for OR-ing.
+        """
+        fs = self.filterset_class(request.query_params, queryset=Product.objects.all(), request=request)
+        if not fs.is_valid():
+            return Response(fs.errors, status=400)
+        fs.skip_attributes = True
+        pre = filters.SearchFilter().filter_queryset(request, fs.qs, self)
+        groups = parse_attr_filters(request.query_params)
+        base = filter_by_attributes(pre, groups)
+
+        def counts(products, names=None, exclude=None):
+            qs = VariantAttribute.objects.filter(is_active=True, product__in=products.values("pk"))
+            qs = qs.filter(name__in=names) if names is not None else qs.exclude(name__in=exclude or [])
+            return qs.values("name", "value").annotate(count=Count("product", distinct=True)).order_by("name", "-count", "value")
+
+        rows = list(counts(base, exclude=list(groups)))
+        for name in groups:
+            rows += counts(filter_by_attributes(pre, groups, exclude=name), names=[name])
+
+        facets = {}
+        for r in rows:
+            values = facets.setdefault(r["name"], [])
+            if len(values) < self.FACET_VALUES_MAX:
+                values.append({"value": r["value"], "count": r["count"], "selected": r["value"] in groups.get(r["name"], ())})
+        return Response({"attributes": facets})
+
+    @action(detail=True, methods=["get"], url_path="review-summary", permission_classes=[permissions.AllowAny])
+    def review_summary(self, request, pk=None):
+        """
+        Star histogram, average, count and newest approved reviews (?limit=5, max 20),
+        served from ProductRatingSummary and cached per summary version (its updated_at).
+        """
+        try:
+            pid = int(pk)
+            limit = max(1, min(int(request.query_params.get("limit") or 5), self.REVIEW_SUMMARY_MAX))
+        except (TypeError, ValueError):
+            return Response({"detail": "Not found."}, status=404)
+
+        # one indexed lookup per request: publish state + summary version
+        found = list(Product.objects.filter(pk=pid, is_published=True).values_list("rating_summary__updated_at", flat=True))
+        if not found:
+            return Response({"detail": "Not found."}, status=404)
+        key = review_summary_cache_key(pid, found[0])
+        data = cache.get(key) if found[0] else None
+        if data is None:
+            summary = ProductRatingSummary.objects.filter(product_id=pid).first()
+            if summary is None:
+                rebuild_review_stats([pid])
+                summary = ProductRatingSummary.objects.get(product_id=pid)
+            key = review_summary_cache_key(pid, summary.updated_at)
+            reviews = list(
+                ProductReview.objects.filter(product_id=pid, is_approved=True)
+                .order_by("-created_at")
+                .values("id", "user_name", "rating", "title", "body", "created_at")[:self.REVIEW_SUMMARY_MAX]
+            )
+            data = {
+                "product_id": pid,
+                "average": f"{summary.average:.2f}",
+                "count": summary.count,
+                "histogram": {str(star): n for star, n in summary.histogram.items()},
+                "reviews": reviews,
+            }
+            cache.set(key, data, getattr(settings, "REVIEW_SUMMARY_CACHE_TTL", 300))
+
+        response = Response({**data, "reviews": data["reviews"][:limit]})
+        response["Cache-Control"] = f"public, max-age={getattr(settings, 'REVIEW_SUMMARY_MAX_AGE', 60)}"
+        return response
+
     @action(detail=True, methods=["put"], permission_classes=[IsAdminOrVendorOwner])
     def replace_specifications(self, request, pk=None):
+        """
+        Replace the product's specifications with the payload list, as one atomic diff:
+        rows are matched on (group, name); unchanged ones are kept, changed ones updated,
+        new ones created and unlisted ones deleted.
+        """
         product = self.get_object()
-        ser = ProductSpecificationSerializer(data=request.data, many=True)
+        ser = SpecificationItemSerializer(data=request.data, many=True)
         ser.is_valid(raise_exception=True)
-        ProductSpecification.objects.filter(product=product).delete()
-        for i, spec in enumerate(ser.validated_data):
-            ProductSpecification.objects.create(
-                product=product,
-                name=spec["name"],
-                value=spec["value"],
-                unit=spec.get("unit") or "",
-                group=spec.get("group") or "",
-                is_highlight=spec.get("is_highlight") or False,
-                sort_order=spec.get("sort_order") or i,
-            )
-        return Response({"ok": True})
+        items = [{**spec, "sort_order": spec.get("sort_order") or i} for i, spec in enumerate(ser.validated_data)]
+        try:
+            counts = specifications.replace_specifications({product: specifications.build_specifications(items)})
+        except DjangoValidationError as e:
+            return Response({"detail": e.message_dict if hasattr(e, "error_dict") else e.messages}, status=400)
+        return Response({"ok": True, **counts})
 
     @action(detail=True, methods=["post"], permission_classes=[IsAdminOrVendorOwner])
     def upsert_variants(self, request, pk=None):
@@ -748,84 +1011,10 @@ class ProductViewSet(viewsets.ModelViewSet):
         items = request.data.get("variants") or []
         if not isinstance(items, list):
             return Response({"detail": "variants must be a list"}, status=400)
-
-        def _dec(x, default=None):
-            if x in (None, "", "null"):
-                return default
-            try:
-                return Decimal(str(x))
-            except Exception:
-                return default
-
-        def _unique_sku(base: str) -> str:
-            base = (base or "").strip() or f"{product.slug}-var"
-            candidate = base
-            i = 2
-            while ProductVariant.objects.filter(product=product, sku=candidate).exists():
-                candidate = f"{base}-{i}"
-                i += 1
-            return candidate
-
-        out = []
-        for v in items:
-            raw_sku = (v.get("sku") or "").strip()
-            wv = _dec(v.get("weight_value"))
-            wu = (v.get("weight_unit") or "").strip().upper() or None
-
-            # Prepare defaults
-            defaults = dict(
-                attributes=v.get("attributes") or ({"Weight": f"{v.get('weight_value')}{(v.get('weight_unit') or '').upper()}"} if (wv is not None and wu) else {}),
-                weight_value=wv,
-                weight_unit=wu,
-                price_override=_dec(v.get("price"), None),
-                quantity=int(v.get("stock") or 0),
-                is_active=bool(v.get("is_active", True)),
-                mrp=_dec(v.get("mrp"), None),
-                min_order_qty=int(v.get("min_order_qty") or 1),
-                step_qty=int(v.get("step_qty") or 1),
-            )
-
-            variant = None
-
-            # 1) Try match by weight combo (if provided)
-            if (wv is not None) and wu:
-                variant = ProductVariant.objects.filter(
-                    product=product, weight_value=wv, weight_unit=wu
-                ).first()
-
-            # 2) Else try match by SKU
-            if variant is None and raw_sku:
-                variant = ProductVariant.objects.filter(product=product, sku=raw_sku).first()
-
-            # 3) Create if none found
-            if variant is None:
-                # Derive or ensure unique SKU
-                if raw_sku:
-                    sku_final = _unique_sku(raw_sku)
-                elif (wv is not None) and wu:
-                    base_sku = f"{product.slug}-{str(wv).rstrip('0').rstrip('.') if '.' in str(wv) else str(wv)}{wu.lower()}"
-                    sku_final = _unique_sku(base_sku)
-                else:
-                    sku_final = _unique_sku(f"{product.slug}-var")
-
-                variant = ProductVariant.objects.create(product=product, sku=sku_final, **defaults)
-                out.append(variant)
-                continue
-
-            # 4) Update existing (and optionally move SKU if provided)
-            if raw_sku:
-                if variant.sku != raw_sku:
-                    # If another row already has raw_sku, pick a unique one for *this* variant
-                    if ProductVariant.objects.filter(product=product, sku=raw_sku).exclude(pk=variant.pk).exists():
-                        # keep current variant.sku (no clash) – or you can assign a unique derived one:
-                        pass
-                    else:
-                        variant.sku = raw_sku  # free to use
-            # apply field updates
-            for k, val in defaults.items():
-                setattr(variant, k, val)
-            variant.save()
-            out.append(variant)
+        try:
+            out = variants.upsert_variants(product, items)
+        except DjangoValidationError as e:
+            return Response({"detail": e.message_dict if hasattr(e, "error_dict") else e.messages}, status=400)
 
         ser = ProductVariantSerializer(out, many=True, context=self.get_serializer_context())
         return Response({"ok": True, "count": len(out), "variants": ser.data}, status=200)
@@ -894,7 +1083,9 @@ class CartViewSet(viewsets.ModelViewSet):
       POST /api/carts/set_quantity/
       POST /api/carts/remove_item/
     """
-    queryset = Cart.objects.prefetch_related("items", "items__product", "items__variant", "items__variant__images")
+    queryset = Cart.objects.prefetch_related(
+        "items", "items__product", "items__product__images", "items__variant", "items__variant__images",
+    )
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser, FormParser, MultiPartParser]
     serializer_class = CartSerializer  # <-- enable read endpoints
@@ -911,7 +1102,7 @@ class CartViewSet(viewsets.ModelViewSet):
         not a paginated list (keeps frontend simple).
         """
         cart = Cart.objects.filter(user=request.user, checked_out=False)\
-                           .prefetch_related("items", "items__product", "items__variant")\
+                           .prefetch_related("items", "items__product", "items__product__images", "items__variant")\
                            .first()
         if not cart:
             # safe empty shape so UI never crashes
@@ -1064,6 +1255,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "cart__items",
                 "cart__items__product",
                 "cart__items__product__category",
+                "cart__items__product__images",
                 "cart__items__variant",
                 "cart__items__variant__images",
             )
@@ -1378,6 +1570,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "totals": checkout.get("totals") or {},
             },
         )
+        # webhook deliveries that beat this confirmation were parked as unmatched; apply them now
+        transaction.on_commit(lambda: background.submit("razorpay-webhooks", drain_razorpay_webhooks))
 
         cart.checked_out = True
         cart.save(update_fields=["checked_out"])
@@ -1581,6 +1775,45 @@ class RazorpayVerifyPayment(RazorpayBase):
             return Response({"ok": False}, status=400)
 
         return Response({"ok": True})
+
+
+class RazorpayWebhookView(RazorpayBase):
+    """
+    POST <raw Razorpay webhook body>  (header X-Razorpay-Signature)
+    -> { ok: true }
+    Verifies the HMAC, stores the raw event and acknowledges immediately;
+    events are applied to OrderPayment in batches by a background worker
+    (or `manage.py process_razorpay_webhooks`).
+    """
+    def post(self, request):
+        secret = settings.RAZORPAY_WEBHOOK_SECRET
+        if not secret:
+            return Response({"detail": "Webhook secret not configured"}, status=503)
+
+        body = request.body
+        signature = request.headers.get("X-Razorpay-Signature") or ""
+        expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            return Response({"detail": "Invalid signature"}, status=400)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response({"detail": "Invalid JSON"}, status=400)
+
+        # Razorpay retries deliveries with the same event id -> store once
+        event_id = request.headers.get("X-Razorpay-Event-Id") or hashlib.sha256(body).hexdigest()[:64]
+        _, created = RazorpayWebhookEvent.objects.get_or_create(
+            event_id=event_id,
+            defaults={
+                "event": str(payload.get("event") or "")[:64],
+                "payment_id": payment_id_from_payload(payload),
+                "payload": payload,
+            },
+        )
+        if created:
+            transaction.on_commit(lambda: background.submit("razorpay-webhooks", drain_razorpay_webhooks))
+        return Response({"ok": True})
 # ---------- Wishlist ----------
 
 class WishlistViewSet(viewsets.ReadOnlyModelViewSet):
@@ -1634,8 +1867,76 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
         return qs
 # Visit events
 class VisitEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Raw events (last VISIT_RAW_RETENTION_DAYS only), cursor-paginated newest first.
+    Filters: ?method=&user=&path=&since=&until= (ISO datetimes).
+    /visits/hourly/ serves any range: compacted hours come from VisitHourlyAggregate,
+    recent hours are grouped from the raw table.
+    """
     queryset = VisitEvent.objects.select_related("user").order_by("-created_at")
+    serializer_class = VisitEventSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["method", "user"]
+
+    def _range(self, default_hours=None):
+        qp = self.request.query_params
+        since, until = qp.get("since"), qp.get("until")
+        since = parse_datetime(since) if since else None
+        until = parse_datetime(until) if until else None
+        if (qp.get("since") and since is None) or (qp.get("until") and until is None):
+            raise ValidationError({"detail": "since/until must be ISO datetimes"})
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        if until is not None and timezone.is_naive(until):
+            until = timezone.make_aware(until)
+        if default_hours:
+            until = until or timezone.now()
+            since = since or until - timezone.timedelta(hours=default_hours)
+        return since, until
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        since, until = self._range()
+        if since:
+            qs = qs.filter(created_at__gte=since)
+        if until:
+            qs = qs.filter(created_at__lt=until)
+        if self.request.query_params.get("path"):
+            qs = qs.filter(path=self.request.query_params["path"])
+        return qs
+
+    @action(detail=False, methods=["get"])
+    def hourly(self, request):
+        """GET /visits/hourly/?since=&until=&path=&method= (default: last 24h, max 31 days)"""
+        since, until = self._range(default_hours=24)
+        if until - since > timezone.timedelta(days=31):
+            return Response({"detail": "Range is limited to 31 days"}, status=400)
+        path, method = request.query_params.get("path"), request.query_params.get("method")
+
+        aggs = VisitHourlyAggregate.objects.filter(hour__gte=visits.floor_hour(since), hour__lt=until)
+        raw = VisitEvent.objects.filter(created_at__gte=since, created_at__lt=until)
+        if path:
+            aggs, raw = aggs.filter(path=path), raw.filter(path=path)
+        if method:
+            aggs, raw = aggs.filter(method=method.upper()), raw.filter(method=method.upper())
+
+        # compaction moves whole hours, so raw rows only overlap aggregates for late arrivals
+        merged = {}
+        for a in aggs.values("hour", "path", "method", "visits", "unique_users"):
+            merged[(a["hour"], a["path"], a["method"])] = a
+        for r in visits.hourly_rows(raw):
+            key = (r["hour"], r["path"], r["method"])
+            row = merged.setdefault(key, {"hour": r["hour"], "path": r["path"], "method": r["method"],
+                                          "visits": 0, "unique_users": 0})
+            row["visits"] += r["visits"]
+            row["unique_users"] += r["users"] + r["anon_ips"]
+
+        rows = sorted(merged.values(), key=lambda r: (r["hour"], r["visits"]), reverse=True)
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(VisitHourlyAggregateSerializer(page, many=True).data)
 
 # ---------- Marketing / Blog / Jobs ----------
 
@@ -1679,14 +1980,13 @@ class BlogCategoryViewSet(viewsets.ModelViewSet):
 class BlogPostViewSet(viewsets.ModelViewSet):
     queryset = BlogPost.objects.select_related("category", "author").all()
     serializer_class = BlogPostSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["title", "excerpt", "content_html", "content_markdown", "tags_csv", "category__name"]
+    filter_backends = [FullTextSearchFilter, filters.OrderingFilter]
     ordering_fields = ["published_at", "created_at", "views_count", "title"]
     parser_classes = [JSONParser, FormParser, MultiPartParser]
 
     def get_permissions(self):
         # public can list/retrieve; writes require staff
-        if self.action in ["list", "retrieve", "by_slug", "featured", "increment_view"]:
+        if self.action in ["list", "retrieve", "by_slug", "featured", "increment_view", "search"]:
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
@@ -1719,9 +2019,23 @@ class BlogPostViewSet(viewsets.ModelViewSet):
         ser = self.get_serializer(qs, many=True)
         return Response(ser.data)
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Ranked full-text results with highlighted snippets: ?q=<text>&limit=<n, max 50>."""
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except (TypeError, ValueError):
+            limit = 20
+        posts = search.ranked(self.get_queryset(), request.query_params.get("q", ""), limit)
+        ser = BlogPostSearchResultSerializer(posts, many=True, context=self.get_serializer_context())
+        return Response({"results": ser.data})
+
     @action(detail=True, methods=["post"])
     def increment_view(self, request, pk=None):
-        BlogPost.objects.filter(pk=pk).update(views_count=F("views_count") + 1)
+        try:
+            counters.incr(BlogPost, int(pk), "views_count")
+        except (TypeError, ValueError):
+            return Response({"detail": "Not found."}, status=404)
         return Response({"ok": True})
 
 class JobOpeningViewSet(viewsets.ModelViewSet):
@@ -1736,6 +2050,7 @@ class JobApplicationViewSet(viewsets.ModelViewSet):
 class ProductReviewModerationViewSet(viewsets.ModelViewSet):
     queryset = ProductReview.objects.select_related("product", "user").all()
     serializer_class = ProductReviewSerializer
+    BULK_LIMIT = 5000
 
     def get_permissions(self):
         if self.action in ["list", "retrieve", "create"]:
@@ -1776,6 +2091,27 @@ class ProductReviewModerationViewSet(viewsets.ModelViewSet):
         review.save(update_fields=["is_approved", "updated_at"])
         return Response({"ok": True}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        POST {"approve": [ids...], "unapprove": [ids...]}  (up to BULK_LIMIT ids)
+        One UPDATE per chunk; product stats are rebuilt once per affected product.
+        """
+        try:
+            approve = [int(i) for i in request.data.get("approve") or []]
+            unapprove = [int(i) for i in request.data.get("unapprove") or []]
+        except (TypeError, ValueError):
+            return Response({"detail": "approve/unapprove must be lists of ids"}, status=400)
+        if set(approve) & set(unapprove):
+            return Response({"detail": "An id cannot be both approved and unapproved"}, status=400)
+        if len(approve) + len(unapprove) > self.BULK_LIMIT:
+            return Response({"detail": f"At most {self.BULK_LIMIT} ids per request"}, status=400)
+
+        with transaction.atomic():
+            approved = moderate_reviews(approve, True)
+            unapproved = moderate_reviews(unapprove, False)
+        return Response({"ok": True, "approved": approved, "unapproved": unapproved})
+
 
 
 
@@ -1873,3 +2209,13 @@ class GalleryItemViewSet(PublicReadAdminWriteMixin, viewsets.ModelViewSet):
             else:
                 qs = qs.filter(is_active=(active not in ["0", "false", "False"]))
         return qs
+
+
+# ─────── Media (DEBUG only) ───────
+def serve_media(request, path):
+    """django.views.static.serve plus an immutable Cache-Control for content-addressed blobs."""
+    from django.views.static import serve
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if blobs.is_blob_name(path):
+        response["Cache-Control"] = blobs.IMMUTABLE
+    return response
@@ -0,0 +1,168 @@
+"""
+VisitEvent retention and compaction.
+
+Raw VisitEvents are kept for VISIT_RAW_RETENTION_DAYS. Older whole hours are
+rolled into VisitHourlyAggregate, copied to a per-month archive table and
+deleted from the live table, one day at a time:
+
+- PostgreSQL: `<visitevent table>_archive` is range-partitioned on created_at
+  with one partition per month, so expiring a month is a DROP TABLE.
+- other backends (SQLite): one plain `<visitevent table>_archive_YYYYMM` table
+  per month.
+
+Archived months older than VISIT_ARCHIVE_RETENTION_MONTHS are dropped;
+hourly aggregates are kept for VISIT_AGGREGATE_RETENTION_DAYS (0 = forever).
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import VisitEvent, VisitHourlyAggregate
+
+RAW_TABLE = VisitEvent._meta.db_table
+ARCHIVE_PREFIX = f"{RAW_TABLE}_archive"
+
+
+def hourly_rows(qs):
+    """Group VisitEvents into hour/path/method rows with visit and unique-user counts."""
+    return (
+        qs.annotate(hour=TruncHour("created_at"))
+        .values("hour", "path", "method")
+        .annotate(
+            visits=Count("id"),
+            users=Count("user_id", distinct=True),
+            anon_ips=Count("ip_address", distinct=True, filter=Q(user__isnull=True)),
+        )
+        .order_by()
+    )
+
+
+def floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _month_start(dt):
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt):
+    return (_month_start(dt) + timedelta(days=32)).replace(day=1)
+
+
+def archive_table_name(month_start) -> str:
+    return f"{ARCHIVE_PREFIX}_{month_start:%Y%m}"
+
+
+def _ensure_archive_table(cursor, month_start) -> str:
+    qn = connection.ops.quote_name
+    name = archive_table_name(month_start)
+    if connection.vendor == "postgresql":
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(ARCHIVE_PREFIX)} (LIKE {qn(RAW_TABLE)}) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(ARCHIVE_PREFIX)} "
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{_next_month(month_start).isoformat()}')"
+        )
+    else:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {qn(name)} AS SELECT * FROM {qn(RAW_TABLE)} WHERE 1 = 0")
+    return name
+
+
+def _compact_window(start, end) -> int:
+    """Roll up, archive and delete raw events in [start, end) (never spans a month)."""
+    qs = VisitEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+    rows = list(hourly_rows(qs))
+    if not rows:
+        return 0
+
+    qn = connection.ops.quote_name
+    with transaction.atomic():
+        existing = {
+            (a.hour, a.path, a.method): a
+            for a in VisitHourlyAggregate.objects.filter(hour__gte=start, hour__lt=end)
+        }
+        new, changed = [], []
+        for r in rows:
+            uniq = r["users"] + r["anon_ips"]
+            agg = existing.get((r["hour"], r["path"], r["method"]))
+            if agg is None:
+                new.append(VisitHourlyAggregate(
+                    hour=r["hour"], path=r["path"], method=r["method"], visits=r["visits"], unique_users=uniq,
+                ))
+            else:
+                # late events for an already compacted hour; uniques may overcount slightly
+                agg.visits += r["visits"]
+                agg.unique_users += uniq
+                changed.append(agg)
+        VisitHourlyAggregate.objects.bulk_create(new, batch_size=1000)
+        VisitHourlyAggregate.objects.bulk_update(changed, ["visits", "unique_users"], batch_size=1000)
+
+        cols = ", ".join(qn(f.column) for f in VisitEvent._meta.concrete_fields)
+        created_col = qn(VisitEvent._meta.get_field("created_at").column)
+        with connection.cursor() as cursor:
+            table = _ensure_archive_table(cursor, _month_start(start))
+            cursor.execute(
+                f"INSERT INTO {qn(table)} ({cols}) SELECT {cols} FROM {qn(RAW_TABLE)} "
+                f"WHERE {created_col} >= %s AND {created_col} < %s",
+                [connection.ops.adapt_datetimefield_value(start), connection.ops.adapt_datetimefield_value(end)],
+            )
+        deleted, _ = qs.delete()
+    return deleted
+
+
+def compact_raw_events(before) -> int:
+    """Compact every whole hour older than `before`. Returns raw rows moved."""
+    cutoff = floor_hour(before)
+    oldest = VisitEvent.objects.order_by("created_at").values_list("created_at", flat=True).first()
+    if oldest is None or oldest >= cutoff:
+        return 0
+    moved = 0
+    start = floor_hour(timezone.localtime(oldest))
+    while start < cutoff:
+        end = min(start + timedelta(days=1), _next_month(start), cutoff)
+        moved += _compact_window(start, end)
+        start = end
+    return moved
+
+
+def drop_expired_archives(keep_months: int) -> list[str]:
+    if not keep_months:
+        return []
+    now = timezone.localtime()
+    cutoff = _month_start(now)
+    for _ in range(keep_months):
+        cutoff = _month_start(cutoff - timedelta(days=1))
+    qn = connection.ops.quote_name
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in connection.introspection.table_names(cursor):
+            suffix = name[len(ARCHIVE_PREFIX) + 1:]
+            if not name.startswith(ARCHIVE_PREFIX + "_") or len(suffix) != 6 or not suffix.isdigit():
+                continue
+            month = timezone.make_aware(datetime(int(suffix[:4]), int(suffix[4:]), 1))
+            if month < cutoff:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+                dropped.append(name)
+    return dropped
+
+
+def run_retention(raw_days=None, archive_months=None, aggregate_days=None) -> dict:
+    raw_days = getattr(settings, "VISIT_RAW_RETENTION_DAYS", 30) if raw_days is None else raw_days
+    archive_months = getattr(settings, "VISIT_ARCHIVE_RETENTION_MONTHS", 12) if archive_months is None else archive_months
+    aggregate_days = getattr(settings, "VISIT_AGGREGATE_RETENTION_DAYS", 0) if aggregate_days is None else aggregate_days
+
+    now = timezone.now()
+    result = {"compacted": compact_raw_events(now - timedelta(days=raw_days))}
+    result["dropped_archives"] = drop_expired_archives(archive_months)
+    result["expired_aggregates"] = 0
+    if aggregate_days:
+        result["expired_aggregates"], _ = VisitHourlyAggregate.objects.filter(
+            hour__lt=now - timedelta(days=aggregate_days)
+        ).delete()
+    return result